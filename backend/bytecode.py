@@ -0,0 +1,387 @@
+from array import array
+from . import nodes as n
+from .interpreter import Integer, Double, String, DECLARED, FOR_CONDITIONS, method_of
+from .tokens import TT_KEYWORD, TT_MINUS
+
+# every instruction is two ints in Code.ops, the opcode and its argument;
+# the argument is a jump target, a count, or an index into Code.consts
+LITERAL = 0  # consts[arg] = (class, value, start, end)
+CONSTANT = 1  # consts[arg] = ConstNode
+LOAD = 2  # consts[arg] = (slot, name, start, end)
+LOAD_OR_NONE = 3  # LOAD, pushing None where LOAD would fail
+LOAD_RAW = 4  # push whatever the frame holds at slot arg
+ARG = 5  # consts[arg] = (index, start, end)
+NONE = 6
+BINARY = 7  # consts[arg] = (Value method name, start, end)
+POWER = 8  # consts[arg] = (exponent, start, end)
+INTOP = 9  # consts[arg] = (op, start, end)
+DOUBLEOP = 10
+STRINGOP = 11
+UNARY = 12  # consts[arg] = (negate, invert, start, end)
+ASSIGN = 13  # consts[arg] = (slot, class, const, start, end)
+REASSIGN = 14  # consts[arg] = VarReAssignNode
+POP = 15
+PUSH_NULL = 16
+JUMP = 17
+JUMP_IF_FALSE = 18
+SETUP_OPERAND = 19  # a signal before POP_HANDLER pushes None and jumps to arg
+SETUP_LOOP = 20  # consts[arg] = [advance, break, other or -1]
+POP_HANDLER = 21
+NEW_LIST = 22
+APPEND = 23  # pop into the element list arg entries down
+LOOP_END = 24  # consts[arg] = (return null, start, end)
+FOR_INIT = 25
+FOR_ITER = 26  # consts[arg] = [ForNode, condition, exit]
+FUNCDEF = 27  # consts[arg] = FuncDefNode
+COPY_CALLEE = 28  # consts[arg] = (start, end)
+CALL = 29  # consts[arg] = (argument count, start, end)
+GUARD_FUNC = 30  # consts[arg] = [slot, code, fallback]
+GUARD_BUILTIN = 31  # consts[arg] = [slot, target, fallback]
+CALL_DIRECT = 32  # consts[arg] = (argument count, start)
+CALL_INLINE = 33  # consts[arg] = (argument count, start, body)
+CALL_BUILTIN = 34  # consts[arg] = (argument count, func, method)
+BUILD_LIST = 35  # consts[arg] = (element count, start, end)
+RETURN = 36  # arg is 1 when a value was pushed
+ADVANCE = 37
+BREAK = 38
+INCLUDE = 39  # consts[arg] = IncludeNode
+CLEAR_SAVE = 40  # consts[arg] = SaveNode
+SAVE = 41
+REUSE = 42  # consts[arg] = [ReuseNode, skip]
+INVARIANT = 43  # consts[arg] = [InvariantNode, skip]
+INVARIANT_STORE = 44
+END = 45
+
+OPCODES = [
+    "LITERAL",
+    "CONSTANT",
+    "LOAD",
+    "LOAD_OR_NONE",
+    "LOAD_RAW",
+    "ARG",
+    "NONE",
+    "BINARY",
+    "POWER",
+    "INTOP",
+    "DOUBLEOP",
+    "STRINGOP",
+    "UNARY",
+    "ASSIGN",
+    "REASSIGN",
+    "POP",
+    "PUSH_NULL",
+    "JUMP",
+    "JUMP_IF_FALSE",
+    "SETUP_OPERAND",
+    "SETUP_LOOP",
+    "POP_HANDLER",
+    "NEW_LIST",
+    "APPEND",
+    "LOOP_END",
+    "FOR_INIT",
+    "FOR_ITER",
+    "FUNCDEF",
+    "COPY_CALLEE",
+    "CALL",
+    "GUARD_FUNC",
+    "GUARD_BUILTIN",
+    "CALL_DIRECT",
+    "CALL_INLINE",
+    "CALL_BUILTIN",
+    "BUILD_LIST",
+    "RETURN",
+    "ADVANCE",
+    "BREAK",
+    "INCLUDE",
+    "CLEAR_SAVE",
+    "SAVE",
+    "REUSE",
+    "INVARIANT",
+    "INVARIANT_STORE",
+    "END",
+]
+
+
+# operands that always evaluate without an error or other signal
+QUIET = (n.IntegerNode, n.DoubleNode, n.StringNode, n.ConstNode, n.ArgNode, type(None))
+
+
+class Code:
+    __slots__ = ("name", "ops", "consts")
+
+    def __init__(self, name):
+        self.name = name
+        self.ops = array("i")
+        self.consts = []
+
+
+class Compiler:
+    def __init__(self, name):
+        self.code = Code(name)
+
+    def emit(self, op, arg=0):
+        self.code.ops.extend((op, arg))
+        return len(self.code.ops) - 2
+
+    def const(self, value):
+        self.code.consts.append(value)
+        return len(self.code.consts) - 1
+
+    def here(self):
+        return len(self.code.ops)
+
+    def patch(self, at, target=None):
+        self.code.ops[at + 1] = self.here() if target is None else target
+
+    def compile(self, node):
+        self.visit(node)
+        self.emit(END)
+        return self.code
+
+    def visit(self, node):
+        method = getattr(self, f"visit_{type(node).__name__}", None)
+        if method is None:
+            raise Exception(f"Cannot compile {type(node).__name__}")
+        method(node)
+
+    def visit_NoneType(self, node):
+        self.emit(NONE)
+
+    def visit_IntegerNode(self, node):
+        self.emit(LITERAL, self.const((Integer, node.tok.value, node.start, node.end)))
+
+    def visit_DoubleNode(self, node):
+        self.emit(LITERAL, self.const((Double, node.tok.value, node.start, node.end)))
+
+    def visit_StringNode(self, node):
+        self.emit(LITERAL, self.const((String, node.tok.value, node.start, node.end)))
+
+    def visit_ConstNode(self, node):
+        self.emit(CONSTANT, self.const(node))
+
+    def visit_VarAccessNode(self, node):
+        self.emit(LOAD, self.const((node.slot, node.var_name_tok.value, node.start, node.end)))
+
+    def visit_ArgNode(self, node):
+        self.emit(ARG, self.const((node.index, node.start, node.end)))
+
+    def operands(self, node):
+        # a signal from the left operand is dropped once the right one has
+        # been evaluated, leaving None in its place
+        left = node.leftn
+        if isinstance(left, QUIET):
+            self.visit(left)
+        elif isinstance(left, n.VarAccessNode):
+            self.emit(LOAD_OR_NONE, self.const((left.slot, left.var_name_tok.value, left.start, left.end)))
+        else:
+            setup = self.emit(SETUP_OPERAND)
+            self.visit(left)
+            self.emit(POP_HANDLER)
+            self.patch(setup)
+        self.visit(node.rightn)
+
+    def visit_BinOpNode(self, node):
+        self.operands(node)
+        self.emit(BINARY, self.const((method_of(node.op), node.start, node.end)))
+
+    def visit_PowerNode(self, node):
+        self.operands(node)
+        self.emit(POWER, self.const((node.exponent, node.start, node.end)))
+
+    def visit_IntOpNode(self, node):
+        self.operands(node)
+        self.emit(INTOP, self.const((node.op.value, node.start, node.end)))
+
+    def visit_DoubleOpNode(self, node):
+        self.operands(node)
+        self.emit(DOUBLEOP, self.const((node.op.value, node.start, node.end)))
+
+    def visit_StringOpNode(self, node):
+        self.operands(node)
+        self.emit(STRINGOP, self.const((node.op.value, node.start, node.end)))
+
+    def visit_UnaryOpNode(self, node):
+        self.visit(node.node)
+        op = node.op
+        self.emit(UNARY, self.const((op.type == TT_MINUS, op.matches(TT_KEYWORD, "not"), node.start, node.end)))
+
+    def visit_VarAssignNode(self, node):
+        self.visit(node.value_node)
+        var_type = DECLARED.get(node.var_type_tok.value, node.var_type_tok.value)
+        self.emit(ASSIGN, self.const((node.slot, var_type, node.is_const, node.start, node.end)))
+
+    def visit_VarReAssignNode(self, node):
+        self.visit(node.value_node)
+        self.emit(REASSIGN, self.const(node))
+
+    def visit_IfNode(self, node):
+        exits = []
+        for condition, expr, shrn in node.cases:
+            self.visit(condition)
+            skip = self.emit(JUMP_IF_FALSE)
+            self.branch(expr, shrn)
+            exits.append(self.emit(JUMP))
+            self.patch(skip)
+        if node.else_case:
+            self.branch(*node.else_case)
+        else:
+            self.emit(PUSH_NULL)
+        for at in exits:
+            self.patch(at)
+
+    def branch(self, expr, shrn):
+        self.visit(expr)
+        if shrn:
+            self.emit(POP)
+            self.emit(PUSH_NULL)
+
+    def visit_ForNode(self, node):
+        # the stack holds the element list and the loop state while it runs
+        self.emit(NEW_LIST)
+        self.emit(LOAD_RAW, node.slot)
+        self.visit(node.end_value_node)
+        self.visit(node.step_value_node)
+        self.emit(FOR_INIT)
+        head = self.here()
+        loop = [node, FOR_CONDITIONS.get(node.op_start.value), 0]
+        self.emit(FOR_ITER, self.const(loop))
+        targets = [head, 0, -1]
+        self.emit(SETUP_LOOP, self.const(targets))
+        self.visit(node.exec_node)
+        self.emit(POP_HANDLER)
+        self.emit(APPEND, 2)
+        self.emit(JUMP, head)
+        loop[2] = targets[1] = self.here()
+        self.emit(POP)
+        self.emit(LOOP_END, self.const((node.should_return_null, node.start, node.end)))
+
+    def visit_WhileNode(self, node):
+        self.emit(NEW_LIST)
+        head = self.here()
+        self.visit(node.condition)
+        leave = self.emit(JUMP_IF_FALSE)
+        # errors and returns in the body only end the iteration
+        targets = [head, 0, 0]
+        self.emit(SETUP_LOOP, self.const(targets))
+        self.visit(node.exec_node)
+        self.emit(POP_HANDLER)
+        targets[2] = self.here()
+        self.emit(APPEND, 1)
+        self.emit(JUMP, head)
+        self.patch(leave)
+        targets[1] = self.here()
+        self.emit(LOOP_END, self.const((node.should_return_null, node.start, node.end)))
+
+    def visit_FuncDefNode(self, node):
+        self.emit(FUNCDEF, self.const(node))
+
+    def arguments(self, nodes):
+        for arg in nodes:
+            self.visit(arg)
+
+    def visit_CallFuncNode(self, node):
+        self.visit(node.caller)
+        self.emit(COPY_CALLEE, self.const((node.start, node.end)))
+        self.arguments(node.arg_nodes)
+        self.emit(CALL, self.const((len(node.arg_nodes), node.start, node.end)))
+
+    def guarded(self, node, guard, target, call, data):
+        # the bound call, or the plain one when the name holds something else
+        check = [node.call.caller.slot, target, 0]
+        self.emit(guard, self.const(check))
+        self.arguments(node.call.arg_nodes)
+        self.emit(call, self.const(data))
+        done = self.emit(JUMP)
+        check[2] = self.here()
+        self.visit_CallFuncNode(node.call)
+        self.patch(done)
+
+    def visit_DirectCallNode(self, node):
+        self.guarded(node, GUARD_FUNC, node.code, CALL_DIRECT, (len(node.call.arg_nodes), node.start))
+
+    def visit_InlineCallNode(self, node):
+        data = (len(node.call.arg_nodes), node.start, node.body)
+        self.guarded(node, GUARD_FUNC, node.code, CALL_INLINE, data)
+
+    def visit_BuiltinCallNode(self, node):
+        data = (len(node.call.arg_nodes), node.func, node.method)
+        self.guarded(node, GUARD_BUILTIN, node.target, CALL_BUILTIN, data)
+
+    def visit_ListNode(self, node):
+        for element in node.element_nodes:
+            self.visit(element)
+        self.emit(BUILD_LIST, self.const((len(node.element_nodes), node.start, node.end)))
+
+    def visit_ReturnNode(self, node):
+        if node.node:
+            self.visit(node.node)
+        self.emit(RETURN, 1 if node.node else 0)
+
+    def visit_AdvanceNode(self, node):
+        self.emit(ADVANCE)
+
+    def visit_BreakNode(self, node):
+        self.emit(BREAK)
+
+    def visit_IncludeNode(self, node):
+        self.emit(INCLUDE, self.const(node))
+
+    def visit_SaveNode(self, node):
+        # the saved value is None when the expression did not finish
+        self.emit(CLEAR_SAVE, self.const(node))
+        self.visit(node.node)
+        self.emit(SAVE, self.const(node))
+
+    def visit_ReuseNode(self, node):
+        reuse = [node, 0]
+        self.emit(REUSE, self.const(reuse))
+        self.visit(node.node)
+        reuse[1] = self.here()
+
+    def visit_InvariantNode(self, node):
+        invariant = [node, 0]
+        self.emit(INVARIANT, self.const(invariant))
+        self.visit(node.node)
+        self.emit(INVARIANT_STORE, self.const(node))
+        invariant[1] = self.here()
+
+
+def compile(node, name="<main>"):
+    return Compiler(name).compile(node)
+
+
+def describe(value):
+    if isinstance(value, (list, tuple)):
+        return ", ".join(describe(item) for item in value)
+    if isinstance(value, type):
+        return value.__name__
+    if isinstance(value, Code):
+        return f"<code {value.name}>"
+    if hasattr(value, "__slots__") and hasattr(value, "start"):
+        return f"<{type(value).__name__} at {value.start}>"
+    return repr(value)
+
+
+def disassemble(code):
+    # one line per instruction: offset, opcode, argument and what the
+    # argument refers to in the constant pool
+    lines = [f"code {code.name}"]
+    ops = code.ops
+    for at in range(0, len(ops), 2):
+        op, arg = ops[at], ops[at + 1]
+        name = OPCODES[op]
+        line = f"{at:>6}  {name:<16}{arg:>5}"
+        if name in POOLED:
+            line += f"  ({describe(code.consts[arg])})"
+        lines.append(line.rstrip())
+    return "\n".join(lines)
+
+
+# the opcodes whose argument indexes the constant pool
+POOLED = {
+    "LITERAL", "CONSTANT", "LOAD", "LOAD_OR_NONE", "ARG", "BINARY", "POWER", "INTOP", "DOUBLEOP",
+    "STRINGOP", "UNARY", "ASSIGN", "REASSIGN", "SETUP_LOOP", "LOOP_END", "FOR_ITER", "FUNCDEF",
+    "COPY_CALLEE", "CALL", "GUARD_FUNC", "GUARD_BUILTIN", "CALL_DIRECT", "CALL_INLINE",
+    "CALL_BUILTIN", "BUILD_LIST", "INCLUDE", "CLEAR_SAVE", "SAVE", "REUSE", "INVARIANT",
+    "INVARIANT_STORE",
+}
@@ -0,0 +1,92 @@
+import gc
+import os
+from . import __version__
+from .nodes import shift_offsets
+from .pos import register_source
+
+# bump whenever the parser or the node classes change what a tree looks like
+FORMAT = 6
+ENABLED = not os.environ.get("KROMIUM_NO_CACHE")
+CACHE_DIR = os.environ.get("KROMIUM_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "kromium")
+
+stats = {"hits": 0, "misses": 0, "writes": 0, "failed": 0}
+
+
+def cache_key(code):
+    # hashlib and pickle take longer to import than a short script takes to
+    # run, so they wait for the first file that is cached
+    import hashlib
+    # str and mapped sources count offsets in different units, keep them apart
+    kind = b"s" if isinstance(code, str) else b"b"
+    h = hashlib.sha256(b"%d:%s:%s\0" % (FORMAT, __version__.encode(), kind))
+    h.update(code.encode() if isinstance(code, str) else code)
+    return h.hexdigest()
+
+
+def cache_path(code):
+    return os.path.join(CACHE_DIR, cache_key(code) + ".krc")
+
+
+def cacheable(fn):
+    # <stdin> lines and other pseudo files are not worth a file each
+    return ENABLED and not fn.startswith("<")
+
+
+def load(fn, code):
+    if not cacheable(fn):
+        return None
+    import pickle
+    collecting = gc.isenabled()
+    # unpickling a tree allocates nothing but live objects, don't scan them
+    gc.disable()
+    try:
+        with open(cache_path(code), "rb") as f:
+            base, node = pickle.load(f)
+    except FileNotFoundError:
+        stats["misses"] += 1
+        return None
+    except Exception:
+        # written by an older or broken interpreter, parse again and overwrite
+        stats["misses"] += 1
+        stats["failed"] += 1
+        return None
+    finally:
+        if collecting:
+            gc.enable()
+
+    source = register_source(fn, code)
+    source.release()
+    if source.base != base:
+        shift_offsets(node, source.base - base)
+    node.source = source
+    stats["hits"] += 1
+    return node
+
+
+def store(fn, code, base, node):
+    if not cacheable(fn):
+        return
+    import pickle
+    path = cache_path(code)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        data = pickle.dumps((base, node), pickle.HIGHEST_PROTOCOL)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except (OSError, RecursionError, pickle.PicklingError):
+        stats["failed"] += 1
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return
+    stats["writes"] += 1
+
+
+def summary():
+    total = stats["hits"] + stats["misses"]
+    rate = stats["hits"] / total * 100 if total else 0
+    return (f"AST cache: {stats['hits']} hits, {stats['misses']} misses ({rate:.0f}% hit rate), "
+            f"{stats['writes']} writes, {stats['failed']} failed")
@@ -0,0 +1,608 @@
+from . import exe
+from .errs import RunTimeError, typeError
+from .interpreter import (
+    Interpreter, RTResult, Context, SymbolTable, Integer, Double, String, List, Function, NoneType,
+    ARITHMETIC, COMPARISONS, WHOLE, DECLARED, FOR_CONDITIONS, owned, include_target, method_of,
+)
+from .loader import load_source
+from .tokens import TT_KEYWORD, TT_MINUS
+
+class Compiler:
+    # turns every node into a Python closure taking the context and giving
+    # back the RTResult the interpreter's visitor would, so a node is
+    # dispatched on once, here, instead of each time it runs
+    def __init__(self):
+        self.interpreter = Interpreter()
+        # function bodies are compiled the first time one is called
+        self.code = {}
+
+    def compile(self, node):
+        method = getattr(self, f"compile_{type(node).__name__}", self.fallback)
+        return method(node)
+
+    def visit(self, node, ctx):
+        # Function.run_body calls back in here with the function's body
+        code = self.code.get(node)
+        if code is None:
+            code = self.code[node] = self.compile(node)
+        return code(ctx)
+
+    def fallback(self, node):
+        visit = self.interpreter.visit
+
+        def run(ctx):
+            return visit(node, ctx)
+
+        return run
+
+    def compile_NoneType(self, node):
+        def run(ctx):
+            return RTResult().success(NoneType())
+
+        return run
+
+    def compile_IntegerNode(self, node):
+        value, start, end = node.tok.value, node.start, node.end
+
+        def run(ctx):
+            return RTResult().success(Integer(value).set_context(ctx).set_pos(start, end))
+
+        return run
+
+    def compile_DoubleNode(self, node):
+        value, start, end = node.tok.value, node.start, node.end
+
+        def run(ctx):
+            return RTResult().success(Double(value).set_context(ctx).set_pos(start, end))
+
+        return run
+
+    def compile_StringNode(self, node):
+        value, start, end = node.tok.value, node.start, node.end
+
+        def run(ctx):
+            return RTResult().success(String(value).set_context(ctx).set_pos(start, end))
+
+        return run
+
+    def compile_ConstNode(self, node):
+        def run(ctx):
+            value = node.value
+            if value.context is not ctx:
+                value = node.value = value.bind(ctx)
+            return RTResult().success(value)
+
+        return run
+
+    def compile_VarAccessNode(self, node):
+        slot, name, start, end = node.slot, node.var_name_tok.value, node.start, node.end
+
+        def run(ctx):
+            value = ctx.symbol_table.get(slot)[0]
+            if not value:
+                return RTResult().fail(RunTimeError(start, end, f'"{name}" is not defined', ctx))
+            try:
+                value = value.copy().set_pos(start, end).set_context(ctx)
+            except:
+                pass
+            return RTResult().success(value)
+
+        return run
+
+    def compile_ArgNode(self, node):
+        index, start, end = node.index, node.start, node.end
+
+        def run(ctx):
+            value = ctx.args[index]
+            try:
+                value = value.copy().set_pos(start, end).set_context(ctx)
+            except:
+                pass
+            return RTResult().success(value)
+
+        return run
+
+    def operands(self, node):
+        left_code, right_code = self.compile(node.leftn), self.compile(node.rightn)
+        start, end = node.start, node.end
+
+        def run(ctx):
+            res = RTResult()
+            left = res.log(left_code(ctx))
+            right = res.log(right_code(ctx))
+            if res.should_ret():
+                return res, None, None
+            if left == None or right == None:
+                error = RunTimeError(start, end, "Undifined variable detected in binary operaion", ctx)
+                return res.fail(error), None, None
+            return res, left, right
+
+        return run
+
+    def compile_BinOpNode(self, node):
+        name = method_of(node.op)
+        if name is None:
+            return self.fallback(node)
+        operands, start, end = self.operands(node), node.start, node.end
+
+        def run(ctx):
+            res, left, right = operands(ctx)
+            if left is None:
+                return res
+            result, err = getattr(left, name)(right)
+            return res.fail(err) if err else res.success(result.set_pos(start, end))
+
+        return run
+
+    def compile_PowerNode(self, node):
+        operands, exponent, start, end = self.operands(node), node.exponent, node.start, node.end
+
+        def run(ctx):
+            res, left, right = operands(ctx)
+            if left is None:
+                return res
+            if not isinstance(left, Integer):
+                result, err = left.powed_by(right)
+                return res.fail(err) if err else res.success(result.set_pos(start, end))
+            value = left.value
+            for _ in range(exponent - 1):
+                value *= left.value
+            return res.success(Integer(value).set_context(left.context).set_pos(start, end))
+
+        return run
+
+    def compile_IntOpNode(self, node):
+        operands, op, start, end = self.operands(node), node.op.value, node.start, node.end
+
+        if op in WHOLE:
+            # the common case gets a closure that is just the Python operation
+            fn = WHOLE[op]
+
+            def run(ctx):
+                res, left, right = operands(ctx)
+                if left is None:
+                    return res
+                result = Integer(fn(left.value, right.value))
+                return res.success(result.set_context(left.context).set_pos(start, end))
+
+            return run
+
+        def run(ctx):
+            res, left, right = operands(ctx)
+            if left is None:
+                return res
+            a, b = left.value, right.value
+            if op == "/":
+                if b == 0:
+                    return res.fail(RunTimeError(right.pos_start, right.pos_end, "Division by zero", left.context))
+                result = left.number(a / b)[0]
+            else:
+                result = left.number(a**b)[0]
+            return res.success(result.set_context(left.context).set_pos(start, end))
+
+        return run
+
+    def compile_DoubleOpNode(self, node):
+        operands, op, start, end = self.operands(node), node.op.value, node.start, node.end
+
+        def run(ctx):
+            res, left, right = operands(ctx)
+            if left is None:
+                return res
+            a, b = left.value, right.value
+            if op == "/":
+                if b == 0:
+                    return res.fail(RunTimeError(right.pos_start, right.pos_end, "Division by zero", left.context))
+                result = Double(a / b)
+            elif op in ARITHMETIC:
+                result = Double(ARITHMETIC[op](a, b))
+            elif op == "==":
+                result = Integer(int(a == b))
+            else:
+                result = Double(int(COMPARISONS[op](a, b)))
+            return res.success(result.set_context(left.context).set_pos(start, end))
+
+        return run
+
+    def compile_StringOpNode(self, node):
+        operands, op, start, end = self.operands(node), node.op.value, node.start, node.end
+
+        def run(ctx):
+            res, left, right = operands(ctx)
+            if left is None:
+                return res
+            a, b = left.value, right.value
+            if op == "+":
+                result = String(a + b)
+            elif op == "*":
+                result = String(a * b)
+            elif op == "/":
+                result = String(a[b])
+            else:
+                result = Integer(int(COMPARISONS[op](a, b)))
+            return res.success(result.set_context(left.context).set_pos(start, end))
+
+        return run
+
+    def compile_UnaryOpNode(self, node):
+        code, op, start, end = self.compile(node.node), node.op, node.start, node.end
+        negate = op.type == TT_MINUS
+        invert = op.matches(TT_KEYWORD, "not")
+
+        def run(ctx):
+            res = RTResult()
+            num = res.log(code(ctx))
+            if res.should_ret():
+                return res
+            err = None
+            if negate:
+                num, err = num.multiplication(Integer(-1))
+            elif invert:
+                num, err = num.notted()
+            return res.fail(err) if err else res.success(num.set_pos(start, end))
+
+        return run
+
+    def compile_VarAssignNode(self, node):
+        code, slot, is_const = self.compile(node.value_node), node.slot, node.is_const
+        var_type = node.var_type_tok.value
+        var_type = DECLARED.get(var_type, var_type)
+        start, end = node.start, node.end
+
+        def run(ctx):
+            res = RTResult()
+            value = res.log(code(ctx))
+            if res.should_ret():
+                return res
+            if isinstance(value, var_type):
+                ctx.symbol_table.set(slot, var_type, value, is_const)
+                return res.success(value)
+            if var_type == Double and isinstance(value, Integer):
+                value = Double(value.value)
+                ctx.symbol_table.set(slot, var_type, value, is_const)
+                return res.success(value)
+            return res.fail(
+                typeError(start, end, f"Cannot convert type '{type(value).__name__}' to '{var_type.__name__}'")
+            )
+
+        return run
+
+    def compile_VarReAssignNode(self, node):
+        code, reassign = self.compile(node.value_node), self.interpreter.reassign
+
+        def run(ctx):
+            res = RTResult()
+            value = res.log(code(ctx))
+            if res.should_ret():
+                return res
+            return reassign(node, value, ctx, res)
+
+        return run
+
+    def compile_IfNode(self, node):
+        cases = [(self.compile(condition), self.compile(expr), shrn) for condition, expr, shrn in node.cases]
+        else_case = None
+        if node.else_case:
+            expr, shrn = node.else_case
+            else_case = self.compile(expr), shrn
+
+        def run(ctx):
+            res = RTResult()
+            for condition, expr, shrn in cases:
+                condition_value = res.log(condition(ctx))
+                if res.should_ret():
+                    return res
+                if condition_value.is_true():
+                    expr_value = res.log(expr(ctx))
+                    if res.should_ret():
+                        return res
+                    return res.success(Integer.null if shrn else expr_value)
+            if else_case:
+                expr, shrn = else_case
+                else_value = res.log(expr(ctx))
+                if res.should_ret():
+                    return res
+                return res.success(Integer.null if shrn else else_value)
+            return res.success(Integer.null)
+
+        return run
+
+    def compile_ForNode(self, node):
+        end_code, step_code = self.compile(node.end_value_node), self.compile(node.step_value_node)
+        body, slot = self.compile(node.exec_node), node.slot
+        condition = FOR_CONDITIONS.get(node.op_start.value)
+        op_end, null, start, end = node.op_end.value, node.should_return_null, node.start, node.end
+
+        def run(ctx):
+            res = RTResult()
+            elements = []
+            table = ctx.symbol_table
+            start_value = table.get(slot)[0]
+            end_value = res.log(end_code(ctx))
+            if res.should_ret():
+                return res
+            step_value = res.log(step_code(ctx))
+            if res.should_ret():
+                return res
+
+            i = start_value.value
+            while condition(i, end_value.value):
+                table.reassign(slot, Integer(i), node, ctx, res)
+                if op_end == "+=":
+                    i += step_value.value
+                elif op_end == "-=":
+                    i -= step_value.value
+                elif op_end == "*=":
+                    i *= step_value.value
+                elif op_end == "/=":
+                    i /= step_value.value
+                value = res.log(body(ctx))
+                if res.should_ret() and res.loop_advance == False and res.loop_break == False:
+                    return res
+                if res.loop_advance:
+                    continue
+                if res.loop_break:
+                    break
+                elements.append(owned(value))
+                if res.should_ret():
+                    return res
+
+            return res.success(Integer.null if null else List(elements).set_context(ctx).set_pos(start, end))
+
+        return run
+
+    def compile_WhileNode(self, node):
+        condition, body = self.compile(node.condition), self.compile(node.exec_node)
+        null, start, end = node.should_return_null, node.start, node.end
+
+        def run(ctx):
+            res = RTResult()
+            elements = []
+            while True:
+                condition_value = res.log(condition(ctx))
+                if res.should_ret():
+                    return res
+                if not condition_value.is_true():
+                    break
+                value = res.log(body(ctx))
+                if res.should_ret() and res.loop_advance == False and res.loop_break == False:
+                    return res
+                if res.loop_advance:
+                    continue
+                if res.loop_break:
+                    break
+                elements.append(owned(value))
+
+            return res.success(Integer.null if null else List(elements).set_context(ctx).set_pos(start, end))
+
+        return run
+
+    def compile_FuncDefNode(self, node):
+        func_name = node.var_name_tok.value if node.var_name_tok else None
+        arg_names = [arg_name.value for arg_name in node.arg_name_toks]
+        slot, start, end = node.slot, node.start, node.end
+
+        def run(ctx):
+            # the body is read off the node each time, like the visitor does
+            func = Function(func_name, node.exec_code, arg_names, node.auto_ret, node.layout).set_context(ctx).set_pos(start, end)
+            if func_name is not None:
+                ctx.symbol_table.set(slot, Function, func, False)
+            return RTResult().success(func)
+
+        return run
+
+    def arguments(self, nodes):
+        codes = [self.compile(arg) for arg in nodes]
+
+        def run(ctx, res):
+            args = []
+            for code in codes:
+                args.append(res.log(code(ctx)))
+                if res.should_ret():
+                    return None
+            return args
+
+        return run
+
+    def call(self, func, args):
+        # Function.execute, running the body compiled
+        res = RTResult()
+        ctx = func.generate_ctx()
+        res.log(func.check_and_populate(func.args, args, ctx))
+        if res.should_ret():
+            return res
+        return func.run_body(self, ctx)
+
+    def compile_CallFuncNode(self, node):
+        caller, arguments, start, end = self.compile(node.caller), self.arguments(node.arg_nodes), node.start, node.end
+        call = self.call
+
+        def run(ctx):
+            res = RTResult()
+            value_to_call = res.log(caller(ctx))
+            if res.should_ret():
+                return res
+            value_to_call = value_to_call.copy().set_pos(start, end)
+            args = arguments(ctx, res)
+            if args is None:
+                return res
+            if type(value_to_call) is Function:
+                return_value = res.log(call(value_to_call, args))
+            else:
+                return_value = res.log(value_to_call.execute(args))
+            if res.should_ret():
+                return res
+            if not hasattr(value_to_call, "copy"):
+                return res.fail(RunTimeError(start, end, f"'{value_to_call}' is not callable", ctx))
+            return res.success(return_value)
+
+        return run
+
+    def compile_DirectCallNode(self, node):
+        call, code = node.call, node.code
+        fallback, arguments = self.compile_CallFuncNode(call), self.arguments(call.arg_nodes)
+        slot, start = call.caller.slot, call.start
+
+        def run(ctx):
+            func = ctx.symbol_table.get(slot)[0]
+            if not isinstance(func, Function) or func.exec_code is not code:
+                return fallback(ctx)
+            res = RTResult()
+            args = arguments(ctx, res)
+            if args is None:
+                return res
+            frame = Context(func.name, ctx, start)
+            frame.symbol_table = SymbolTable(ctx.symbol_table, func.layout)
+            func.populate_args(func.args, args, frame)
+            return func.run_body(self, frame)
+
+        return run
+
+    def compile_BuiltinCallNode(self, node):
+        call, target, func, method = node.call, node.target, node.func, node.method
+        fallback, arguments = self.compile_CallFuncNode(call), self.arguments(call.arg_nodes)
+        slot, arg_names = call.caller.slot, method.arg_names
+
+        def run(ctx):
+            if ctx.symbol_table.get(slot)[0] is not target:
+                return fallback(ctx)
+            res = RTResult()
+            args = arguments(ctx, res)
+            if args is None:
+                return res
+            exec_ctx = Context(func.name, ctx, func.pos_start)
+            exec_ctx.symbol_table = SymbolTable(ctx.symbol_table, func.layout)
+            func.populate_args(arg_names, args, exec_ctx)
+            value = res.log(method(exec_ctx))
+            if res.should_ret():
+                return res
+            return res.success(value)
+
+        return run
+
+    def compile_InlineCallNode(self, node):
+        call, code = node.call, node.code
+        fallback, arguments, body = self.compile_CallFuncNode(call), self.arguments(call.arg_nodes), self.compile(node.body)
+        slot, start = call.caller.slot, call.start
+
+        def run(ctx):
+            func = ctx.symbol_table.get(slot)[0]
+            if not isinstance(func, Function) or func.exec_code is not code:
+                return fallback(ctx)
+            res = RTResult()
+            frame = Context(func.name, ctx, start)
+            args = arguments(ctx, res)
+            if args is None:
+                return res
+            for arg in args:
+                arg.set_context(frame)
+            frame.args = args
+            value = res.log(body(frame))
+            if res.should_ret():
+                return res
+            return res.success(value)
+
+        return run
+
+    def compile_InvariantNode(self, node):
+        code, slots = self.compile(node.node), node.slots
+
+        def run(ctx):
+            table = ctx.symbol_table
+            values = tuple(table.get(slot)[0] for slot in slots)
+            kept = ctx.invariants.get(node)
+            if kept is not None and kept[0] == values:
+                return RTResult().success(kept[1].copy())
+            res = RTResult()
+            value = res.log(code(ctx))
+            if res.should_ret():
+                return res
+            if type(value) in (Integer, Double, String) and not any(isinstance(v, List) for v in values):
+                ctx.invariants[node] = (values, value.copy())
+            return res.success(value)
+
+        return run
+
+    def compile_SaveNode(self, node):
+        code = self.compile(node.node)
+
+        def run(ctx):
+            res = code(ctx)
+            node.value = res.value
+            return res
+
+        return run
+
+    def compile_ReuseNode(self, node):
+        code, save, start, end = self.compile(node.node), node.save, node.start, node.end
+
+        def run(ctx):
+            value = save.value
+            if type(value) not in (Integer, Double, String):
+                return code(ctx)
+            return RTResult().success(value.copy().set_pos(start, end))
+
+        return run
+
+    def compile_ListNode(self, node):
+        codes, start, end = [self.compile(element) for element in node.element_nodes], node.start, node.end
+
+        def run(ctx):
+            res = RTResult()
+            els = []
+            for code in codes:
+                els.append(owned(res.log(code(ctx))))
+                if res.should_ret():
+                    return res
+            return res.success(List(els).set_context(ctx).set_pos(start, end))
+
+        return run
+
+    def compile_ReturnNode(self, node):
+        code = self.compile(node.node) if node.node else None
+
+        def run(ctx):
+            res = RTResult()
+            value = Integer.null
+            if code is not None:
+                value = res.log(code(ctx))
+                if res.should_ret():
+                    return res
+            return res.success_ret(value)
+
+        return run
+
+    def compile_AdvanceNode(self, node):
+        def run(ctx):
+            return RTResult().success_adv()
+
+        return run
+
+    def compile_BreakNode(self, node):
+        def run(ctx):
+            return RTResult().success_break()
+
+        return run
+
+    def compile_IncludeNode(self, node):
+        fn = node.node.tok
+
+        def run(ctx):
+            res = RTResult()
+            if node.tree is not None:
+                r, e = exe.execute(node.tree, "closure")
+                if e:
+                    return res.fail(e)
+                return res.success(Integer.null)
+            path, name = include_target(fn.value)
+            fn.value = fn.value.replace("#", "")
+            r, e = exe.run(name, load_source(path), "closure")
+            if e:
+                return res.fail(e)
+            return res.success(Integer.null)
+
+        return run
+
+
+def compile(tree):
+    return Compiler().compile(tree)
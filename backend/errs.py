@@ -1,4 +1,12 @@
 from .str_with_arrows import string_with_arrows
+from .pos import source_of
+
+
+def resolve_span(start, end):
+    source = source_of(start)
+    if end is None or source_of(end) is not source:
+        end = start + 1
+    return source.position(start), source.position(end)
 
 
 class BaseError:
@@ -7,9 +15,12 @@ class BaseError:
         self.details = details
         self.start = start
         self.end = end
+        # errors are shown after the tree they point into is gone
+        self.source = source_of(start) if start is not None else None
 
     def as_str(self):
-        return f"\n{self.name}: {self.details}\nFile: {self.start.fn}\nLine: {self.start.line + 1}\n\n {string_with_arrows(self.start.fcnt, self.start, self.end)}"
+        start, end = resolve_span(self.start, self.end)
+        return f"\n{self.name}: {self.details}\nFile: {start.fn}\nLine: {start.line + 1}\n\n {string_with_arrows(start.fcnt, start, end)}"
 
 
 class InvalidCharError(BaseError):
@@ -25,18 +36,26 @@ class RunTimeError(BaseError):
     def __init__(self, start, end, details, context):
         super().__init__(start, end, "Runtime error occured", f'{details}')
         self.context = context
+        # and so are the files of the calls that led to it
+        self.callers = []
+        while context and context.parent:
+            if context.parent_entry_pos is not None:
+                self.callers.append(source_of(context.parent_entry_pos))
+            context = context.parent
     def generate_traceback(self):
         res = ''
         pos = self.start
         ctx = self.context
         
         while ctx:
+            pos = source_of(pos).position(pos)
             res = f'   File "{pos.fn}",  line {pos.line + 1}, in {ctx.display_name}\n'
             pos = ctx.parent_entry_pos
             ctx = ctx.parent
         return '\nTraceback (most recent call last):\n' + res
     def as_str(self):
-        return self.generate_traceback() + f"\n{self.name}: {self.details}\n\n{string_with_arrows(self.start.fcnt, self.start, self.end)}"
+        start, end = resolve_span(self.start, self.end)
+        return self.generate_traceback() + f"\n{self.name}: {self.details}\n\n{string_with_arrows(start.fcnt, start, end)}"
 
 class ExpectedCharError(BaseError):
     def __init__(self, start, end, details):
@@ -44,4 +63,4 @@ class ExpectedCharError(BaseError):
 
 class typeError(BaseError):
     def __init__(self, start, end, details):
-        super().__init__(start, end, "Type Error ", f'{details}')
\ No newline at end of file
+        super().__init__(start, end, "Type Error ", f'{details}')
@@ -1,5 +1,12 @@
-from . import lexer, parser, interpreter
 import os
+from . import lexer, parser, interpreter, cache, optimizer, typecheck, resolver
+# not used here: function calls in the interpreter reach it as exe.tiering,
+# since it imports from the interpreter and can't be imported there in turn
+from . import tiering
+
+# "tree" walks the syntax tree, "closure" compiles it to Python closures
+# first, "vm" to bytecode for a stack machine and "python" to Python source
+BACKEND = os.environ.get("KROMIUM_BACKEND", "tree")
 
 
 global_symbol_table = interpreter.SymbolTable()
@@ -18,23 +25,56 @@ global_symbol_table.set_var("len", interpreter.BuiltInFunc, interpreter.BuiltInF
 global_symbol_table.set_var("await", interpreter.BuiltInFunc, interpreter.BuiltInFunc.awaits , True)
 global_symbol_table.set_var("run", interpreter.BuiltInFunc, interpreter.BuiltInFunc.run , True)
 global_symbol_table.set_var("str", interpreter.BuiltInFunc, interpreter.BuiltInFunc.str , True)
-os.system("cls")
 
-def run(fn, code):
+def run(fn, code, backend=None):
+    node, error = parse(fn, code)
+    if error:
+        return None, error
+    analysis = None
+    if typecheck.ENABLED:
+        analysis, error = typecheck.check(node)
+        if error:
+            return None, error
+    if optimizer.ENABLED:
+        node = optimizer.optimize(node, analysis=analysis)
+    return execute(node, backend)
+
+def parse(fn, code):
+    node = cache.load(fn, code)
+    if node is not None:
+        return node, None
+
     l = lexer.Lexer(fn=fn, code=code)
-    t, err = l.bake_tokens()
-    if err:
-        return None, err
-    
-    p = parser.Parser(t)
+    stream = parser.TokenStream(l.iter_tokens())
+    p = parser.Parser(stream)
     ast = p.parse()
-    if ast.error:
-        return None, ast.error
-    
-    i = interpreter.Interpreter()
+    stream.drain()
+    error = l.error or ast.error
+    if not error:
+        cache.store(fn, code, l.base, ast.node)
+    # the tree holds no part of the text, a mapped file can be closed now
+    l.source.release()
+    if error:
+        return None, error
+    ast.node.source = l.source
+    return ast.node, None
+
+def execute(node, backend=None):
+    resolver.resolve(node, global_symbol_table.layout)
     ctx = interpreter.Context("<main>")
     ctx.symbol_table = global_symbol_table
-    
 
-    r = i.visit(ast.node, ctx)
+    # the other backends are imported once a program picks them
+    backend = backend or BACKEND
+    if backend == "vm":
+        from . import bytecode, vm
+        return vm.VM().run(bytecode.compile(node), ctx)
+    if backend == "python":
+        from . import transpiler
+        return transpiler.run(node, ctx)
+    if backend == "closure":
+        from . import compiler
+        r = compiler.compile(node)(ctx)
+    else:
+        r = interpreter.Interpreter().visit(node, ctx)
     return r.value, r.error
@@ -0,0 +1,221 @@
+import weakref
+from bisect import bisect_left
+from . import nodes as n
+from .lexer import Lexer
+from .parser import Parser, ParseRes, TokenStream
+from .pos import Source, register
+
+
+class Region(Source):
+    # the offsets handed out by one re-parse. Statements kept by later
+    # edits are never rewritten: an offset is mapped to the text through
+    # where the document holds its statement when it is resolved
+    __slots__ = ("document", "current")
+
+    def __init__(self, document, size):
+        super().__init__(document.fn, None, None, size)
+        self.document = weakref.ref(document)
+        self.current = document.source
+
+    def position(self, offset):
+        index = offset - self.base
+        document = self.document()
+        if document is not None:
+            index = document.locate(self, index)
+        return self.current.position(index)
+
+
+class Segment:
+    __slots__ = ("node", "region", "origin", "reach", "end", "error")
+
+    def __init__(self, node, region, origin, reach, end=None, error=None):
+        # origin is where the segment started in the text its region was
+        # lexed from; reach and end are kept relative to the segment start
+        self.node = node
+        self.region = region
+        self.origin = origin
+        self.reach = reach
+        self.end = end
+        self.error = error
+
+
+class ReachStream(TokenStream):
+    def __init__(self, tokens):
+        super().__init__(tokens)
+        self.high = -1
+        self.reach = None
+
+    def get(self, idx):
+        tok = TokenStream.get(self, idx)
+        if tok is not None and idx > self.high:
+            self.high = idx
+            self.reach = tok.start
+        return tok
+
+
+class Document:
+    def __init__(self, fn, text):
+        self.fn = fn
+        self.text = text
+        self.source = Source(fn, text, 0, len(text))
+        self.first = None
+        self.error = None
+        self.reset()
+
+    def reset(self):
+        # segments end with the tail: what follows the last statement. Up
+        # to gap, starts hold text offsets; from gap on, offsets counted
+        # back from the end of the text, which edits before them leave alone.
+        # nodes holds the segments' statements, ready to be handed out
+        self.segments = []
+        self.starts = []
+        self.nodes = []
+        self.gap = 0
+        self.commit(self.text, 0, *self.reparse(self.text, 0, 0, 0))
+
+    def start_of(self, i):
+        if i < self.gap:
+            return self.starts[i]
+        return self.starts[i] + len(self.text)
+
+    def move_gap(self, gap):
+        starts = self.starts
+        size = len(self.text)
+        if gap < self.gap:
+            starts[gap:self.gap] = [start - size for start in starts[gap:self.gap]]
+        elif gap > self.gap:
+            starts[self.gap:gap] = [start + size for start in starts[self.gap:gap]]
+        self.gap = gap
+
+    def find(self, index):
+        starts = self.starts
+        gap = self.gap
+        if gap and index <= starts[gap - 1]:
+            return bisect_left(starts, index, 0, gap)
+        return bisect_left(starts, index - len(self.text), gap)
+
+    def locate(self, region, index):
+        # only for positions, which are rare next to edits
+        found = None
+        for i, segment in enumerate(self.segments):
+            if segment.region is region and segment.origin <= index:
+                found = i
+        if found is None:
+            return index
+        return self.start_of(found) + index - self.segments[found].origin
+
+    def edit(self, offset, deleted, inserted):
+        text = self.text[:offset] + inserted + self.text[offset + deleted:]
+
+        if self.error is not None or not self.segments:
+            # nothing after a first statement that fails is parsed; the
+            # segments past the edits made since are kept to pick up from
+            i = 0
+        else:
+            i = max(self.find(offset) - 1, 0)
+            # lookahead never spans a whole statement, so only the previous
+            # segment can have read tokens that the edit touches
+            while i > 0 and self.start_of(i - 1) + self.segments[i - 1].reach > self.start_of(i):
+                i -= 1
+        restart = self.start_of(i) if i else 0
+        # everything from i on is counted from the end before the edit
+        # changes the length of the text
+        self.move_gap(i)
+        # the document changes only once the new text has parsed
+        edited = offset + len(inserted)
+        self.commit(text, edited, *self.reparse(text, i, restart, edited))
+
+    def reparse(self, text, i, restart, edited):
+        region = register(Region(self, len(text)))
+        lexer = Lexer(self.fn, text, region.base)
+        stream = ReachStream(lexer.iter_tokens(restart))
+        parser = Parser(stream)
+        res = ParseRes()
+        base = region.base
+
+        segments = []
+        starts = []
+        first = self.first
+        if i == 0:
+            first = parser.current_tok.start
+            node = parser.first_statement(res)
+            if res.error:
+                error = self.lex_error(stream, lexer, base, len(text), edited)
+                return i, None, segments, starts, first, error or parser.check_end(res).error
+            segments.append(Segment(node, region, restart, stream.reach - base - restart))
+            starts.append(restart)
+
+        while True:
+            start = parser.current_tok.start - base
+            if start >= edited:
+                k = self.find_segment(start - len(text))
+                if k is not None:
+                    return i, k, segments, starts, first, None
+
+            node = parser.next_statement(res)
+            if not node:
+                stream.drain()
+                reach = stream.reach - base - start
+                end = parser.current_tok.end - base - start
+                segments.append(Segment(None, region, start, reach, end, lexer.error))
+                starts.append(start)
+                return i, len(self.segments), segments, starts, first, None
+            segments.append(Segment(node, region, start, stream.reach - base - start))
+            starts.append(start)
+
+    def lex_error(self, stream, lexer, base, size, edited):
+        # the rest is lexed only for an invalid character in it. From a kept
+        # segment on it lexes as it did before, which the tail recorded
+        for tok in stream.source:
+            start = tok.start - base
+            if start >= edited and self.find_segment(start - size) is not None:
+                return self.segments[-1].error
+        return lexer.error
+
+    def find_segment(self, start):
+        # start counts back from the end of the edited text. The first
+        # segment was parsed as a leading statement, never sync to it
+        starts = self.starts
+        k = bisect_left(starts, start, max(self.gap, 1))
+        if k < len(starts) and starts[k] == start:
+            return k
+        return None
+
+    def commit(self, text, edited, i, k, segments, starts, first, error):
+        self.text = text
+        source = self.source
+        source.text = source.decoded = text
+        source.size = len(text)
+        source.line_starts = None
+        self.first = first
+        self.error = error
+        if error is not None:
+            return self.discard(edited)
+        self.segments[i:k] = segments
+        self.starts[i:k] = starts
+        self.nodes[i:k] = [segment.node for segment in segments]
+        self.gap = i + len(starts)
+
+    def discard(self, edited):
+        # the first statement failed: the segments after the edit are kept
+        # and the ones between it and the edit are dropped. The first stays
+        # in place of the failing one. All of them count from the end here
+        if not self.segments or self.start_of(len(self.segments) - 1) < edited:
+            self.segments, self.starts, self.nodes = [], [], []
+            self.gap = 0
+            return
+        k = bisect_left(self.starts, edited - len(self.text), 1)
+        del self.segments[1:k]
+        del self.starts[1:k]
+        del self.nodes[1:k]
+
+    def parse(self):
+        if self.error is not None:
+            return None, self.error
+        tail = self.segments[-1]
+        if tail.error is not None:
+            return None, tail.error
+        tree = n.ListNode(self.nodes[:-1], self.first, tail.region.base + tail.origin + tail.end)
+        # the tree keeps the regions its statements' offsets point into
+        tree.source = self.segments[:]
+        return tree, None
@@ -1,47 +1,80 @@
 from .tokens import *
 from .errs import RunTimeError, typeError
 from . import exe
-from typing import Union
-from numpy import float64
+from . import nodes
+from .loader import load_source
+from .pos import source_of
+from . import numeric
+import operator
 import time
 import os
 
 
-class SymbolTable:
-    def __init__(self, parent=None):
-        self.values = {}
-        self.types = {}
-        self.is_const = {}
-        self.parent = parent
+EMPTY = (None, None, None)
 
-    def get_var(self, name):
-        try:
-            value = self.values.get(name)
-            data_type = self.types.get(name)
-            if value == None and data_type == None:
-                if isinstance(name, NoneType):
-                    value, data_type = None, None
-                    return [value, data_type]
-                else:
-                    if self.parent == None:
-                        value, data_type = None, None
-                        return [value, data_type]
-                    else:
-                        return self.parent.get_var(name)
-        except TypeError:
-            value, data_type = None, None
-            
 
-        return [value, data_type]
+class Layout:
+    # the slot of each variable in the frames of one function body, or of
+    # the global table; the resolver hands them out, parameters first
+    __slots__ = ("slots", "names", "profile")
 
-    def set_var(self, name: str, data_type: str, value: any, const: bool):
-        self.values[name] = value
-        self.types[name] = data_type
-        self.is_const[name] = const
+    def __init__(self, names=()):
+        self.slots = {}
+        self.names = []
+        # the body's tiering profile, shared like the layout by every
+        # Function value made from the body and collected along with them
+        self.profile = None
+        for name in names:
+            self.slot_of(name)
 
-    def re_assign_var(self, name, value, node, ctx, res):
-        var_data_type = self.types[name]
-        const = self.is_const.get(name)
+    def slot_of(self, name):
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = self.slots[name] = len(self.names)
+            self.names.append(name)
+        return slot
+
+
+class SymbolTable:
+    def __init__(self, parent=None, layout=None):
+        self.layout = layout if layout is not None else Layout()
+        # (value, type, is const) by slot, None where this frame never set it
+        self.cells = [None] * len(self.layout.names)
+        self.parent = parent
+
+    def get(self, slot):
+        cells = self.cells
+        if slot < len(cells):
+            cell = cells[slot]
+            if cell is not None and (cell[0] is not None or cell[1] is not None):
+                return cell
+        # the callers' frames number their variables their own way
+        layout = self.layout
+        name = layout.names[slot]
+        table = self.parent
+        while table is not None:
+            if table.layout is not layout:
+                layout = table.layout
+                slot = layout.slots.get(name)
+            if slot is not None and slot < len(table.cells):
+                cell = table.cells[slot]
+                if cell is not None and (cell[0] is not None or cell[1] is not None):
+                    return cell
+            table = table.parent
+        return EMPTY
+
+    def set(self, slot, data_type, value, const):
+        cells = self.cells
+        if slot >= len(cells):
+            cells.extend([None] * (slot + 1 - len(cells)))
+        cells[slot] = (value, data_type, const)
+
+    def reassign(self, slot, value, node, ctx, res):
+        cells = self.cells
+        if slot >= len(cells) or cells[slot] is None:
+            # only a variable of this frame can be reassigned
+            raise KeyError(node.var_name_tok.value)
+        _, var_data_type, const = cells[slot]
         if const:
             return res.fail(
                 RunTimeError(
@@ -51,19 +84,30 @@ class SymbolTable:
                     ctx,
                 )
             )
-        self.values[name] = value
-        self.types[name] = var_data_type
+        cells[slot] = (value, var_data_type, const)
+
+    def is_const_at(self, slot):
+        if slot < len(self.cells) and self.cells[slot] is not None:
+            return self.cells[slot][2]
+        return RTResult().fail("Variable is not defined!")
+
+    def get_var(self, name):
+        return self.get(self.layout.slot_of(name))
+
+    def set_var(self, name: str, data_type: str, value: any, const: bool):
+        self.set(self.layout.slot_of(name), data_type, value, const)
+
+    def re_assign_var(self, name, value, node, ctx, res):
+        return self.reassign(self.layout.slot_of(name), value, node, ctx, res)
 
     def remove_var(self, name):
-        del self.values[name]
-        del self.types[name]
-        del self.is_const[name]
+        slot = self.layout.slots.get(name)
+        if slot is None or slot >= len(self.cells) or self.cells[slot] is None:
+            raise KeyError(name)
+        self.cells[slot] = None
 
     def is_var_const(self, name):
-        try:
-            return self.is_const[name]
-        except KeyError:
-            return RTResult().fail("Variable is not defined!")
+        return self.is_const_at(self.layout.slot_of(name))
 
 
 class RTResult:
@@ -116,17 +160,54 @@ class RTResult:
         return self.error or self.func_ret or self.loop_advance or self.loop_break
 
 
+# what makes RTResult.should_ret() true, in the order it checks them
+ERROR, RETURN, ADVANCE, BREAK = range(4)
+
+
+# how the compiled backends carry an RTResult that should_ret() out of the
+# Python frames between the node that set it and the one that handles it
+class Signal(Exception):
+    def __init__(self, kind, value):
+        self.kind = kind
+        self.value = value
+
+
+def signal_of(res):
+    if res.error:
+        return Signal(ERROR, res.error)
+    if res.func_ret:
+        return Signal(RETURN, res.func_ret)
+    if res.loop_advance:
+        return Signal(ADVANCE, None)
+    return Signal(BREAK, None)
+
+
 class Interpreter:
+    # node class -> visit_ function, built once below and shared by every
+    # Interpreter, including the one each Function.execute makes; node
+    # classes also carry theirs as `interpret`, which visit tries first
+    handlers = {}
+
     def __init__(self):
         pass
 
     def visit(self, node, ctx):
-        self.method_name = f"visit_{type(node).__name__}"
-        method = getattr(self, self.method_name, self.no_visit)
-        return method(node, ctx)
+        try:
+            handler = type(node).interpret
+        except AttributeError:
+            handler = self.handler(node)
+        return handler(self, node, ctx)
+
+    def handler(self, node):
+        # for classes that cannot carry one, like None's
+        cls = type(node)
+        handler = Interpreter.handlers.get(cls)
+        if handler is None:
+            handler = Interpreter.handlers[cls] = getattr(Interpreter, f"visit_{cls.__name__}", Interpreter.no_visit)
+        return handler
 
     def no_visit(self, node, ctx):
-        raise Exception(f"Method {self.method_name} is not defined")
+        raise Exception(f"Method visit_{type(node).__name__} is not defined")
 
     def visit_IntegerNode(self, node, ctx):
         res = RTResult()
@@ -140,17 +221,27 @@ class Interpreter:
             value=Double(node.tok.value).set_context(ctx).set_pos(node.start, node.end)
         )
 
-    def visit_BinOpNode(self, node, ctx):
+    def visit_ConstNode(self, node, ctx):
+        value = node.value
+        if value.context is not ctx:
+            value = node.value = value.bind(ctx)
+        return RTResult().success(value)
+
+    def operands(self, node, ctx):
         res = RTResult()
         left = res.log(self.visit(node.leftn, ctx))
         right = res.log(self.visit(node.rightn, ctx))
-        err, result = None, None
         if res.should_ret():
+            return res, None, None
+        if left == None or right == None:
+            return res.fail(RunTimeError(node.start, node.end, "Undifined variable detected in binary operaion", ctx)), None, None
+        return res, left, right
+
+    def visit_BinOpNode(self, node, ctx):
+        res, left, right = self.operands(node, ctx)
+        if left is None:
             return res
-        if left == None:
-            return res.fail(RunTimeError(node.start, node.end, "Undifined variable detected in binary operaion", ctx))
-        if right == None:
-            return res.fail(RunTimeError(node.start, node.end, "Undifined variable detected in binary operaion", ctx))
+        err, result = None, None
         match node.op.value:
             case "+":
                 result, err = left.addition(right)
@@ -204,7 +295,7 @@ class Interpreter:
     def visit_VarAccessNode(self, node, ctx):
         res = RTResult()
         var_name = node.var_name_tok.value
-        value = ctx.symbol_table.get_var(var_name)[0]
+        value = ctx.symbol_table.get(node.slot)[0]
 
         if not value:
             return res.fail(
@@ -218,7 +309,6 @@ class Interpreter:
 
     def visit_VarAssignNode(self, node, ctx):
         res = RTResult()
-        var_name = node.var_name_tok.value
         var_type = node.var_type_tok.value
         value = res.log(self.visit(node.value_node, ctx))
         match var_type:
@@ -236,29 +326,32 @@ class Interpreter:
         if res.should_ret():
             return res
         if isinstance(value, var_type):
-            ctx.symbol_table.set_var(var_name, var_type, value, is_const)
+            ctx.symbol_table.set(node.slot, var_type, value, is_const)
             return res.success(value)
         else:
             if var_type == Double and isinstance(value, Integer):
                 value = Double(value.value)
-                ctx.symbol_table.set_var(var_name, var_type, value, is_const)
-                return res.success(value) 
-                return res.fail(
-                    typeError(
-                        node.start,
-                        node.end,
-                        f"Cannot convert type '{type(value).__name__}' to '{var_type.__name__}''",
-                    )
+                ctx.symbol_table.set(node.slot, var_type, value, is_const)
+                return res.success(value)
+            return res.fail(
+                typeError(
+                    node.start,
+                    node.end,
+                    f"Cannot convert type '{type(value).__name__}' to '{var_type.__name__}'",
                 )
+            )
 
     def visit_VarReAssignNode(self, node, ctx):
 
         res = RTResult()
-        var_name = node.var_name_tok.value
         value_ = res.log(self.visit(node.value_node, ctx))
         if res.should_ret():
             return res
-        if ctx.symbol_table.is_var_const(var_name):
+        return self.reassign(node, value_, ctx, res)
+
+    def reassign(self, node, value_, ctx, res):
+        var_name = node.var_name_tok.value
+        if ctx.symbol_table.is_const_at(node.slot):
             return res.fail(
                 RunTimeError(
                     node.start,
@@ -268,97 +361,98 @@ class Interpreter:
                 )
             )
 
+        current, data_type, _ = ctx.symbol_table.get(node.slot)
         match node.op:
             case "=":
-                ctx.symbol_table.re_assign_var(var_name, value_, node, ctx, res)
+                ctx.symbol_table.reassign(node.slot, value_, node, ctx, res)
             case "+":
-                if ctx.symbol_table.get_var(var_name)[1] == Integer or isinstance(ctx.symbol_table.get_var(var_name)[0], Integer):
+                if data_type == Integer or isinstance(current, Integer):
                     r = Integer(
-                        ctx.symbol_table.get_var(var_name)[0].value + value_.value
+                        current.value + value_.value
                     )
-                    ctx.symbol_table.re_assign_var(var_name, r, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, r, node, ctx, res)
                     value_ = r
-                elif ctx.symbol_table.get_var(var_name)[1] == Double or isinstance(ctx.symbol_table.get_var(var_name)[0], Double):
+                elif data_type == Double or isinstance(current, Double):
                     r = Double(
-                        ctx.symbol_table.get_var(var_name)[0].value + value_.value
+                        current.value + value_.value
                     )
-                    ctx.symbol_table.re_assign_var(var_name, r, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, r, node, ctx, res)
                     value_ = r
-                elif ctx.symbol_table.get_var(var_name)[1] == List or isinstance(ctx.symbol_table.get_var(var_name)[0], List):
-                    new = ctx.symbol_table.get_var(var_name)[0].elements
+                elif data_type == List or isinstance(current, List):
+                    new = current.elements
                     new.append(value_.value)
                     r = List(new)
-                    ctx.symbol_table.re_assign_var(var_name, r, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, r, node, ctx, res)
                     value_ = r
             case "-":
-                if ctx.symbol_table.get_var(var_name)[1] == Integer or isinstance(ctx.symbol_table.get_var(var_name)[0], Integer):
+                if data_type == Integer or isinstance(current, Integer):
                     r = Integer(
-                        ctx.symbol_table.get_var(var_name)[0].value - value_.value
+                        current.value - value_.value
                     )
-                    ctx.symbol_table.re_assign_var(var_name, r, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, r, node, ctx, res)
                     value_ = r
-                elif ctx.symbol_table.get_var(var_name)[1] == Double or isinstance(ctx.symbol_table.get_var(var_name)[0], Double):
+                elif data_type == Double or isinstance(current, Double):
                     r = Double(
-                        ctx.symbol_table.get_var(var_name)[0].value - value_.value
+                        current.value - value_.value
                     )
-                    ctx.symbol_table.re_assign_var(var_name, r, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, r, node, ctx, res)
                     value_ = r
-                elif ctx.symbol_table.get_var(var_name)[1] == String or isinstance(ctx.symbol_table.get_var(var_name)[0], String):
+                elif data_type == String or isinstance(current, String):
                     r = String(
-                        ctx.symbol_table.get_var(var_name)[0].value + value_.value
+                        current.value + value_.value
                     )
-                    ctx.symbol_table.re_assign_var(var_name, r, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, r, node, ctx, res)
                     value_ = r
-                elif ctx.symbol_table.get_var(var_name)[1] == List or isinstance(ctx.symbol_table.get_var(var_name)[0], List):
-                    new = ctx.symbol_table.get_var(var_name)[0].elements
+                elif data_type == List or isinstance(current, List):
+                    new = current.elements
                     new.pop(value_.value)
                     r = List(new)
-                    ctx.symbol_table.re_assign_var(var_name, r, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, r, node, ctx, res)
                     value_ = r
             case "*":
-                if ctx.symbol_table.get_var(var_name)[1] == Integer or isinstance(ctx.symbol_table.get_var(var_name)[0], Integer):
+                if data_type == Integer or isinstance(current, Integer):
                     r = Integer(
-                        ctx.symbol_table.get_var(var_name)[0].value * value_.value
+                        current.value * value_.value
                     )
-                    ctx.symbol_table.re_assign_var(var_name, r, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, r, node, ctx, res)
                     value_ = r
-                elif ctx.symbol_table.get_var(var_name)[1] == Double or isinstance(ctx.symbol_table.get_var(var_name)[0], Double):
+                elif data_type == Double or isinstance(current, Double):
                     r = Double(
-                        ctx.symbol_table.get_var(var_name)[0].value * value_.value
+                        current.value * value_.value
                     )
-                    ctx.symbol_table.re_assign_var(var_name, r, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, r, node, ctx, res)
                     value_ = r
-                elif ctx.symbol_table.get_var(var_name)[1] == String or isinstance(ctx.symbol_table.get_var(var_name)[0], String):
+                elif data_type == String or isinstance(current, String):
                     r = String(
-                        ctx.symbol_table.get_var(var_name)[0].value * value_.value
+                        current.value * value_.value
                     )
-                    ctx.symbol_table.re_assign_var(var_name, r, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, r, node, ctx, res)
                     value_ = r
-                elif ctx.symbol_table.get_var(var_name)[1] == List or isinstance(ctx.symbol_table.get_var(var_name)[0], List):
-                    new = ctx.symbol_table.get_var(var_name)[0].elements
+                elif data_type == List or isinstance(current, List):
+                    new = current.elements
                     new.extend(value_.elements)
                     r = List(new)
-                    ctx.symbol_table.re_assign_var(var_name, r, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, r, node, ctx, res)
                     value_ = r
             case "/":
-                if ctx.symbol_table.get_var(var_name)[1] == Integer or isinstance(ctx.symbol_table.get_var(var_name)[0], Integer):
+                if data_type == Integer or isinstance(current, Integer):
                     r = Integer(
-                        ctx.symbol_table.get_var(var_name)[0].value / value_.value
+                        current.value / value_.value
                     )
                     
-                    ctx.symbol_table.re_assign_var(var_name, r, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, r, node, ctx, res)
                     value_ = r
-                elif ctx.symbol_table.get_var(var_name)[1] == Double or isinstance(ctx.symbol_table.get_var(var_name)[0], Double):
+                elif data_type == Double or isinstance(current, Double):
                     
                     r = Double(
-                        ctx.symbol_table.get_var(var_name)[0].value / value_.value
+                        current.value / value_.value
                     )
-                    ctx.symbol_table.re_assign_var(var_name, r, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, r, node, ctx, res)
                     value_ = r
-                elif ctx.symbol_table.get_var(var_name)[1] == List or isinstance(ctx.symbol_table.get_var(var_name)[0], List):
-                    new = ctx.symbol_table.get_var(var_name)[0].elements
+                elif data_type == List or isinstance(current, List):
+                    new = current.elements
                     new = new[value_.value]
-                    ctx.symbol_table.re_assign_var(var_name, new, node, ctx, res)
+                    ctx.symbol_table.reassign(node.slot, new, node, ctx, res)
                     value_ = new
 
         return res.success(value_)
@@ -390,7 +484,7 @@ class Interpreter:
         res = RTResult()
         elements = []
         condition = None
-        start_value = ctx.symbol_table.get_var(node.var_name_tok.value)[0]
+        start_value = ctx.symbol_table.get(node.slot)[0]
 
         end_value = res.log(self.visit(node.end_value_node, ctx))
         if res.should_ret():
@@ -401,6 +495,7 @@ class Interpreter:
             return res
 
         i = start_value.value
+        profile = ctx.profile
         op_start = node.op_start.value
         op_end = node.op_end.value
 
@@ -417,9 +512,9 @@ class Interpreter:
                 condition = lambda: i <= end_value.value
 
         while condition():
-            ctx.symbol_table.re_assign_var(
-                node.var_name_tok.value, Integer(i), node, ctx, res
-            )
+            if profile is not None:
+                profile.loops += 1
+            ctx.symbol_table.reassign(node.slot, Integer(i), node, ctx, res)
             match op_end:
                 case "+=":
                     i += step_value.value
@@ -441,7 +536,7 @@ class Interpreter:
             if res.loop_break:
                 break
 
-            elements.append(value)
+            elements.append(owned(value))
             if res.should_ret():
                 return res
 
@@ -454,7 +549,10 @@ class Interpreter:
     def visit_WhileNode(self, node, ctx):
         res = RTResult()
         elements = []
+        profile = ctx.profile
         while True:
+            if profile is not None:
+                profile.loops += 1
             condition = res.log(self.visit(node.condition, ctx))
             if res.should_ret():
                 return res
@@ -475,7 +573,7 @@ class Interpreter:
             if res.loop_break:
                 break
 
-            elements.append(value)
+            elements.append(owned(value))
 
         return res.success(
             Integer.null
@@ -495,13 +593,13 @@ class Interpreter:
         body_node = node.exec_code
         arg_names = [arg_name.value for arg_name in node.arg_name_toks]
         func_value = (
-            Function(func_name, body_node, arg_names, node.auto_ret)
+            Function(func_name, body_node, arg_names, node.auto_ret, node.layout)
             .set_context(context)
             .set_pos(node.start, node.end)
         )
 
         if node.var_name_tok:
-            context.symbol_table.set_var(func_name, Function, func_value, False)
+            context.symbol_table.set(node.slot, Function, func_value, False)
 
         return res.success(func_value)
 
@@ -534,11 +632,178 @@ class Interpreter:
             )
         return res.success(return_value)
 
+    def visit_InlineCallNode(self, node, ctx):
+        call = node.call
+        value_to_call = ctx.symbol_table.get(call.caller.slot)[0]
+        if not isinstance(value_to_call, Function) or value_to_call.exec_code is not node.code:
+            return self.visit_CallFuncNode(call, ctx)
+
+        # the frame Function.execute would make, without its symbol table
+        res = RTResult()
+        frame = Context(value_to_call.name, ctx, call.start)
+        args = []
+        for arg_node in call.arg_nodes:
+            args.append(res.log(self.visit(arg_node, ctx)))
+            if res.should_ret():
+                return res
+        for arg in args:
+            arg.set_context(frame)
+        frame.args = args
+
+        value = res.log(self.visit(node.body, frame))
+        if res.should_ret():
+            return res
+        return res.success(value)
+
+    def visit_DirectCallNode(self, node, ctx):
+        call = node.call
+        func = ctx.symbol_table.get(call.caller.slot)[0]
+        if not isinstance(func, Function) or func.exec_code is not node.code:
+            return self.visit_CallFuncNode(call, ctx)
+
+        # the argument count was checked when the call was bound, so the
+        # function runs in its frame without being copied first
+        res = RTResult()
+        args = []
+        for arg_node in call.arg_nodes:
+            args.append(res.log(self.visit(arg_node, ctx)))
+            if res.should_ret():
+                return res
+        frame = Context(func.name, ctx, call.start)
+        frame.symbol_table = SymbolTable(ctx.symbol_table, func.layout)
+        func.populate_args(func.args, args, frame)
+        if exe.tiering.ENABLED:
+            return exe.tiering.run(func, self, frame, args)
+        return func.run_body(self, frame)
+
+    def visit_BuiltinCallNode(self, node, ctx):
+        call = node.call
+        if ctx.symbol_table.get(call.caller.slot)[0] is not node.target:
+            return self.visit_CallFuncNode(call, ctx)
+
+        res = RTResult()
+        args = []
+        for arg_node in call.arg_nodes:
+            args.append(res.log(self.visit(arg_node, ctx)))
+            if res.should_ret():
+                return res
+        func = node.func
+        exec_ctx = Context(func.name, ctx, func.pos_start)
+        exec_ctx.symbol_table = SymbolTable(ctx.symbol_table, func.layout)
+        func.populate_args(node.method.arg_names, args, exec_ctx)
+        value = res.log(node.method(exec_ctx))
+        if res.should_ret():
+            return res
+        return res.success(value)
+
+    def visit_InvariantNode(self, node, ctx):
+        # reuse the frame's last result while the variables it read are still
+        # bound to the same values; lists change in place, so they are never kept
+        table = ctx.symbol_table
+        values = tuple(table.get(slot)[0] for slot in node.slots)
+        kept = ctx.invariants.get(node)
+        if kept is not None and kept[0] == values:
+            return RTResult().success(kept[1].copy())
+
+        res = RTResult()
+        value = res.log(self.visit(node.node, ctx))
+        if res.should_ret():
+            return res
+        if type(value) in (Integer, Double, String) and not any(isinstance(v, List) for v in values):
+            ctx.invariants[node] = (values, value.copy())
+        return res.success(value)
+
+    def visit_ArgNode(self, node, ctx):
+        value = ctx.args[node.index]
+        try:
+            value = value.copy().set_pos(node.start, node.end).set_context(ctx)
+        except:
+            pass
+        return RTResult().success(value)
+
+    def visit_PowerNode(self, node, ctx):
+        res, left, right = self.operands(node, ctx)
+        if left is None:
+            return res
+        if not isinstance(left, Integer):
+            # a double power is rounded differently than repeated multiplication
+            result, err = left.powed_by(right)
+            return res.fail(err) if err else res.success(result.set_pos(node.start, node.end))
+
+        value = left.value
+        for _ in range(node.exponent - 1):
+            value *= left.value
+        return res.success(Integer(value).set_context(left.context).set_pos(node.start, node.end))
+
+    # the operand types of these were proven before the program ran, so
+    # they skip the type checks and go straight to the Python operation
+
+    def visit_IntOpNode(self, node, ctx):
+        res, left, right = self.operands(node, ctx)
+        if left is None:
+            return res
+        op, a, b = node.op.value, left.value, right.value
+        if op in WHOLE:
+            result = Integer(WHOLE[op](a, b))
+        elif op == "/":
+            if b == 0:
+                return res.fail(RunTimeError(right.pos_start, right.pos_end, "Division by zero", left.context))
+            result = left.number(a / b)[0]
+        else:
+            # a negative exponent gives a fraction
+            result = left.number(a**b)[0]
+        return res.success(result.set_context(left.context).set_pos(node.start, node.end))
+
+    def visit_DoubleOpNode(self, node, ctx):
+        res, left, right = self.operands(node, ctx)
+        if left is None:
+            return res
+        op, a, b = node.op.value, left.value, right.value
+        if op == "/":
+            if b == 0:
+                return res.fail(RunTimeError(right.pos_start, right.pos_end, "Division by zero", left.context))
+            result = Double(a / b)
+        elif op in ARITHMETIC:
+            result = Double(ARITHMETIC[op](a, b))
+        elif op == "==":
+            result = Integer(int(a == b))
+        else:
+            result = Double(int(COMPARISONS[op](a, b)))
+        return res.success(result.set_context(left.context).set_pos(node.start, node.end))
+
+    def visit_StringOpNode(self, node, ctx):
+        res, left, right = self.operands(node, ctx)
+        if left is None:
+            return res
+        op, a, b = node.op.value, left.value, right.value
+        if op == "+":
+            result = String(a + b)
+        elif op == "*":
+            result = String(a * b)
+        elif op == "/":
+            result = String(a[b])
+        else:
+            result = Integer(int(COMPARISONS[op](a, b)))
+        return res.success(result.set_context(left.context).set_pos(node.start, node.end))
+
+    def visit_SaveNode(self, node, ctx):
+        res = self.visit(node.node, ctx)
+        node.value = res.value
+        return res
+
+    def visit_ReuseNode(self, node, ctx):
+        # the value saved earlier in this expression, when it is one that
+        # evaluating the node again would rebuild exactly
+        value = node.save.value
+        if type(value) not in (Integer, Double, String):
+            return self.visit(node.node, ctx)
+        return RTResult().success(value.copy().set_pos(node.start, node.end))
+
     def visit_ListNode(self, node, ctx):
         res = RTResult()
         els = []
         for n in node.element_nodes:
-            els.append(res.log(self.visit(n, ctx)))
+            els.append(owned(res.log(self.visit(n, ctx))))
             if res.should_ret():
                 return res
         return res.success(List(els).set_context(ctx).set_pos(node.start, node.end))
@@ -562,22 +827,18 @@ class Interpreter:
     def visit_IncludeNode(self, node, ctx):
         res = RTResult()
         fn = node.node.tok
-        
-        if '#' in fn.value:
-            fn.value = fn.value.replace('#', '')
-            directory = fn.value.split('.')[0]
-            path = f'{os.path.dirname(os.path.abspath(__file__))}/../assets/libraries/{directory}/{fn.value}'
-            with open(f'{path}', 'r') as f:
-                code = f.read()
-                f.close()
-            r , e = exe.run(path, code)
+
+        if node.tree is not None:
+            # loaded and parsed by the optimizer already
+            r , e = exe.execute(node.tree)
             if e: return res.fail(e)
-        else:
-            with open(f'{fn.value}', 'r') as fl:
-                code = fl.read()
-                fl.close()
-            r , e = exe.run(fn.value.split('/')[-1], code)
-            if e: return res.fail(e)    
+            return res.success(Integer.null)
+
+        path, name = include_target(fn.value)
+        fn.value = fn.value.replace('#', '')
+        code = load_source(path)
+        r , e = exe.run(name, code)
+        if e: return res.fail(e)
         return res.success(Integer.null)
     
     def visit_NoneType(self, node, ctx):
@@ -666,75 +927,60 @@ class Integer(Value):
             self.value = int(value.value)
         self.str_type = "int"
 
+    def number(self, value):
+        # whole results stay integers
+        if value == int(value):
+            return Integer(value).set_context(self.context), None
+        return Double(value).set_context(self.context), None
+
     def addition(self, other):
-        if isinstance(other, Union[Integer, Double]):
-            return (
-                (Integer(self.value + other.value).set_context(self.context), None)
-                if self.value + other.value == int(self.value + other.value)
-                else (Double(self.value + other.value).set_context(self.context), None)
-            )
+        if isinstance(other, NUMBER_TYPES):
+            return self.number(self.value + other.value)
         else:
             return None, Value.illegal_operation(self, other)
 
     def subtraction(self, other):
-        if isinstance(other, Union[Integer, Double]):
-            return (
-                (Integer(self.value - other.value).set_context(self.context), None)
-                if self.value - other.value == int(self.value - other.value)
-                else (Double(self.value - other.value).set_context(self.context), None)
-            )
+        if isinstance(other, NUMBER_TYPES):
+            return self.number(self.value - other.value)
         else:
             return None, Value.illegal_operation(self, other)
 
     def multiplication(self, other):
-        if isinstance(other, Union[Integer, Double]):
-            return (
-                (Integer(self.value * other.value).set_context(self.context), None)
-                if self.value * other.value == int(self.value * other.value)
-                else (Double(self.value * other.value).set_context(self.context), None)
-            )
+        if isinstance(other, NUMBER_TYPES):
+            return self.number(self.value * other.value)
         elif isinstance(other, String):
             return String(self.value * other.value).set_context(self.context), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def division(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             if other.value == 0:
                 return None, RunTimeError(
                     other.pos_start, other.pos_end, "Division by zero", self.context
                 )
 
-            return (
-                (Integer(self.value / other.value).set_context(self.context), None)
-                if self.value / other.value == int(self.value / other.value)
-                else (Double(self.value / other.value).set_context(self.context), None)
-            )
+            return self.number(self.value / other.value)
         else:
             return None, Value.illegal_operation(self, other)
 
     def powed_by(self, other):
-        if isinstance(other, Union[Integer, Double]):
-            return (Integer(self.value**other.value).set_context(self.context)), (
-                None
-                if self.value**other.value == int(self.value**other.value)
-                else (Double(self.value**other.value).set_context(self.context), None)
-            )
+        if isinstance(other, NUMBER_TYPES):
+            return self.number(self.value**other.value)
         else:
             return None, Value.illegal_operation(self, other)
 
     def deq(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return (
-                (Integer(self.value == other.value).set_context(self.context), None)
-                if float64(self.value == other.value) == int(self.value == other.value)
-                else (Double(self.value == other.value).set_context(self.context), None)
+                Integer(int(self.value == other.value)).set_context(self.context),
+                None,
             )
         else:
             return None, Value.illegal_operation(self, other)
 
     def ne(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return (
                 Integer(int(self.value != other.value)).set_context(self.context),
                 None,
@@ -743,7 +989,7 @@ class Integer(Value):
             return None, Value.illegal_operation(self, other)
 
     def lt(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return (
                 Integer(int(self.value < other.value)).set_context(self.context),
                 None,
@@ -752,7 +998,7 @@ class Integer(Value):
             return None, Value.illegal_operation(self, other)
 
     def gt(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return (
                 Integer(int(self.value > other.value)).set_context(self.context),
                 None,
@@ -761,7 +1007,7 @@ class Integer(Value):
             return None, Value.illegal_operation(self, other)
 
     def lte(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return (
                 Integer(int(self.value <= other.value)).set_context(self.context),
                 None,
@@ -770,7 +1016,7 @@ class Integer(Value):
             return None, Value.illegal_operation(self, other)
 
     def gte(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return (
                 Integer(int(self.value >= other.value)).set_context(self.context),
                 None,
@@ -779,7 +1025,7 @@ class Integer(Value):
             return None, Value.illegal_operation(self, other)
 
     def anded(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return (
                 Integer(int(self.value and other.value)).set_context(self.context),
                 None,
@@ -788,7 +1034,7 @@ class Integer(Value):
             return None, Value.illegal_operation(self, other)
 
     def ored(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return (
                 Integer(int(self.value or other.value)).set_context(self.context),
                 None,
@@ -815,29 +1061,29 @@ class Integer(Value):
 class Double(Value):
     def __init__(self, value):
         super().__init__()
-        self.value = float64(value)
+        self.value = numeric.float64(value)
         self.str_type = "double"
 
     def addition(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return Double(self.value + other.value).set_context(self.context), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def subtraction(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return Double(self.value - other.value).set_context(self.context), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def multiplication(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return Double(self.value * other.value).set_context(self.context), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def division(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             if other.value == 0:
                 return None, RunTimeError(
                     other.pos_start, other.pos_end, "Division by zero", self.context
@@ -848,13 +1094,13 @@ class Double(Value):
             return None, Value.illegal_operation(self, other)
 
     def powed_by(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return Double(self.value**other.value).set_context(self.context), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def deq(self, other):
-        if isinstance(other, Union[Double, Integer]):
+        if isinstance(other, NUMBER_TYPES):
             return (
                 Integer(int(self.value == other.value)).set_context(self.context),
                 None,
@@ -863,7 +1109,7 @@ class Double(Value):
             return None, Value.illegal_operation(self, other)
 
     def ne(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return (
                 Double(int(self.value != other.value)).set_context(self.context),
                 None,
@@ -872,19 +1118,19 @@ class Double(Value):
             return None, Value.illegal_operation(self, other)
 
     def lt(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return Double(int(self.value < other.value)).set_context(self.context), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def gt(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return Double(int(self.value > other.value)).set_context(self.context), None
         else:
             return None, Value.illegal_operation(self, other)
 
     def lte(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return (
                 Double(int(self.value <= other.value)).set_context(self.context),
                 None,
@@ -893,7 +1139,7 @@ class Double(Value):
             return None, Value.illegal_operation(self, other)
 
     def gte(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return (
                 Double(int(self.value >= other.value)).set_context(self.context),
                 None,
@@ -902,7 +1148,7 @@ class Double(Value):
             return None, Value.illegal_operation(self, other)
 
     def anded(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return (
                 Double(int(self.value and other.value)).set_context(self.context),
                 None,
@@ -911,7 +1157,7 @@ class Double(Value):
             return None, Value.illegal_operation(self, other)
 
     def ored(self, other):
-        if isinstance(other, Union[Integer, Double]):
+        if isinstance(other, NUMBER_TYPES):
             return (
                 Double(int(self.value or other.value)).set_context(self.context),
                 None,
@@ -935,6 +1181,9 @@ class Double(Value):
         return str(self.value)
 
 
+NUMBER_TYPES = (Integer, Double)
+
+
 class String(Value):
     def __init__(self, value):
         super().__init__()
@@ -998,7 +1247,7 @@ class List(Value):
 
     def addition(self, other):
         new = self.copy()
-        new.elements.append(other)
+        new.elements.append(owned(other))
 
         return new, None
 
@@ -1054,7 +1303,7 @@ class BaseFunc(Value):
 
     def generate_ctx(self):
         ctx = Context(self.name, self.context, self.pos_start)
-        ctx.symbol_table = SymbolTable(ctx.parent.symbol_table)
+        ctx.symbol_table = SymbolTable(ctx.parent.symbol_table, self.layout)
         return ctx
 
     def check_args(self, arg_names, args):
@@ -1098,11 +1347,15 @@ class BaseFunc(Value):
 
 
 class Function(BaseFunc):
-    def __init__(self, name, exec_code, args, auto_ret):
+    def __init__(self, name, exec_code, args, auto_ret, layout=None, source=None):
         super().__init__(name)
         self.exec_code = exec_code
         self.args = args
         self.auto_ret = auto_ret
+        # the frame layout the resolver gave the body
+        self.layout = layout if layout is not None else Layout(args)
+        # the body's file may have been parsed by a tree that is gone
+        self.source = source or source_of(exec_code.start)
 
     def execute(self, args):
         res = RTResult()
@@ -1112,7 +1365,12 @@ class Function(BaseFunc):
         res.log(self.check_and_populate(self.args, args, ctx))
         if res.should_ret():
             return res
+        if exe.tiering.ENABLED:
+            return exe.tiering.run(self, itr, ctx, args)
+        return self.run_body(itr, ctx)
 
+    def run_body(self, itr, ctx):
+        res = RTResult()
         value = res.log(itr.visit(self.exec_code, ctx))
         if res.should_ret() and res.func_ret == None:
             return res
@@ -1121,7 +1379,7 @@ class Function(BaseFunc):
         return res.success(ret_val)
 
     def copy(self):
-        copy = Function(self.name, self.exec_code, self.args, self.auto_ret)
+        copy = Function(self.name, self.exec_code, self.args, self.auto_ret, self.layout, self.source)
         copy.set_context(self.context)
         copy.set_pos(self.pos_start, self.pos_end)
         return copy
@@ -1131,6 +1389,9 @@ class Function(BaseFunc):
 
 
 class BuiltInFunc(BaseFunc):
+    # every built-in's frame holds just its arguments
+    layout = Layout()
+
     def __init__(self, name):
         super().__init__(name)
 
@@ -1206,8 +1467,7 @@ class BuiltInFunc(BaseFunc):
         fn = fn[0].value
 
         try:
-            with open(fn, "r") as f:
-                script = f.read()
+            script = load_source(fn)
         except Exception as e:
             return RTResult().fail(RunTimeError(
                 self.pos_start, self.pos_end,
@@ -1246,12 +1506,135 @@ class NoneType(Value):
         return str(Integer.null)
 
 
+class Constant:
+    # a literal's value, shared by every evaluation of its ConstNode in one
+    # context; it is never changed in place, set_pos/set_context copy it
+    def __init__(self, value, pos_start, pos_end, context=None):
+        self.value = value.value
+        self.str_type = value.str_type
+        self.pos_start = pos_start
+        self.pos_end = pos_end
+        self.context = context
+
+    def bind(self, context):
+        return type(self)(self, self.pos_start, self.pos_end, context)
+
+    def set_pos(self, pos_start=None, pos_end=None):
+        return self.copy().set_pos(pos_start, pos_end)
+
+    def set_context(self, context=None):
+        return self.copy().set_context(context)
+
+
+class ConstInteger(Constant, Integer):
+    pass
+
+
+class ConstDouble(Constant, Double):
+    pass
+
+
+class ConstString(Constant, String):
+    pass
+
+
+CONSTANTS = {Integer: ConstInteger, Double: ConstDouble, String: ConstString}
+
+ARITHMETIC = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "^": operator.pow,
+    "**": operator.pow,
+}
+
+COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    ">": operator.gt,
+    "<=": operator.le,
+    ">=": operator.ge,
+    "and": lambda a, b: a and b,
+    "&": lambda a, b: a and b,
+    "or": lambda a, b: a or b,
+    "|": lambda a, b: a or b,
+}
+
+# integer operations whose result is always whole
+WHOLE = dict(COMPARISONS)
+WHOLE.update({"+": operator.add, "-": operator.sub, "*": operator.mul})
+
+# shared by the compiled backends, which each turn these into their own code
+# the Value method visit_BinOpNode calls for each operator
+METHODS = {
+    "+": "addition",
+    "-": "subtraction",
+    "*": "multiplication",
+    "/": "division",
+    "^": "powed_by",
+    "**": "powed_by",
+    "==": "deq",
+    "!=": "ne",
+    ">": "gt",
+    "<": "lt",
+    "<=": "lte",
+    ">=": "gte",
+}
+
+DECLARED = {"int": Integer, "double": Double, "string": String, "func": Function, "list": List}
+
+FOR_CONDITIONS = {
+    "==": lambda i, end: i == end,
+    ">": lambda i, end: i > end,
+    "<": lambda i, end: i < end,
+    ">=": lambda i, end: i >= end,
+    "<=": lambda i, end: i <= end,
+}
+
+
+def method_of(op):
+    if op.value in METHODS:
+        return METHODS[op.value]
+    if op.matches(TT_KEYWORD, "and") or op.matches(TT_AMPR, "&"):
+        return "anded"
+    if op.matches(TT_KEYWORD, "or") or op.matches(TT_LINE, "|"):
+        return "ored"
+    return None
+
+
+def owned(value):
+    # lists hand out their elements, which callers then change in place
+    return value.copy() if isinstance(value, Constant) else value
+
+
+def include_target(name):
+    # the file an include loads, and the name its errors are reported under
+    if '#' in name:
+        name = name.replace('#', '')
+        directory = name.split('.')[0]
+        path = f'{os.path.dirname(os.path.abspath(__file__))}/../assets/libraries/{directory}/{name}'
+        return path, path
+    return name, name.split('/')[-1]
+
+
 class Context:
     def __init__(self, display_name, parent=None, parent_entry_pos=None):
         self.display_name = display_name
         self.parent = parent
         self.parent_entry_pos = parent_entry_pos
         self.symbol_table = None
+        self.args = None
+        # the tiering profile of the function running in this frame
+        self.profile = None
+        # the operand values and result of each hoisted expression, by node
+        self.invariants = {}
+
+
+for cls in vars(nodes).values():
+    if isinstance(cls, type) and hasattr(Interpreter, f"visit_{cls.__name__}"):
+        Interpreter.handlers[cls] = cls.interpret = getattr(Interpreter, f"visit_{cls.__name__}")
+Interpreter.handlers[type(None)] = Interpreter.visit_NoneType
 
 
 BuiltInFunc.out = BuiltInFunc("out")
@@ -1,338 +1,227 @@
+import os
+import re
+from bisect import bisect_left
+from itertools import repeat
 from . import tokens
-from .token import Token
-from string import digits, ascii_letters
+from .token import Token, TokenArray, vals, KEYWORD_DATA_TYPES
 from .errs import *
-from .pos import Position
-from numpy import float64
-
-LETTERSDIGITS = digits + ascii_letters
+from .pos import register_source
+
+ESCAPE_CHARACTERS = {"n": "\n", "t": "\t", "a": "\a"}
+ESCAPE_RE = re.compile(r"\\(.?)", re.S)
+
+
+def build_token_regex(binary=False):
+    symbols = {
+        value: getattr(tokens, type_)
+        for type_, value in vals.items()
+        if type_ != "TT_TILDE"
+    }
+    symbols["**"] = tokens.TT_POW
+    ops = "|".join(re.escape(s) for s in sorted(symbols, key=len, reverse=True))
+
+    pattern = "|".join(
+        (
+            r"(?P<SKIP> +)",
+            r"(?P<NEWL>\r\n?|[\n$])" if binary else r"(?P<NEWL>[\n$])",
+            r"(?P<IDENT>[A-Za-z][A-Za-z0-9_]*)",
+            r"(?P<NUMBER>[0-9]+(?P<DOT>\.[0-9]*)?)",
+            rf"(?P<OP>{ops})",
+            r'(?P<STRING>"(?P<BODY>(?:[^"\\]|\\.)*)(?:"|\\?\Z))',
+            r"(?P<COMMENT>~+[^~]*(?:~|\Z))",
+            r"(?P<BANG>!)",
+        )
+    )
+    if binary:
+        pattern = pattern.encode()
+        symbols = {value.encode(): type_ for value, type_ in symbols.items()}
+    return re.compile(pattern, re.S), symbols
+
+
+TOKEN_RE, SYMBOLS = build_token_regex()
+BYTES_TOKEN_RE, BYTES_SYMBOLS = build_token_regex(binary=True)
+QUOTES = ('"', b'"')
+KEYWORD_SET = frozenset(tokens.KEYWORDS) | frozenset(tokens.DATA_TYPES)
+PARALLEL_MIN_CHUNK = 1 << 20
+
+
+def unescape(body):
+    if "\\" not in body:
+        return body
+    return ESCAPE_RE.sub(lambda m: ESCAPE_CHARACTERS.get(m.group(1), m.group(1)), body)
+
+
+def char_at(code, index):
+    if isinstance(code, str):
+        return code[index]
+    return bytes(code[index:index + 4]).decode("utf-8", "replace")[0]
+
+
+def chunk_bounds(code, parts, min_chunk):
+    size = len(code)
+    step = max(size // parts, min_chunk, 1)
+    newline = "\n" if isinstance(code, str) else b"\n"
+    bounds = [0]
+    while bounds[-1] + step < size:
+        cut = code.find(newline, bounds[-1] + step) + 1
+        if cut <= 0 or cut == size:
+            break
+        bounds.append(cut)
+    bounds.append(size)
+    return bounds
+
+
+def lex_chunk(fn, text, base, last):
+    lexer = Lexer(fn, text, base)
+    toks = TokenArray(lexer.iter_tokens())
+    keep = len(toks) - 1
+    if not last and not lexer.error:
+        # the tail after the last newline may belong to a string or comment
+        # that started in this chunk and continues into the next one
+        keep = max(toks.kinds.tobytes().rfind(tokens.TOKEN_KINDS[tokens.TT_NEWL]), 0)
+    toks.interned = {}
+    return toks, keep, lexer.error
 
 
 class Lexer:
-    def __init__(self, fn, code):
+    def __init__(self, fn, code, base=None):
         self.code = code
         self.fn = fn
-        self.pos = Position(-1, 0, -1, fn, self.code)
-        self.current_char = None
-        self.advance()
-
-    def advance(self):
-        self.pos.advance(self.current_char)
-        self.current_char = (
-            self.code[self.pos.index] if self.pos.index < len(self.code) else None
-        )
-
-    def back(self):
-        self.pos.back(self.current_char)
-        self.current_char = (
-            self.code[self.pos.index] if self.pos.index < len(self.code) else None
-        )
+        if base is None:
+            self.source = register_source(fn, code)
+            base = self.source.base
+        else:
+            self.source = None
+        self.base = base
+        self.error = None
 
     def bake_tokens(self):
-        toks = []
-        while self.current_char != None:
-            if self.current_char == " ":
-                self.advance()
-            elif self.current_char == "~":
-                self.make_comment()
-            elif self.current_char in ascii_letters:
-                toks.append(self.make_identifier())
-                self.advance()
-            elif self.current_char == "*":
-                toks.append(self.make_mul_power_eq())
-                self.advance()
-            elif self.current_char == "+":
-                toks.append(self.make_plus_eq())
-                self.advance()
-            elif self.current_char == "-":
-                toks.append(self.make_minus_eq())
-                self.advance()
-            elif self.current_char == "/":
-                toks.append(self.make_div_eq())
-                self.advance()
-            elif self.current_char == ")":
-                toks.append(Token(tokens.TT_RPAREN, start=self.pos))
-                self.advance()
-            elif self.current_char == "(":
-                toks.append(Token(tokens.TT_LPAREN, start=self.pos))
-                self.advance()
-            elif self.current_char == "^":
-                toks.append(Token(tokens.TT_POW, start=self.pos))
-                self.advance()
-            elif self.current_char == "=":
-                toks.append(self.make_eq())
-                self.advance()
-            elif self.current_char == ":":
-                toks.append(Token(tokens.TT_COLON, start=self.pos))
-                self.advance()
-            elif self.current_char == "!":
-                tok, err = self.make_not_eq()
-                if err:
-                    return None, err
-                toks.append(tok)
-                self.advance()
-            elif self.current_char == "<":
-                toks.append(self.make_less_than())
-                self.advance()
-            elif self.current_char == ">":
-                toks.append(self.make_greater_than())
-                self.advance()
-            elif self.current_char == "&":
-                toks.append(Token(tokens.TT_AMPR, start=self.pos))
-                self.advance()
-            elif self.current_char == "|":
-                toks.append(Token(tokens.TT_LINE, start=self.pos))
-                self.advance()
-            elif self.current_char == "{":
-                toks.append(Token(tokens.TT_LCRLBRCKT, start=self.pos))
-                self.advance()
-            elif self.current_char == "}":
-                toks.append(Token(tokens.TT_RCRLBRCKT, start=self.pos))
-                self.advance()
-            elif self.current_char == "[":
-                toks.append(Token(tokens.TT_LSQRBRCKT, start=self.pos))
-                self.advance()
-            elif self.current_char == "]":
-                toks.append(Token(tokens.TT_RSQRBRCKT, start=self.pos))
-                self.advance()
-            elif self.current_char == ";":
-                toks.append(Token(tokens.TT_SEMICOLON, start=self.pos))
-                self.advance()
-            elif self.current_char == '"':
-                toks.append(self.bake_string())
-                self.advance()
-            elif self.current_char == ",":
-                toks.append(Token(tokens.TT_COMMA, start=self.pos))
-                self.advance()
-            elif self.current_char in "$\n":
-                toks.append(Token(tokens.TT_NEWL, start=self.pos))
-                self.advance()
-            elif self.current_char in digits:
-                toks.append(self.bake_number())
-            else:
-                invalid_char = self.current_char
-                start_pos = self.pos.get_pos()
-                self.advance()
-                return [], InvalidCharError(start_pos, self.pos.get_pos(), invalid_char)
-        toks.append(Token(tokens.TT_EOF, start=self.pos))
-        
+        toks = list(self.iter_tokens())
+        if self.error:
+            return [], self.error
         return toks, None
 
-    def bake_number(self):
-        number_as_str = ""
-        dot: bool = False
-        start_pos = self.pos.get_pos()
-
-        while self.current_char != None and self.current_char in digits + ".":
-            if self.current_char == ".":
-                if dot:
-                    break
-                dot = True
-                number_as_str += "."
-
-            else:
-                number_as_str += self.current_char
-
-            self.advance()
+    def bake_token_array(self):
+        toks = TokenArray(self.iter_tokens())
+        if self.error:
+            return TokenArray(), self.error
+        return toks, None
 
-        if dot:
-            return Token(
-                tokens.TT_DOUBLE,
-                start_pos,
-                self.pos.get_pos(),
-                "double",
-                float64(number_as_str),
-            )
-        else:
-            return Token(
-                tokens.TT_INT, start_pos, self.pos.get_pos(), "int", int(number_as_str)
+    def bake_tokens_parallel(self, workers=None, min_chunk=PARALLEL_MIN_CHUNK):
+        code = self.code
+        base = self.base
+        size = len(code)
+        workers = workers or os.cpu_count() or 1
+        bounds = chunk_bounds(code, workers, min_chunk)
+        if len(bounds) <= 2:
+            return self.bake_token_array()
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        spans = list(zip(bounds, bounds[1:]))
+        last = [False] * (len(spans) - 1) + [True]
+        toks = TokenArray()
+        pos = 0
+
+        with ProcessPoolExecutor(min(workers, len(spans))) as pool:
+            chunks = pool.map(
+                lex_chunk,
+                repeat(self.fn),
+                (code[lo:hi] for lo, hi in spans),
+                (base + lo for lo, _ in spans),
+                last,
             )
+            for (lo, hi), (chunk, keep, error) in zip(spans, chunks):
+                lo += base
+                hi += base
+                starts = chunk.starts
+                # lex serially from the last trusted offset until we land on a
+                # token the chunk also starts, then take the chunk from there
+                for tok in self.iter_tokens(pos):
+                    if self.error:
+                        return TokenArray(), self.error
+                    if tok.start >= hi:
+                        pos = tok.start - base
+                        break
+                    if tok.start >= lo:
+                        k = bisect_left(starts, tok.start, 0, keep)
+                        if k < keep and starts[k] == tok.start:
+                            if error:
+                                self.error = error
+                                return TokenArray(), error
+                            toks.splice(chunk, k, keep)
+                            pos = starts[keep] - base
+                            break
+                    toks.append(tok)
+
+        toks.append(Token(tokens.TT_EOF, base + size))
+        return toks, None
 
-    def make_identifier(self):
-        as_str = ""
-        pos_start = self.pos.get_pos()
-
-        while self.current_char != None and self.current_char in LETTERSDIGITS + "_":
-            as_str += self.current_char
-            self.advance()
-        pos_end = self.pos.get_pos()
-        self.back()
-        tok_type = (
-            tokens.TT_KEYWORD
-            if as_str in tokens.DATA_TYPES or as_str in tokens.KEYWORDS
-            else tokens.TT_IDENTIFIER
-        )
-        data_type = None
-        match as_str:
-            case "string":
-                data_type = "string"
-            case "int":
-                data_type = "int"
-            case "double":
-                data_type = "double"
-        return Token(tok_type, pos_start, pos_end, data_type, as_str)
-
-    def make_comment(self):
-        start = self.pos.get_pos()
-        
-        self.advance()
-        
-        while self.current_char != '~':
-            self.advance()
-            if self.current_char == '~':
-                self.advance()
-                break
-    
-    def make_not_eq(self):
-        pos_start = self.pos.get_pos()
-        self.advance()
-
-        if self.current_char == "=":
-            self.advance()
-            end_pos = self.pos.get_pos()
-            return (Token(tokens.TT_NE, start=pos_start, end=end_pos), None)
-
-        else:
-            end_pos = self.pos.get_pos()
-            self.back()
-        return None, ExpectedCharError(pos_start, end_pos, "'=' after '!'")
-
-    def make_eq(self):
-        tok_type = tokens.TT_EQ
-
-        pos_start = self.pos.get_pos()
-        self.advance()
-
-        if self.current_char == "=":
-
-            tok_type = tokens.TT_DEQ
-
-            end_pos = self.pos.get_pos()
-        else:
-            end_pos = self.pos.get_pos()
-            self.back()
-        return Token(tok_type, start=pos_start, end=end_pos)
-
-    def make_less_than(self):
-        tok_type = tokens.TT_LT
-
-        pos_start = self.pos.get_pos()
-        self.advance()
-
-        if self.current_char == "=":
-
-            tok_type = tokens.TT_LTE
-
-            end_pos = self.pos.get_pos()
-
-        else:
-            end_pos = self.pos.get_pos()
-            self.back()
-        return Token(tok_type, start=pos_start, end=end_pos)
-
-    def make_greater_than(self):
-        tok_type = tokens.TT_GT
-        pos_start = self.pos.get_pos()
-        self.advance()
-
-        if self.current_char == "=":
-
-            tok_type = tokens.TT_GTE
-
-            end_pos = self.pos.get_pos()
-        else:
-            end_pos = self.pos.get_pos()
-            self.back()
-        return Token(tok_type, start=pos_start, end=end_pos)
-
-    def make_plus_eq(self):
-        tok_type = tokens.TT_PLUS
-
-        pos_start = self.pos.get_pos()
-        end_pos = None
-
-        self.advance()
-
-        if self.current_char == "=":
-            tok_type = tokens.TT_PLUSEQ
-
-        else:
-            end_pos = self.pos.get_pos()
-            self.back()
-        return Token(tok_type, pos_start, end_pos)
-
-    def make_minus_eq(self):
-        tok_type = tokens.TT_MINUS
-        pos_start = self.pos.get_pos()
-        self.advance()
-
-        if self.current_char == "=":
-            tok_type = tokens.TT_MINUSEQ
-            end_pos = self.pos.get_pos()
-        elif self.current_char == ">":
-            tok_type = tokens.TT_ARROW
-            end_pos = self.pos.get_pos()
-        else:
-            end_pos = self.pos.get_pos()
-            self.back()
-        return Token(tok_type, pos_start, end_pos)
-
-    def make_mul_power_eq(self):
-        tok_type = tokens.TT_MUL
-
-        pos_start = self.pos.get_pos()
-
-        self.advance()
-
-        if self.current_char == "=":
-            tok_type = tokens.TT_MULEQ
-
-            end_pos = self.pos.get_pos()
-        elif self.current_char == "*":
-            tok_type = tokens.TT_POW
-
-            end_pos = self.pos.get_pos()
-        else:
-            end_pos = self.pos.get_pos()
-            self.back()
-        return Token(tok_type, pos_start, end_pos)
-
-    def make_div_eq(self):
-        tok_type = tokens.TT_DIV
-        tok_value = "/"
-        pos_start = self.pos.get_pos()
-
-        self.advance()
-
-        if self.current_char == "=":
-            tok_type = tokens.TT_DIVEQ
-            tok_value = "/="
-            end_pos = self.pos.get_pos()
+    def iter_tokens(self, index=0):
+        code = self.code
+        base = self.base
+        binary = not isinstance(code, str)
+        if binary:
+            match = BYTES_TOKEN_RE.match
+            symbols = BYTES_SYMBOLS
         else:
-            end_pos = self.pos.get_pos()
-            self.back()
-        return Token(tok_type, start = pos_start, end = end_pos, value=tok_value)
-
-    def bake_string(self):
-        string = ""
-        pos_start = self.pos.get_pos()
-        escape_character = False
-        self.advance()
-
-        escape_characters = {"n": "\n", "t": "\t", "a" : "\a"}
-
-        while self.current_char != None and (
-            self.current_char != '"' or escape_character
-        ):
-            if escape_character:
-                string += escape_characters.get(self.current_char, self.current_char)
-                escape_character = False
-            else:
-                if self.current_char == "\\":
-                    escape_character = True
+            match = TOKEN_RE.match
+            symbols = SYMBOLS
+        size = len(code)
+
+        while index < size:
+            m = match(code, index)
+            start = base + index
+            if m is None:
+                self.error = InvalidCharError(start, start + 1, char_at(code, index))
+                yield Token(tokens.TT_EOF, start)
+                return
+
+            kind = m.lastgroup
+            end = m.end()
+
+            if kind == "SKIP":
+                pass
+            elif kind == "IDENT":
+                word = m.group()
+                if binary:
+                    word = word.decode()
+                if word in KEYWORD_SET:
+                    yield Token(
+                        tokens.TT_KEYWORD,
+                        start,
+                        base + end,
+                        KEYWORD_DATA_TYPES.get(word),
+                        word,
+                    )
                 else:
-                    string += self.current_char
-            self.advance()
-
-        
-        return Token(tokens.TT_STRING, pos_start, self.pos, "string", string)
+                    yield Token(tokens.TT_IDENTIFIER, start, base + end, None, word)
+            elif kind == "OP":
+                type_ = symbols[m.group()]
+                if type_ == tokens.TT_NE:
+                    yield Token(type_, start, start + 2)
+                else:
+                    yield Token(type_, start)
+            elif kind == "NEWL":
+                yield Token(tokens.TT_NEWL, start)
+            elif kind == "NUMBER":
+                if m.group("DOT") is None:
+                    yield Token(tokens.TT_INT, start, base + end, "int", int(m.group()))
+                else:
+                    yield Token(
+                        tokens.TT_DOUBLE, start, base + end, "double", float(m.group())
+                    )
+            elif kind == "STRING":
+                closing = end - 1 if code[end - 1:end] in QUOTES and end - index > 1 else end
+                body = m.group("BODY")
+                if binary:
+                    body = body.decode("utf-8", "replace")
+                yield Token(tokens.TT_STRING, start, base + closing, "string", unescape(body))
+            elif kind == "BANG":
+                self.error = ExpectedCharError(start, start + 1, "'=' after '!'")
+                yield Token(tokens.TT_EOF, start)
+                return
+
+            index = end
+
+        yield Token(tokens.TT_EOF, base + index)
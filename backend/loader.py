@@ -0,0 +1,28 @@
+import mmap
+import os
+
+# smaller files are read, mapping them costs more than it saves
+MAP_MIN = 1 << 20
+
+
+class Mapping(mmap.mmap):
+    # a mapped source file, closed once its tree is built; the path lets
+    # the text be read again if an error has to be shown from it
+    path = None
+
+
+def load_source(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MAP_MIN:
+            return f.read()
+        source = Mapping(f.fileno(), 0, access=mmap.ACCESS_READ)
+    source.path = path
+    return source
+
+
+def read_source(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return b""
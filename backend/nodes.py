@@ -1,12 +1,15 @@
 from typing import Union
+from .token import Token
 
 
 class IntegerNode:
+    __slots__ = ("tok", "start", "end")
+    data_type = "int"
+
     def __init__(self, tok: int):
         self.tok = tok
         self.start = self.tok.start
         self.end = self.tok.end
-        self.data_type = "int"
 
     def get_child(self):
         return self.data_type
@@ -16,11 +19,13 @@ class IntegerNode:
 
 
 class DoubleNode:
+    __slots__ = ("tok", "start", "end")
+    data_type = "double"
+
     def __init__(self, tok: float):
         self.tok = tok
         self.start = self.tok.start
         self.end = self.tok.end
-        self.data_type = "double"
 
     def get_child(self):
         return self.data_type
@@ -30,11 +35,13 @@ class DoubleNode:
 
 
 class StringNode:
+    __slots__ = ("tok", "start", "end")
+    data_type = "string"
+
     def __init__(self, tok: str):
         self.tok = tok
         self.start = self.tok.start
         self.end = self.tok.end
-        self.data_type = "string"
 
     def get_child(self):
         return self.data_type
@@ -43,7 +50,21 @@ class StringNode:
         return str(self.tok)
 
 
+class ConstNode:
+    __slots__ = ("value", "start", "end")
+
+    def __init__(self, value, start, end):
+        self.value = value
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return repr(self.value)
+
+
 class BinOpNode:
+    __slots__ = ("leftn", "op", "rightn", "start", "end")
+
     def __init__(self, leftn, op, rightn):
         self.leftn = leftn
         self.op = op
@@ -60,6 +81,8 @@ class BinOpNode:
 
 
 class UnaryOpNode:
+    __slots__ = ("op", "node", "start", "end")
+
     def __init__(self, op_tok, node: Union[IntegerNode, DoubleNode, BinOpNode]):
         self.op = op_tok
         self.node = node
@@ -74,15 +97,21 @@ class UnaryOpNode:
 
 
 class VarAccessNode:
+    __slots__ = ("var_name_tok", "slot", "start", "end")
+
     def __init__(self, var_name_tok):
         self.var_name_tok = var_name_tok
+        self.slot = None
         self.start = self.var_name_tok.start
         self.end = self.var_name_tok.end
 
 
 class VarAssignNode:
+    __slots__ = ("var_name_tok", "var_type_tok", "value_node", "is_const", "slot", "start", "end")
+
     def __init__(self, var_name_tok, var_type_tok, value_node, is_const):
         self.var_name_tok = var_name_tok
+        self.slot = None
         self.var_type_tok = var_type_tok
         self.value_node = value_node
         self.is_const = is_const
@@ -91,8 +120,11 @@ class VarAssignNode:
 
 
 class VarReAssignNode:
+    __slots__ = ("var_name_tok", "value_node", "op", "slot", "start", "end")
+
     def __init__(self, var_name_tok, value_node, op):
         self.var_name_tok = var_name_tok
+        self.slot = None
         self.value_node = value_node
         self.op = op
         self.start = self.var_name_tok.start
@@ -100,6 +132,8 @@ class VarReAssignNode:
 
 
 class IfNode:
+    __slots__ = ("cases", "else_case", "start", "end")
+
     def __init__(self, cases, else_case):
         self.cases = cases
         self.else_case = else_case
@@ -108,6 +142,11 @@ class IfNode:
 
 
 class ForNode:
+    __slots__ = (
+        "var_name_tok", "end_value_node", "step_value_node", "exec_node",
+        "op_start", "op_end", "should_return_null", "slot", "start", "end",
+    )
+
     def __init__(
         self,
         var_name_tok,
@@ -125,12 +164,15 @@ class ForNode:
         self.op_start = op_start
         self.op_end = op_end
         self.should_return_null = ret_null
+        self.slot = None
 
         self.start = self.var_name_tok.start
         self.end = self.exec_node.end
 
 
 class WhileNode:
+    __slots__ = ("condition", "exec_node", "should_return_null", "start", "end")
+
     def __init__(self, condition, exec_node, ret_null):
         self.condition = condition
         self.exec_node = exec_node
@@ -140,8 +182,13 @@ class WhileNode:
 
 
 class FuncDefNode:
+    __slots__ = ("var_name_tok", "arg_name_toks", "exec_code", "auto_ret", "slot", "layout", "start", "end")
+
     def __init__(self, var_name_tok, arg_name_toks, exec_code, auto_ret):
         self.var_name_tok = var_name_tok
+        self.slot = None
+        # the slots of the body's frames, given by the resolver
+        self.layout = None
         self.arg_name_toks = arg_name_toks
         self.exec_code = exec_code
         self.auto_ret = auto_ret
@@ -156,6 +203,8 @@ class FuncDefNode:
 
 
 class CallFuncNode:
+    __slots__ = ("caller", "arg_nodes", "start", "end")
+
     def __init__(self, caller, arg_nodes):
         self.caller = caller
         self.arg_nodes = arg_nodes
@@ -168,13 +217,19 @@ class CallFuncNode:
 
 
 class ListNode:
+    __slots__ = ("element_nodes", "source", "start", "end")
+
     def __init__(self, element_nodes, start, end):
         self.element_nodes = element_nodes
+        # set on the root of a parsed file, whose text it keeps alive
+        self.source = None
         self.start = start
         self.end = end
 
 
 class ReturnNode:
+    __slots__ = ("node", "start", "end")
+
     def __init__(self, node, start, end):
         self.node = node
         self.start = start
@@ -182,18 +237,176 @@ class ReturnNode:
 
 
 class AdvanceNode:
+    __slots__ = ("start", "end")
+
     def __init__(self, start, end):
         self.start = start
         self.end = end
 
 
 class BreakNode:
+    __slots__ = ("start", "end")
+
     def __init__(self, start, end):
         self.start = start
         self.end = end
 
 class IncludeNode:
+    __slots__ = ("node", "tree", "start", "end")
+
     def __init__(self, node, start, end):
         self.node = node
+        self.tree = None
         self.start = start
         self.end = end
+
+
+class InlineCallNode:
+    __slots__ = ("call", "code", "body", "start", "end")
+
+    def __init__(self, call, code, body):
+        self.call = call
+        self.code = code
+        self.body = body
+        self.start = call.start
+        self.end = call.end
+
+
+class DirectCallNode:
+    __slots__ = ("call", "code", "start", "end")
+
+    def __init__(self, call, code):
+        self.call = call
+        self.code = code
+        self.start = call.start
+        self.end = call.end
+
+
+class BuiltinCallNode:
+    __slots__ = ("call", "target", "func", "method", "start", "end")
+
+    def __init__(self, call, target, func, method):
+        self.call = call
+        self.target = target
+        self.func = func
+        self.method = method
+        self.start = call.start
+        self.end = call.end
+
+
+class InvariantNode:
+    __slots__ = ("node", "names", "slots", "start", "end")
+
+    def __init__(self, node, names):
+        self.node = node
+        self.names = names
+        self.slots = None
+        self.start = node.start
+        self.end = node.end
+
+
+class ArgNode:
+    __slots__ = ("index", "start", "end")
+
+    def __init__(self, index, start, end):
+        self.index = index
+        self.start = start
+        self.end = end
+
+
+class PowerNode:
+    __slots__ = ("leftn", "op", "rightn", "exponent", "start", "end")
+
+    def __init__(self, leftn, op, rightn):
+        self.leftn = leftn
+        self.op = op
+        self.rightn = rightn
+        self.exponent = rightn.value.value
+
+        self.start = self.leftn.start
+        self.end = self.rightn.end
+
+
+class SaveNode:
+    __slots__ = ("node", "value", "start", "end")
+
+    def __init__(self, node):
+        self.node = node
+        self.value = None
+        self.start = node.start
+        self.end = node.end
+
+
+class ReuseNode:
+    __slots__ = ("node", "save", "start", "end")
+
+    def __init__(self, node, save):
+        self.node = node
+        self.save = save
+        self.start = node.start
+        self.end = node.end
+
+
+class IntOpNode:
+    __slots__ = ("leftn", "op", "rightn", "start", "end")
+
+    def __init__(self, leftn, op, rightn):
+        self.leftn = leftn
+        self.op = op
+        self.rightn = rightn
+
+        self.start = self.leftn.start
+        self.end = self.rightn.end
+
+
+class DoubleOpNode:
+    __slots__ = ("leftn", "op", "rightn", "start", "end")
+
+    def __init__(self, leftn, op, rightn):
+        self.leftn = leftn
+        self.op = op
+        self.rightn = rightn
+
+        self.start = self.leftn.start
+        self.end = self.rightn.end
+
+
+class StringOpNode:
+    __slots__ = ("leftn", "op", "rightn", "start", "end")
+
+    def __init__(self, leftn, op, rightn):
+        self.leftn = leftn
+        self.op = op
+        self.rightn = rightn
+
+        self.start = self.leftn.start
+        self.end = self.rightn.end
+
+
+def walk(node):
+    stack = [node]
+    seen = set()
+    while stack:
+        item = stack.pop()
+        if isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif hasattr(item, "start") and id(item) not in seen:
+            seen.add(id(item))
+            yield item
+            if not isinstance(item, Token):
+                stack.extend(getattr(item, name, None) for name in item.__slots__)
+
+
+def binds(item):
+    # the name a statement assigns, if any
+    if isinstance(item, (VarAssignNode, VarReAssignNode, ForNode)):
+        return item.var_name_tok.value
+    if isinstance(item, FuncDefNode) and item.var_name_tok:
+        return item.var_name_tok.value
+    return None
+
+
+def shift_offsets(node, delta):
+    for item in walk(node):
+        item.start += delta
+        item.end += delta
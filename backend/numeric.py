@@ -0,0 +1,9 @@
+# NumPy takes longer to import than the rest of the interpreter, so it is
+# only loaded once a program actually builds a double. Call through the
+# module (numeric.float64) so the rebound name is picked up.
+
+
+def float64(value):
+    global float64
+    from numpy import float64
+    return float64(value)
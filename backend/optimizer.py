@@ -0,0 +1,507 @@
+import os
+import warnings
+from collections import Counter
+from . import nodes as n
+from . import interpreter
+from . import exe
+from . import typecheck
+from .loader import load_source
+from .token import Token
+from .tokens import TT_PLUS
+
+ENABLED = not os.environ.get("KROMIUM_NO_OPT")
+INLINE = not os.environ.get("KROMIUM_NO_INLINE")
+PEEPHOLE = not os.environ.get("KROMIUM_NO_PEEPHOLE")
+HOIST = not os.environ.get("KROMIUM_NO_HOIST")
+SPECIALIZE = not os.environ.get("KROMIUM_NO_SPECIALIZE")
+BIND = not os.environ.get("KROMIUM_NO_BIND")
+# folding runs the operation while compiling, even in code that never runs,
+# so keep it from building huge numbers or strings
+FOLD_MAX_EXPONENT = 64
+FOLD_MAX_BITS = 1 << 16
+FOLD_MAX_STRING = 4096
+# every call site gets its own copy of the body
+INLINE_MAX_NODES = 16
+# integer powers up to this are multiplied out
+POWER_MAX_EXPONENT = 4
+
+
+class Pass:
+    def visit(self, node):
+        method = getattr(self, f"visit_{type(node).__name__}", self.visit_children)
+        return method(node)
+
+    def visit_children(self, node):
+        for name in node.__slots__:
+            setattr(node, name, self.transform(getattr(node, name)))
+        return node
+
+    def transform(self, item):
+        if isinstance(item, list):
+            item[:] = [self.transform(x) for x in item]
+            return item
+        if isinstance(item, tuple):
+            return tuple(self.transform(x) for x in item)
+        if hasattr(item, "start") and not isinstance(item, Token):
+            return self.visit(item)
+        return item
+
+    def visit_IncludeNode(self, node):
+        # the interpreter reads the path straight off the string token, and
+        # an included tree is optimized on its own
+        return node
+
+    def visit_InlineCallNode(self, node):
+        # the body belongs to the callee
+        self.transform(node.call.arg_nodes)
+        return node
+
+    def visit_ReuseNode(self, node):
+        # the original expression only runs when the saved value can't be used
+        return node
+
+    def visit_DirectCallNode(self, node):
+        self.transform(node.call.arg_nodes)
+        return node
+
+    def visit_BuiltinCallNode(self, node):
+        self.transform(node.call.arg_nodes)
+        return node
+
+
+class Folder(Pass):
+    def __init__(self):
+        # constant subtrees are folded by running them, so the values and
+        # errors are exactly the ones the interpreter would produce
+        self.interpreter = interpreter.Interpreter()
+        self.ctx = interpreter.Context("<fold>")
+
+    def visit_IntegerNode(self, node):
+        return self.fold(node)
+
+    def visit_DoubleNode(self, node):
+        return self.fold(node)
+
+    def visit_StringNode(self, node):
+        return self.fold(node)
+
+    def visit_UnaryOpNode(self, node):
+        node.node = self.visit(node.node)
+        if isinstance(node.node, n.ConstNode):
+            return self.fold(node)
+        return node
+
+    def visit_BinOpNode(self, node):
+        node.leftn = self.visit(node.leftn)
+        node.rightn = self.visit(node.rightn)
+        if isinstance(node.leftn, n.ConstNode) and isinstance(node.rightn, n.ConstNode) and small_enough(node):
+            return self.fold(node)
+        return node
+
+    def fold(self, node):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            try:
+                res = self.interpreter.visit(node, self.ctx)
+            except Exception:
+                # crashes and overflow warnings are left for run time
+                return node
+        value = res.value
+        if res.error or type(value) not in interpreter.CONSTANTS:
+            return node
+        const = interpreter.CONSTANTS[type(value)](value, node.start, node.end)
+        return n.ConstNode(const, node.start, node.end)
+
+
+class Inliner(Pass):
+    def __init__(self, tree):
+        # a name qualifies when a single func statement binds it and nothing
+        # else in the program, included files counted, assigns it again;
+        # InlineCallNode still checks the binding before using the body
+        bound = Counter()
+        defs = {}
+        for item in n.walk(tree):
+            name = n.binds(item)
+            if name is not None:
+                bound[name] += 1
+            if isinstance(item, n.FuncDefNode):
+                bound.update(tok.value for tok in item.arg_name_toks)
+                if name is not None:
+                    defs[name] = item
+
+        self.functions = {}
+        for name, func in defs.items():
+            params = {tok.value: i for i, tok in enumerate(func.arg_name_toks)}
+            body = body_of(func)
+            if bound[name] == 1 and body is not None and inlinable(body, params) <= INLINE_MAX_NODES:
+                self.functions[name] = func, params, body
+
+    def visit_CallFuncNode(self, node):
+        self.visit_children(node)
+        if not isinstance(node.caller, n.VarAccessNode):
+            return node
+        found = self.functions.get(node.caller.var_name_tok.value)
+        if found is None or len(found[0].arg_name_toks) != len(node.arg_nodes):
+            return node
+        func, params, body = found
+        return n.InlineCallNode(node, func.exec_code, substitute(body, params))
+
+
+class Peephole(Pass):
+    # each expression is scanned in the order it is evaluated; a
+    # subexpression that repeats one evaluated earlier reuses its value,
+    # until a call (which can change any variable) or an operation that may
+    # change a list in place makes it stale
+    def __init__(self):
+        self.available = self.reused = self.saves = None
+
+    def visit_BinOpNode(self, node):
+        return self.expression(node)
+
+    def visit_UnaryOpNode(self, node):
+        return self.expression(node)
+
+    def visit_CallFuncNode(self, node):
+        return self.expression(node)
+
+    def expression(self, node):
+        # expressions nested in lists and the like get their own scan
+        outer = self.available, self.reused, self.saves
+        self.available, self.reused = {}, {}
+        node = self.scan(node)
+        self.saves = dict.fromkeys(self.reused.values())
+        node = self.wrap(node)
+        self.available, self.reused, self.saves = outer
+        return node
+
+    def scan(self, node):
+        if isinstance(node, n.BinOpNode) and small_power(node):
+            node = n.PowerNode(node.leftn, node.op, node.rightn)
+        if isinstance(node, (n.VarAccessNode, n.ConstNode)):
+            return node
+        if isinstance(node, n.CallFuncNode):
+            node.caller = self.scan(node.caller)
+            node.arg_nodes[:] = [self.scan(arg) for arg in node.arg_nodes]
+            self.available = {}
+            return node
+        if not isinstance(node, (n.BinOpNode, n.UnaryOpNode, n.PowerNode)):
+            node = self.visit(node)
+            self.available = {}
+            return node
+
+        key = expression_key(node)
+        if key in self.available:
+            self.reused[node] = self.available[key]
+            # it is evaluated again when the saved value can't be used
+            if any(map(changes_list, n.walk(node))):
+                self.forget_lists()
+            return node
+        for name in operands(node):
+            setattr(node, name, self.scan(getattr(node, name)))
+        if key is not None and not aliases(node):
+            self.available[key] = node
+        if changes_list(node):
+            self.forget_lists()
+        return node
+
+    def forget_lists(self):
+        self.available = {key: node for key, node in self.available.items() if not reads_list(node)}
+
+    def wrap(self, node):
+        if node in self.reused:
+            return n.ReuseNode(node, self.saves[self.reused[node]])
+        if isinstance(node, n.CallFuncNode):
+            node.caller = self.wrap(node.caller)
+            node.arg_nodes[:] = [self.wrap(arg) for arg in node.arg_nodes]
+        elif isinstance(node, (n.BinOpNode, n.UnaryOpNode, n.PowerNode)):
+            for name in operands(node):
+                setattr(node, name, self.wrap(getattr(node, name)))
+        if node in self.saves:
+            self.saves[node] = n.SaveNode(node)
+            return self.saves[node]
+        return node
+
+
+class Hoister(Pass):
+    # outer loops go first, so an expression is kept as whole as it can be
+    def visit_WhileNode(self, node):
+        invariants = Invariants(assigned(node.exec_node))
+        node.condition = invariants.visit(node.condition)
+        node.exec_node = invariants.visit(node.exec_node)
+        return self.visit_children(node)
+
+    def visit_ForNode(self, node):
+        invariants = Invariants(assigned(node.exec_node) | {node.var_name_tok.value})
+        node.exec_node = invariants.visit(node.exec_node)
+        return self.visit_children(node)
+
+
+class Invariants(Pass):
+    def __init__(self, assigned):
+        self.assigned = assigned
+
+    def visit_BinOpNode(self, node):
+        return self.hoist(node)
+
+    def visit_UnaryOpNode(self, node):
+        return self.hoist(node)
+
+    def visit_PowerNode(self, node):
+        return self.hoist(node)
+
+    def visit_FuncDefNode(self, node):
+        # the body runs in its own frame, not once per iteration
+        return node
+
+    def hoist(self, node):
+        names = reads(node)
+        if names is None or names & self.assigned:
+            return self.visit_children(node)
+        return n.InvariantNode(node, tuple(sorted(names)))
+
+
+class Specializer(Pass):
+    def __init__(self, tree, analysis=None):
+        # the type check's analysis of the tree before the other passes ran;
+        # they keep every operation they don't replace, with the same
+        # operands, so its types still hold
+        self.operands = (analysis or typecheck.analyze(tree)).types
+
+    def visit_BinOpNode(self, node):
+        kind = specialized(node.op.value, *self.operands.get(node, (None, None)))
+        self.visit_children(node)
+        return node if kind is None else kind(node.leftn, node.op, node.rightn)
+
+
+class Binder(Pass):
+    # a call by name goes straight to the function or builtin the name is
+    # expected to hold, with the argument count checked once here; the
+    # interpreter still looks the name up and falls back to a normal call
+    # when something else was bound to it
+    def __init__(self, tree):
+        self.defs = {}
+        for item in n.walk(tree):
+            if isinstance(item, n.FuncDefNode) and item.var_name_tok:
+                self.defs[item.var_name_tok.value] = item
+
+    def visit_CallFuncNode(self, node):
+        self.visit_children(node)
+        if not isinstance(node.caller, n.VarAccessNode):
+            return node
+        name = node.caller.var_name_tok.value
+        func = self.defs.get(name)
+        if func is not None:
+            if len(func.arg_name_toks) != len(node.arg_nodes):
+                return node
+            return n.DirectCallNode(node, func.exec_code)
+        target = exe.global_symbol_table.get_var(name)[0]
+        if not isinstance(target, interpreter.BuiltInFunc) or typecheck.arity(target) != len(node.arg_nodes):
+            return node
+        builtin = target.copy().set_pos(node.start, node.end)
+        return n.BuiltinCallNode(node, target, builtin, getattr(builtin, f"_{builtin.name}_"))
+
+
+def assigned(node):
+    return {name for name in map(n.binds, n.walk(node)) if name is not None}
+
+
+def reads(node):
+    # the variables a side effect free expression reads, or None
+    if isinstance(node, n.BinOpNode):
+        left, right = reads(node.leftn), reads(node.rightn)
+        return None if left is None or right is None else left | right
+    if isinstance(node, n.UnaryOpNode):
+        return reads(node.node)
+    if isinstance(node, n.PowerNode):
+        return reads(node.leftn)
+    if isinstance(node, n.ReuseNode):
+        # its SaveNode runs earlier in every evaluation, and is never hoisted
+        return reads(node.node)
+    if isinstance(node, n.VarAccessNode):
+        return frozenset((node.var_name_tok.value,))
+    if isinstance(node, (n.ConstNode, n.IntegerNode, n.DoubleNode, n.StringNode)):
+        return frozenset()
+    return None
+
+
+def small_power(node):
+    if node.op.value not in ("^", "**") or not isinstance(node.rightn, n.ConstNode):
+        return False
+    exponent = node.rightn.value
+    return type(exponent) is interpreter.ConstInteger and 2 <= exponent.value <= POWER_MAX_EXPONENT
+
+
+def operands(node):
+    if isinstance(node, n.UnaryOpNode):
+        return ("node",)
+    if isinstance(node, n.PowerNode):
+        return ("leftn",)
+    return ("leftn", "rightn")
+
+
+def expression_key(node):
+    # equal keys mean equal values, as long as no variable or list changed
+    if isinstance(node, n.VarAccessNode):
+        return "var", node.var_name_tok.value
+    if isinstance(node, n.ConstNode):
+        # repr tells 0.0 from -0.0
+        return "const", type(node.value), repr(node.value.value)
+    if isinstance(node, n.PowerNode):
+        left = expression_key(node.leftn)
+        return None if left is None else ("power", left, node.exponent)
+    if isinstance(node, n.UnaryOpNode):
+        operand = expression_key(node.node)
+        return None if operand is None else ("unary", node.op.type, node.op.value, operand)
+    if isinstance(node, n.BinOpNode):
+        left, right = expression_key(node.leftn), expression_key(node.rightn)
+        if left is None or right is None:
+            return None
+        return "binary", left, node.op.type, node.op.value, right
+    return None
+
+
+def lists(node):
+    # whether a node may evaluate to a list; only list operands give lists
+    if isinstance(node, (n.ConstNode, n.IntegerNode, n.DoubleNode, n.StringNode, n.PowerNode)):
+        return False
+    if isinstance(node, n.UnaryOpNode):
+        return node.op.type == TT_PLUS and lists(node.node)
+    if isinstance(node, n.BinOpNode):
+        if node.op.value in ("+", "-", "/"):
+            return lists(node.leftn)
+        if node.op.value == "*":
+            return lists(node.leftn) and lists(node.rightn)
+        return False
+    return True
+
+
+def changes_list(node):
+    # list +, - and * work on the elements the left list shares with its
+    # variable
+    if not isinstance(node, n.BinOpNode):
+        return False
+    if node.op.value in ("+", "-"):
+        return lists(node.leftn)
+    return node.op.value == "*" and lists(node.leftn) and lists(node.rightn)
+
+
+def aliases(node):
+    # indexing a list returns the element itself, not a new value, and
+    # unary + returns its operand
+    if isinstance(node, n.UnaryOpNode) and node.op.type == TT_PLUS:
+        return aliases(node.node)
+    return isinstance(node, n.BinOpNode) and node.op.value == "/" and lists(node.leftn)
+
+
+def reads_list(node):
+    return any(map(aliases, n.walk(node)))
+
+
+def small_enough(node):
+    left, right = node.leftn.value.value, node.rightn.value.value
+    op = node.op.value
+    if op in ("^", "**"):
+        if isinstance(right, str) or abs(right) > FOLD_MAX_EXPONENT:
+            return False
+        return not isinstance(left, int) or left.bit_length() * abs(right) <= FOLD_MAX_BITS
+    if op == "*":
+        if isinstance(left, str) and isinstance(right, int):
+            return len(left) * right <= FOLD_MAX_STRING
+        if isinstance(right, str) and isinstance(left, int):
+            return len(right) * left <= FOLD_MAX_STRING
+    return True
+
+
+def body_of(func):
+    if func.auto_ret:
+        return func.exec_code
+    # { return expr } behaves exactly like -> expr
+    statements = func.exec_code.element_nodes
+    if len(statements) == 1 and isinstance(statements[0], n.ReturnNode):
+        return statements[0].node
+    return None
+
+
+def inlinable(node, params):
+    # the size of a body built only from operators, literals and parameters,
+    # or infinity; such a body has no side effects and never needs a symbol
+    # table, so it can run in a bare frame
+    if isinstance(node, n.BinOpNode):
+        return 1 + inlinable(node.leftn, params) + inlinable(node.rightn, params)
+    if isinstance(node, n.UnaryOpNode):
+        return 1 + inlinable(node.node, params)
+    if isinstance(node, n.PowerNode):
+        return 1 + inlinable(node.leftn, params) + inlinable(node.rightn, params)
+    if isinstance(node, n.VarAccessNode) and node.var_name_tok.value in params:
+        return 1
+    if isinstance(node, (n.ConstNode, n.IntegerNode, n.DoubleNode, n.StringNode)):
+        return 1
+    return float("inf")
+
+
+def substitute(node, params):
+    if isinstance(node, n.VarAccessNode):
+        return n.ArgNode(params[node.var_name_tok.value], node.start, node.end)
+    if isinstance(node, (n.BinOpNode, n.PowerNode)):
+        return type(node)(substitute(node.leftn, params), node.op, substitute(node.rightn, params))
+    if isinstance(node, n.UnaryOpNode):
+        return n.UnaryOpNode(node.op, substitute(node.node, params))
+    if isinstance(node, n.ConstNode):
+        # each copy binds its value to its own frames
+        return n.ConstNode(node.value, node.start, node.end)
+    return node
+
+
+def specialized(op, left, right):
+    # the node kind that can skip the operand checks, when both operand
+    # types are certain
+    if not right or op not in typecheck.ARITHMETIC + typecheck.COMPARISONS:
+        return None
+    if left == typecheck.INT and right == typecheck.INT:
+        return n.IntOpNode
+    if left == typecheck.DOUBLE and right <= typecheck.NUMBER:
+        return n.DoubleOpNode
+    if left == typecheck.STRING:
+        if op in ("+", "==", "!=") and right == typecheck.STRING:
+            return n.StringOpNode
+        if op in ("*", "/") and right == typecheck.INT:
+            return n.StringOpNode
+    return None
+
+
+def load_includes(tree, including):
+    # top level includes run exactly once, so their trees can be loaded now
+    # and their functions inlined into this one
+    for statement in tree.element_nodes:
+        if not isinstance(statement, n.IncludeNode) or not isinstance(statement.node, n.StringNode):
+            continue
+        path, name = interpreter.include_target(statement.node.tok.value)
+        key = os.path.realpath(path)
+        if key in including:
+            continue
+        try:
+            node, error = exe.parse(name, load_source(path))
+        except (OSError, RecursionError):
+            # let the include fail when it runs, as it would have
+            continue
+        analysis = None
+        if not error and typecheck.ENABLED:
+            analysis, error = typecheck.check(node)
+        if not error:
+            statement.tree = optimize(node, including | {key}, analysis)
+
+
+def optimize(node, including=frozenset(), analysis=None):
+    node = Folder().visit(node)
+    if PEEPHOLE:
+        node = Peephole().visit(node)
+    if INLINE and isinstance(node, n.ListNode):
+        load_includes(node, including)
+        node = Inliner(node).visit(node)
+    if HOIST:
+        node = Hoister().visit(node)
+    if SPECIALIZE:
+        node = Specializer(node, analysis).visit(node)
+    if BIND:
+        node = Binder(node).visit(node)
+    return node
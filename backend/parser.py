@@ -1,9 +1,42 @@
-from numpy import float64
 from . import tokens as t
 from . import nodes as n
 from .errs import InvalidSyntaxError
 from .nodes import BinOpNode
-from .token import Token
+from .token import Token, TokenArray
+
+LOGIC_POWER = 1
+COMPARE_POWER = 2
+POW_POWER = 5
+
+BINARY_POWER = {
+    t.TT_AMPR: LOGIC_POWER,
+    t.TT_LINE: LOGIC_POWER,
+    t.TT_DEQ: COMPARE_POWER,
+    t.TT_NE: COMPARE_POWER,
+    t.TT_LT: COMPARE_POWER,
+    t.TT_GT: COMPARE_POWER,
+    t.TT_LTE: COMPARE_POWER,
+    t.TT_GTE: COMPARE_POWER,
+    t.TT_PLUS: 3,
+    t.TT_MINUS: 3,
+    t.TT_MUL: 4,
+    t.TT_DIV: 4,
+    t.TT_POW: POW_POWER,
+}
+KEYWORD_POWER = {"and": LOGIC_POWER, "or": LOGIC_POWER}
+UNARY_OPS = (t.TT_PLUS, t.TT_MINUS)
+
+# tokens a statement can start with; anywhere else statement() fails
+# without consuming a token, so statements() need not try it
+STATEMENT_FIRST = frozenset((
+    t.TT_INT, t.TT_DOUBLE, t.TT_STRING, t.TT_IDENTIFIER,
+    t.TT_LPAREN, t.TT_LSQRBRCKT, t.TT_PLUS, t.TT_MINUS,
+))
+STATEMENT_KEYWORDS = frozenset((
+    "return", "advance", "break", "include", "new", "not", "if", "for", "while", "func",
+))
+LOOKAHEAD = True
+
 
 class ParseRes:
     def __init__(self):
@@ -39,9 +72,58 @@ class ParseRes:
         return self
 
 
+class TokenStream:
+    def __init__(self, tokens, window=1024, lookbehind=64):
+        if isinstance(tokens, (list, TokenArray)):
+            self.buffer = tokens
+            self.source = iter(())
+            self.trim = False
+        else:
+            self.buffer = []
+            self.source = iter(tokens)
+            self.trim = True
+        self.offset = 0
+        self.pins = []
+        self.window = window
+        self.lookbehind = lookbehind
+
+    def get(self, idx):
+        buffer = self.buffer
+        i = idx - self.offset
+        if i < 0:
+            raise IndexError(f"Token {idx} was already released by the token stream")
+        if i >= len(buffer):
+            if self.trim and len(buffer) >= 2 * self.window:
+                self.release(idx)
+                i = idx - self.offset
+            while i >= len(buffer):
+                tok = next(self.source, None)
+                if tok is None:
+                    return None
+                buffer.append(tok)
+        return buffer[i]
+
+    def release(self, idx):
+        floor = min(self.pins[0], idx) if self.pins else idx
+        drop = floor - self.lookbehind - self.offset
+        if drop >= self.window:
+            del self.buffer[:drop]
+            self.offset += drop
+
+    def pin(self, idx):
+        self.pins.append(idx)
+
+    def unpin(self):
+        self.pins.pop()
+
+    def drain(self):
+        for _ in self.source:
+            pass
+
+
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens
+        self.tokens = tokens if isinstance(tokens, TokenStream) else TokenStream(tokens)
         self.tok_idx = -1
         self.advance()
 
@@ -56,11 +138,15 @@ class Parser:
         return self.current_tok
 
     def update_tok(self):
-        if self.tok_idx < len(self.tokens) and self.tok_idx >= 0:
-            self.current_tok = self.tokens[self.tok_idx]
+        if self.tok_idx >= 0:
+            tok = self.tokens.get(self.tok_idx)
+            if tok is not None:
+                self.current_tok = tok
 
     def parse(self):
-        res = self.statements()
+        return self.check_end(self.statements())
+
+    def check_end(self, res):
         if res.error and self.current_tok.type != t.TT_EOF:
             return res.fail(
                 InvalidSyntaxError(
@@ -80,10 +166,10 @@ class Parser:
         if tok.type in (t.TT_INT, t.TT_DOUBLE):
             res.log_advancement()
             self.advance()
-            if isinstance(tok.value, int):
+            if tok.type == t.TT_INT:
 
                 return res.success(n.IntegerNode(tok))
-            elif isinstance(tok.value, float64):
+            else:
                 return res.success(n.DoubleNode(tok))
 
         if tok.type in (t.TT_STRING):
@@ -189,26 +275,6 @@ class Parser:
             )
         )
 
-    def power(self):
-        return self.bin_op(self.CallFunc, (t.TT_POW,), self.factor)
-
-    def factor(self):
-        res = ParseRes()
-        tok = self.current_tok
-
-        if tok.type in (t.TT_PLUS, t.TT_MINUS):
-            res.log_advancement()
-            self.advance()
-            factor = res.log(self.factor())
-            if res.error:
-                return res
-            return res.success(n.UnaryOpNode(tok, factor))
-
-        return self.power()
-
-    def term(self):
-        return self.bin_op(self.factor, (t.TT_MUL, t.TT_DIV))
-
     def expr(self):
         res = ParseRes()
         if self.current_tok.matches(t.TT_KEYWORD, "new"):
@@ -260,13 +326,13 @@ class Parser:
                 return res.success(n.VarAssignNode(var_name, var_type, expr_, is_const))
             elif self.current_tok.type == t.TT_SEMICOLON:
                 if var_type.value == 'int':
-                    expr_ = n.IntegerNode(Token(t.TT_INT, self.current_tok.start.get_pos(), self.current_tok.end.get_pos(), "int", 0))
+                    expr_ = n.IntegerNode(Token(t.TT_INT, self.current_tok.start, self.current_tok.end, "int", 0))
                 elif var_type.value == 'double':
-                    expr_ = n.DoubleNode(Token(t.TT_DOUBLE, self.current_tok.start.get_pos(), self.current_tok.end.get_pos(), "double", 0))
+                    expr_ = n.DoubleNode(Token(t.TT_DOUBLE, self.current_tok.start, self.current_tok.end, "double", 0))
                 elif var_type.value == 'string':
-                    expr_ = n.StringNode(Token(t.TT_DOUBLE, self.current_tok.start.get_pos(), self.current_tok.end.get_pos(), "string", ""))
+                    expr_ = n.StringNode(Token(t.TT_DOUBLE, self.current_tok.start, self.current_tok.end, "string", ""))
                 elif var_type.value == 'list':
-                    expr_ = n.ListNode([], self.current_tok.start.get_pos(), self.current_tok.end.get_pos())
+                    expr_ = n.ListNode([], self.current_tok.start, self.current_tok.end)
                 else:
                     return res.fail(InvalidSyntaxError(var_type.start, var_type.end, "Invalid expression"))
                 return res.success(n.VarAssignNode(var_name, var_type, expr_, is_const))
@@ -280,17 +346,7 @@ class Parser:
                 )
         
 
-        node = res.log(
-            self.bin_op(
-                self.comp_expr,
-                (
-                    (t.TT_KEYWORD, "and"),
-                    (t.TT_KEYWORD, "or"),
-                    (t.TT_AMPR, "&"),
-                    (t.TT_LINE, "|"),
-                ),
-            )
-        )
+        node = res.log(self.binary_expr(LOGIC_POWER))
         if res.error:
             return res.fail(
                 InvalidSyntaxError(
@@ -301,37 +357,62 @@ class Parser:
             )
         return res.success(node)
 
-    def comp_expr(self):
+    def binary_expr(self, min_power):
         res = ParseRes()
+        tok = self.current_tok
 
-        if self.current_tok.matches(t.TT_KEYWORD, "not"):
-            op_tok = self.current_tok
+        if min_power <= COMPARE_POWER and tok.matches(t.TT_KEYWORD, "not"):
             res.log_advancement()
             self.advance()
+            node = res.log(self.binary_expr(COMPARE_POWER))
+            if res.error:
+                return res
+            if node is None:
+                return res.fail(self.expected_operand())
+            left = n.UnaryOpNode(tok, node)
+        elif tok.type in UNARY_OPS:
+            res.log_advancement()
+            self.advance()
+            node = res.log(self.binary_expr(POW_POWER))
+            if res.error:
+                return res
+            if node is None:
+                return res.fail(self.expected_operand())
+            left = n.UnaryOpNode(tok, node)
+        else:
+            left = res.log(self.CallFunc())
+            if res.error:
+                if min_power > COMPARE_POWER:
+                    return res
+                return res.fail(self.expected_operand())
 
-            node = res.log(self.comp_expr())
+        while True:
+            op_tok = self.current_tok
+            if op_tok.type == t.TT_KEYWORD:
+                power = KEYWORD_POWER.get(op_tok.value)
+            else:
+                power = BINARY_POWER.get(op_tok.type)
+            if power is None or power < min_power:
+                break
+            res.log_advancement()
+            self.advance()
+            # ^ is right associative, everything else binds to the left
+            right = res.log(self.binary_expr(power if power == POW_POWER else power + 1))
             if res.error:
                 return res
-            return res.success(n.UnaryOpNode(op_tok, node))
-        node = res.log(
-            self.bin_op(
-                self.arith_expr,
-                (t.TT_DEQ, t.TT_LTE, t.TT_GTE, t.TT_LT, t.TT_GT, t.TT_NE),
-            )
-        )
+            # quark() accepts the end of the input, which an operator may not
+            if right is None:
+                return res.fail(self.expected_operand())
+            left = BinOpNode(left, op_tok, right)
 
-        if res.error:
-            return res.fail(
-                InvalidSyntaxError(
-                    self.current_tok.start,
-                    self.current_tok.end,
-                    "Expected int, double, identifier, '+', '-', '(', '[' or 'not'",
-                )
-            )
-        return res.success(node)
+        return res.success(left)
 
-    def arith_expr(self):
-        return self.bin_op(self.term, (t.TT_PLUS, t.TT_MINUS))
+    def expected_operand(self):
+        return InvalidSyntaxError(
+            self.current_tok.start,
+            self.current_tok.end,
+            "Expected int, double, identifier, '+', '-', '(', '[' or 'not'",
+        )
 
     def if_expr(self):
         res = ParseRes()
@@ -393,6 +474,8 @@ class Parser:
             expr = res.log(self.expr())
             if res.error:
                 return res
+            if expr is None:
+                return res.fail(self.expected_operand())
             cases.append((condition, expr, False))
 
             all_cases = res.log(self.if_expr_b_or_c())
@@ -446,6 +529,8 @@ class Parser:
                 expr = res.log(self.statement())
                 if res.error:
                     return res
+                if expr is None:
+                    return res.fail(self.expected_operand())
                 else_case = (expr, False)
         
         return res.success(else_case)
@@ -765,6 +850,8 @@ class Parser:
             exe = res.log(self.expr())
             if res.error:
                 return res
+            if exe is None:
+                return res.fail(self.expected_operand())
 
             return res.success(n.FuncDefNode(var_name, arg_names, exe, True))
         elif self.current_tok.type == t.TT_LCRLBRCKT:
@@ -847,7 +934,7 @@ class Parser:
     def list_expr(self):
         res = ParseRes()
         element_nodes = []
-        pos_start = self.current_tok.start.get_pos()
+        pos_start = self.current_tok.start
 
         if self.current_tok.type != t.TT_LSQRBRCKT:
             return res.fail(
@@ -862,7 +949,7 @@ class Parser:
         if self.current_tok.type == t.TT_RSQRBRCKT:
             res.log_advancement()
             self.advance()
-            return res.success(n.ListNode([], pos_start, self.current_tok.end.get_pos()))
+            return res.success(n.ListNode([], pos_start, self.current_tok.end))
         else:
             element_nodes.append(res.log(self.expr()))
             if res.error:
@@ -893,49 +980,65 @@ class Parser:
         self.advance()
 
         return res.success(
-            n.ListNode(element_nodes, pos_start, self.current_tok.end.get_pos())
+            n.ListNode(element_nodes, pos_start, self.current_tok.end)
         )
 
     def statements(self):
         res = ParseRes()
         statements = []
-        pos_start = self.current_tok.start.get_pos()
+        pos_start = self.current_tok.start
 
-        while self.current_tok.type == t.TT_NEWL:
-            res.log_advancement()
-            self.advance()
-        statement = res.log(self.statement())
+        statement = self.first_statement(res)
         if res.error: return res
         statements.append(statement)
 
-        more_statements = True
-
         while True:
-            newline_count = 0
-            while self.current_tok.type == t.TT_NEWL:
-                res.log_advancement()
-                self.advance()
-                newline_count += 1
-            if newline_count == 0:
-                more_statements = False
-            
-            if not more_statements: break
-            statement = res.try_log(self.statement())
-            if not statement:
-                self.reverse(res.to_reverse_count)
-                more_statements = False
-                continue
+            statement = self.next_statement(res)
+            if not statement: break
             statements.append(statement)
 
         return res.success(n.ListNode(
         statements,
         pos_start,
-        self.current_tok.end.get_pos()
+        self.current_tok.end
         ))
 
+    def first_statement(self, res):
+        while self.current_tok.type == t.TT_NEWL:
+            res.log_advancement()
+            self.advance()
+        return res.log(self.statement())
+
+    def next_statement(self, res):
+        newline_count = 0
+        while self.current_tok.type == t.TT_NEWL:
+            res.log_advancement()
+            self.advance()
+            newline_count += 1
+        if newline_count == 0:
+            return None
+        if LOOKAHEAD and not self.can_start_statement():
+            return None
+
+        self.tokens.pin(self.tok_idx)
+        statement = res.try_log(self.statement())
+        self.tokens.unpin()
+        if not statement:
+            self.reverse(res.to_reverse_count)
+            while self.current_tok.type == t.TT_NEWL:
+                res.log_advancement()
+                self.advance()
+        return statement
+
+    def can_start_statement(self):
+        tok = self.current_tok
+        if tok.type == t.TT_KEYWORD:
+            return tok.value in STATEMENT_KEYWORDS
+        return tok.type in STATEMENT_FIRST
+
     def statement(self):
         res = ParseRes()
-        start = self.current_tok.start.get_pos()
+        start = self.current_tok.start
         
         if self.current_tok.matches(t.TT_KEYWORD, 'return'):
             res.log_advancement()
@@ -946,19 +1049,19 @@ class Parser:
             if expr == None:
                 self.reverse()
                 
-            return res.success(n.ReturnNode(expr, start, self.current_tok.end.get_pos()))
+            return res.success(n.ReturnNode(expr, start, self.current_tok.end))
         if self.current_tok.matches(t.TT_KEYWORD, 'advance'):
             res.log_advancement()
             self.advance()
 
                 
-            return res.success(n.AdvanceNode(start, self.current_tok.end.get_pos()))
+            return res.success(n.AdvanceNode(start, self.current_tok.end))
         if self.current_tok.matches(t.TT_KEYWORD, 'break'):
             res.log_advancement()
             self.advance()
 
                 
-            return res.success(n.BreakNode(start, self.current_tok.end.get_pos()))
+            return res.success(n.BreakNode(start, self.current_tok.end))
         
         if self.current_tok.matches(t.TT_KEYWORD, 'include'):
             res.log_advancement()
@@ -966,7 +1069,7 @@ class Parser:
             
             str_node = res.log(self.quark())
             
-            return res.success(n.IncludeNode(str_node, start, self.current_tok.end.get_pos()))
+            return res.success(n.IncludeNode(str_node, start, self.current_tok.end))
         
         expr = res.log(self.expr())
         if res.error: return res.fail(InvalidSyntaxError(
@@ -976,26 +1079,3 @@ class Parser:
         ))
         
         return res.success(expr)
-    
-    def bin_op(self, func_a, ops, func_b=None):
-        if func_b == None:
-            func_b = func_a
-
-        res = ParseRes()
-        left = res.log(func_a())
-        if res.error:
-            return res
-
-        while (
-            self.current_tok.type in ops
-            or (self.current_tok.type, self.current_tok.value) in ops
-        ):
-            op_tok = self.current_tok
-            res.log_advancement()
-            self.advance()
-            right = res.log(func_b())
-            if res.error:
-                return res
-            left = BinOpNode(left, op_tok, right)
-
-        return res.success(left)
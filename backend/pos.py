@@ -1,4 +1,11 @@
+import weakref
+from bisect import bisect_right
+from .loader import Mapping, read_source
+
+
 class Position:
+    __slots__ = ("index", "line", "column", "fn", "fcnt")
+
     def __init__(self, index, line, column, fn, fcnt):
         self.index = index
         self.line = line
@@ -6,22 +13,92 @@ class Position:
         self.fn = fn
         self.fcnt = fcnt
 
-    def advance(self, current_char=None):
-        self.index += 1
-        self.column += 1
-
-        if current_char == "\n":
-            self.line += 1
-            self.column = 0
-        return self
-    def back(self, current_char=None):
-        self.index -= 1
-        self.column -= 1
-
-        if current_char == "\n":
-            self.line -= 1
-            self.column = 0
-        return self
-
-    def get_pos(self):
-        return Position(self.index, self.line, self.column, self.fn, self.fcnt)
+
+class Source:
+    __slots__ = ("fn", "text", "path", "base", "size", "line_starts", "decoded", "__weakref__")
+
+    def __init__(self, fn, text, base, size):
+        self.fn = fn
+        self.text = text
+        self.path = None
+        self.base = base
+        self.size = size
+        self.line_starts = None
+        self.decoded = text if isinstance(text, str) else None
+
+    def release(self):
+        # a mapped file is closed as soon as its tokens are built, rather
+        # than held open for as long as an error might point into it
+        text = self.text
+        if isinstance(text, Mapping) and not text.closed:
+            self.path = text.path
+            self.text = None
+            text.close()
+
+    def decode(self):
+        if self.decoded is None:
+            if self.text is None:
+                self.text = read_source(self.path)
+            self.decoded = bytes(self.text).decode("utf-8", "replace")
+        return self.decoded
+
+    def build_line_starts(self):
+        text = self.decode()
+        starts = [0]
+        idx = text.find("\n")
+        while idx != -1:
+            starts.append(idx + 1)
+            idx = text.find("\n", idx + 1)
+        self.line_starts = starts
+        return starts
+
+    def position(self, offset):
+        index = offset - self.base
+        text = self.decode()
+        if text is not self.text:
+            # offsets into mapped files count bytes, positions count characters
+            index = len(self.text[:index].decode("utf-8", "replace"))
+        starts = self.line_starts or self.build_line_starts()
+        line = bisect_right(starts, index) - 1
+        return Position(index, line, index - starts[line], self.fn, text)
+
+
+# the registry only refers to sources weakly: the tree parsed from one,
+# the functions defined in it and the errors pointing into it keep it alive
+sources = []
+bases = []
+next_base = 0
+
+
+def register_source(fn, text):
+    return register(Source(fn, text, None, len(text)))
+
+
+def register(source):
+    # hands the source the next free range of offsets
+    global next_base
+    live = [i for i, ref in enumerate(sources) if ref() is not None]
+    if len(live) < len(sources):
+        sources[:] = [sources[i] for i in live]
+        bases[:] = [bases[i] for i in live]
+    source.base = next_base
+    next_base += source.size + 2
+    sources.append(weakref.ref(source))
+    bases.append(source.base)
+    return source
+
+
+def source_of(offset):
+    i = bisect_right(bases, offset) - 1
+    if i < 0:
+        return None
+    source = sources[i]()
+    # past the end of a live source is a source that was dropped
+    if source is None or offset > source.base + source.size + 1:
+        return None
+    return source
+
+
+def resolve(offset):
+    source = source_of(offset)
+    return source.position(offset) if source else None
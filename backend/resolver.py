@@ -0,0 +1,51 @@
+from . import nodes as n
+from .interpreter import Layout
+from .token import Token
+
+NAMED = (n.VarAccessNode, n.VarAssignNode, n.VarReAssignNode, n.ForNode, n.FuncDefNode)
+
+# fields holding code that runs in a frame of its own, or is resolved when
+# it runs: function bodies, the callee a call was bound to, included trees
+ELSEWHERE = {
+    n.FuncDefNode: ("exec_code",),
+    n.DirectCallNode: ("code",),
+    n.InlineCallNode: ("code",),
+    n.IncludeNode: ("tree",),
+}
+
+
+def resolve(tree, layout):
+    # point every variable reference at its slot in the frame it runs in:
+    # the top level of a program uses the layout of the global table, and
+    # each function body gets its own, with its parameters first, then the
+    # names it assigns, then the ones it only reads. A function still sees
+    # the variables of whoever called it, so a name its frame doesn't hold
+    # is looked up by name in the callers' frames when it runs
+    items = list(frame_nodes(tree))
+    for item in items:
+        name = n.binds(item)
+        if name is not None:
+            layout.slot_of(name)
+    for item in items:
+        if isinstance(item, NAMED) and item.var_name_tok is not None:
+            item.slot = layout.slot_of(item.var_name_tok.value)
+        elif isinstance(item, n.InvariantNode):
+            item.slots = tuple(layout.slot_of(name) for name in item.names)
+        if isinstance(item, n.FuncDefNode):
+            if item.layout is None:
+                item.layout = Layout(tok.value for tok in item.arg_name_toks)
+            resolve(item.exec_code, item.layout)
+
+
+def frame_nodes(node):
+    stack = [node]
+    seen = set()
+    while stack:
+        item = stack.pop()
+        if isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif hasattr(item, "start") and not isinstance(item, Token) and id(item) not in seen:
+            seen.add(id(item))
+            yield item
+            skip = ELSEWHERE.get(type(item), ())
+            stack.extend(getattr(item, name, None) for name in item.__slots__ if name not in skip)
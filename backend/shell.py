@@ -1,9 +1,13 @@
-from . import exe
+from . import exe, cache, tiering
 from backend import __version__
 import platform
 import sys
 
 def main():
+    if "--no-cache" in sys.argv:
+        cache.ENABLED = False
+    if sys.stdout.isatty():
+        sys.stdout.write("\033[2J\033[H")
     print(f'Kromium ({__version__}) running on {sys.platform}({platform.system()})')
     while True:
         try:
@@ -17,6 +21,10 @@ def main():
                     print(repr(res))
             
         except (KeyboardInterrupt, EOFError):
+            if "--cache-stats" in sys.argv:
+                print(cache.summary())
+            if "--tier-stats" in sys.argv:
+                print(tiering.summary())
             print('Exiting Kromium...')
             sys.exit()
     
@@ -0,0 +1,169 @@
+import os
+import weakref
+from . import nodes as n
+from . import optimizer, typecheck
+from .interpreter import (
+    RTResult, Integer, Double, String, List, ConstInteger, ConstDouble, ConstString,
+    Signal, ERROR, RETURN, ADVANCE,
+)
+from .pos import resolve
+
+ENABLED = not os.environ.get("KROMIUM_NO_TIERING")
+# a function is compiled once it has been called this many times, or its
+# loops have gone round this many times. Compiling one takes a few ms, which
+# a small body makes up for only after some thousand calls
+CALLS = 1000
+LOOPS = 10000
+# a function whose guards fail this often stays in the interpreter
+MAX_DEOPTS = 4
+
+# the class an argument guard checks, by the argument's own class
+KINDS = {
+    Integer: Integer, ConstInteger: Integer,
+    Double: Double, ConstDouble: Double,
+    String: String, ConstString: String,
+    List: List,
+}
+
+# the argument types changed between calls
+MIXED = "mixed"
+
+stats = {"promoted": 0, "deoptimized": 0}
+
+
+class Profile:
+    __slots__ = (
+        "name", "start", "calls", "loops", "types", "guard", "code", "promotions", "deopts", "pinned", "__weakref__",
+    )
+
+    def __init__(self, name, start):
+        self.name = name
+        self.start = start
+        self.calls = 0
+        self.loops = 0
+        # the argument types seen so far, None before the first call
+        self.types = None
+        self.guard = None
+        self.code = None
+        self.promotions = 0
+        self.deopts = 0
+        self.pinned = False
+
+
+# every profile still in use, for the summary; each is kept on the layout
+# of the body it counts
+profiles = weakref.WeakSet()
+
+
+# made by the first promotion, so the transpiler is not imported before
+# anything gets hot
+runtime = None
+
+
+def kinds_of(args):
+    return tuple(KINDS.get(type(arg)) for arg in args)
+
+
+def run(func, itr, ctx, args):
+    # Function.execute's last step: the compiled body when the function is
+    # hot and its guard holds, the interpreter otherwise
+    profile = func.layout.profile
+    if profile is None:
+        profile = func.layout.profile = Profile(func.name, func.exec_code.start)
+        profiles.add(profile)
+    types = kinds_of(args)
+    if profile.code is not None:
+        if profile.guard is None or types == profile.guard:
+            return enter(func, profile.code, ctx)
+        deoptimize(profile)
+
+    profile.calls += 1
+    if profile.types is None:
+        profile.types = types
+    elif profile.types != types:
+        profile.types = MIXED
+    if not profile.pinned and (profile.calls >= CALLS or profile.loops >= LOOPS):
+        promote(func, profile)
+        return enter(func, profile.code, ctx)
+
+    # the interpreter counts the loop iterations of this frame on it
+    ctx.profile = profile
+    return func.run_body(itr, ctx)
+
+
+def promote(func, profile):
+    # the body, with operations on arguments specialized for the types
+    # they had so far and guarded by them; a function that saw changing
+    # types is compiled without a guard, specializing only what the body
+    # itself makes certain
+    global runtime
+    if runtime is None:
+        from .transpiler import TieredRuntime
+        runtime = TieredRuntime()
+    guard = None if profile.types is MIXED else profile.types
+    checker = typecheck.Checker(True, {}, {}, {}, local=True)
+    for name, cls in zip(func.args, guard or ()):
+        if cls is not None:
+            checker.env[name] = (None, frozenset((cls,)), False)
+    checker.visit(func.exec_code)
+
+    kinds = {}
+    for node, operands in checker.types.items():
+        if type(node) is n.BinOpNode:
+            kind = optimizer.specialized(node.op.value, *operands)
+            if kind is not None:
+                kinds[node] = kind
+    profile.code = runtime.build(func.exec_code, func.name, kinds)
+    profile.guard = guard
+    profile.promotions += 1
+    stats["promoted"] += 1
+
+
+def deoptimize(profile):
+    # called with other argument types than the code was compiled for:
+    # back to the interpreter, to profile the function again
+    profile.code = profile.guard = profile.types = None
+    profile.calls = profile.loops = 0
+    profile.deopts += 1
+    stats["deoptimized"] += 1
+    if profile.deopts >= MAX_DEOPTS:
+        profile.pinned = True
+
+
+def enter(func, code, ctx):
+    # Function.run_body for the compiled body
+    try:
+        value = code(ctx)
+    except Signal as signal:
+        if signal.kind == RETURN:
+            return RTResult().success(signal.value)
+        if signal.kind == ERROR:
+            return RTResult().fail(signal.value)
+        return RTResult().success_adv() if signal.kind == ADVANCE else RTResult().success_break()
+    except Exception as exc:
+        runtime.locate(exc)
+        raise
+    return RTResult().success((value if func.auto_ret else None) or Integer.null)
+
+
+def describe(types):
+    return ", ".join(typecheck.NAMES.get(cls, "any") for cls in types)
+
+
+def summary():
+    lines = [f"Tiering: {stats['promoted']} promotions, {stats['deoptimized']} deoptimizations"]
+    for profile in sorted(profiles, key=lambda profile: profile.start):
+        if not profile.promotions:
+            continue
+        pos = resolve(profile.start)
+        where = f" ({pos.fn}, line {pos.line + 1})" if pos else ""
+        if profile.code is None:
+            state = "interpreted"
+        elif profile.guard is None:
+            state = "compiled, unguarded"
+        else:
+            state = f"compiled for ({describe(profile.guard)})"
+        lines.append(
+            f"  {profile.name}{where}: promoted {profile.promotions}x, deoptimized {profile.deopts}x, {state}"
+        )
+    return "\n".join(lines)
@@ -1,22 +1,27 @@
 import json
 import os
-path =  f'{os.path.dirname(os.path.abspath(__file__))}\..\\assets\\tok_values.json'
-vals = json.load(open(path))
+from array import array
+from .tokens import TOKEN_TYPES, TOKEN_KINDS
+path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "tok_values.json")
+with open(path) as f:
+    vals = json.load(f)
+
+DATA_TYPES_BY_TYPE = {"TT_INT": "int", "TT_DOUBLE": "double", "TT_STRING": "string"}
+KEYWORD_DATA_TYPES = {"string": "string", "int": "int", "double": "double"}
 
 
 class Token:
+    __slots__ = ("type", "value", "data_type", "start", "end")
+
     def __init__(self, type_: any,  start=None, end=None, data_type = None,value=None,):
         self.type = type_
-        if vals.get(self.type) != None:
-            self.value = vals.get(self.type)
-        else:
-            self.value = value
+        self.value = vals.get(type_, value)
         self.data_type = data_type
 
-        if start:
-            self.start = start.get_pos()
-            self.end = start.get_pos().advance()
-        if end:
+        if start is not None:
+            self.start = start
+            self.end = start + 1 if end is None else end
+        elif end is not None:
             self.end = end
 
     def matches(self, type_ , value_):
@@ -27,3 +32,69 @@ class Token:
     
     def __repr__(self):
         return f"{self.type}:{self.value}" if self.value else f"{self.type}"
+
+
+class TokenArray:
+    __slots__ = ("kinds", "starts", "ends", "values", "table", "interned")
+
+    def __init__(self, tokens=()):
+        self.kinds = array("B")
+        self.starts = array("l")
+        self.ends = array("l")
+        self.values = array("l")
+        self.table = []
+        self.interned = {}
+        self.extend(tokens)
+
+    def intern(self, value):
+        if value is None:
+            return -1
+        key = (value.__class__, value)
+        idx = self.interned.get(key)
+        if idx is None:
+            idx = self.interned[key] = len(self.table)
+            self.table.append(value)
+        return idx
+
+    def append(self, tok):
+        self.kinds.append(TOKEN_KINDS[tok.type])
+        self.starts.append(tok.start)
+        self.ends.append(tok.end)
+        self.values.append(-1 if tok.type in vals else self.intern(tok.value))
+
+    def extend(self, tokens):
+        for tok in tokens:
+            self.append(tok)
+
+    def splice(self, other, lo=0, hi=None):
+        hi = len(other) if hi is None else hi
+        table = other.table
+        remap = [None] * len(table)
+        values = self.values
+        for idx in other.values[lo:hi]:
+            if idx >= 0:
+                new = remap[idx]
+                if new is None:
+                    new = remap[idx] = self.intern(table[idx])
+                idx = new
+            values.append(idx)
+        self.kinds.extend(other.kinds[lo:hi])
+        self.starts.extend(other.starts[lo:hi])
+        self.ends.extend(other.ends[lo:hi])
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, idx):
+        type_ = TOKEN_TYPES[self.kinds[idx]]
+        value_idx = self.values[idx]
+        value = self.table[value_idx] if value_idx >= 0 else None
+        if type_ == "TT_KEYWORD":
+            data_type = KEYWORD_DATA_TYPES.get(value)
+        else:
+            data_type = DATA_TYPES_BY_TYPE.get(type_)
+        return Token(type_, self.starts[idx], self.ends[idx], data_type, value)
+
+    def __iter__(self):
+        for idx in range(len(self.kinds)):
+            yield self[idx]
@@ -39,6 +39,48 @@ TT_IDENTIFIER = "TT_IDENTIFIER"
 TT_KEYWORD = "TT_KEYWORD"
 
 
+###########################################
+
+TOKEN_TYPES = (
+    TT_INT,
+    TT_DOUBLE,
+    TT_STRING,
+    TT_PLUS,
+    TT_MINUS,
+    TT_MUL,
+    TT_DIV,
+    TT_LPAREN,
+    TT_RPAREN,
+    TT_POW,
+    TT_NE,
+    TT_LT,
+    TT_GT,
+    TT_LTE,
+    TT_GTE,
+    TT_EQ,
+    TT_DEQ,
+    TT_AMPR,
+    TT_LINE,
+    TT_LCRLBRCKT,
+    TT_RCRLBRCKT,
+    TT_PLUSEQ,
+    TT_MINUSEQ,
+    TT_MULEQ,
+    TT_DIVEQ,
+    TT_COLON,
+    TT_SEMICOLON,
+    TT_ARROW,
+    TT_COMMA,
+    TT_LSQRBRCKT,
+    TT_RSQRBRCKT,
+    TT_NEWL,
+    TT_TILDE,
+    TT_EOF,
+    TT_IDENTIFIER,
+    TT_KEYWORD,
+)
+TOKEN_KINDS = {type_: kind for kind, type_ in enumerate(TOKEN_TYPES)}
+
 ###########################################
 
 KEYWORDS = [
@@ -0,0 +1,709 @@
+import itertools
+import linecache
+import math
+import weakref
+from . import exe
+from . import nodes as n
+from .bytecode import QUIET
+from .errs import RunTimeError, typeError
+from .interpreter import (
+    Interpreter, RTResult, Context, SymbolTable, Integer, Double, String, List, Function, NoneType,
+    COMPARISONS, WHOLE, DECLARED, FOR_CONDITIONS, owned, include_target, method_of, Signal, signal_of, ERROR, RETURN, ADVANCE, BREAK,
+)
+from .loader import load_source
+from .pos import resolve
+from .tokens import TT_KEYWORD, TT_MINUS
+
+# the Python operator each Kromium operator runs as on plain values
+OPERATORS = {
+    "+": "+",
+    "-": "-",
+    "*": "*",
+    "^": "**",
+    "**": "**",
+    "==": "==",
+    "!=": "!=",
+    "<": "<",
+    ">": ">",
+    "<=": "<=",
+    ">=": ">=",
+    "and": "and",
+    "&": "and",
+    "or": "or",
+    "|": "or",
+}
+
+STEPS = {"+=": "+=", "-=": "-=", "*=": "*=", "/=": "/="}
+
+# Python refuses more than 20 nested loops and try blocks in a function, and
+# more than 100 levels of indentation; nodes deeper than this are walked
+MAX_BLOCKS = 16
+MAX_INDENT = 80
+
+# every generated function gets its own file name, so tracebacks and the
+# source map can tell them apart
+counter = itertools.count()
+
+
+def fail(error):
+    raise Signal(ERROR, error)
+
+
+class Transpiler:
+    # writes one Kromium body out as the source of a Python function; every
+    # node becomes a few statements leaving its value in a local, and
+    # RTResult's signals become Signal exceptions, as in the VM
+    def __init__(self, name, kinds=None):
+        self.name = name
+        # operations to write out as the given specialized node kind
+        self.kinds = kinds or {}
+        self.lines = ["def body(ctx):"]
+        # the source map, the span of the node each line was written for
+        self.spans = [(None, None)]
+        self.consts = {}
+        self.temps = 0
+        self.indent = 1
+        self.blocks = 0
+        self.ctx = "ctx"
+        self.node = None
+
+    def emit(self, line):
+        self.lines.append("    " * self.indent + line)
+        node = self.node
+        self.spans.append((getattr(node, "start", None), getattr(node, "end", None)))
+
+    def const(self, value):
+        name = f"k{len(self.consts)}"
+        self.consts[name] = value
+        return name
+
+    def temp(self):
+        self.temps += 1
+        return f"t{self.temps}"
+
+    def bind(self, expr):
+        if expr.isidentifier():
+            return expr
+        name = self.temp()
+        self.emit(f"{name} = {expr}")
+        return name
+
+    def open(self, line, block=False):
+        self.emit(line)
+        self.indent += 1
+        self.blocks += block
+
+    def close(self, block=False):
+        self.indent -= 1
+        self.blocks -= block
+
+    def transpile(self, node):
+        value = self.visit(node)
+        self.emit(f"return {value}")
+        return "\n".join(self.lines) + "\n"
+
+    def visit(self, node):
+        # returns a Python expression for the node's value, after emitting
+        # the statements that compute it
+        kind = self.kinds.get(node) or type(node)
+        method = getattr(self, f"visit_{kind.__name__}", None)
+        if method is None or (
+            not isinstance(node, QUIET) and (self.blocks >= MAX_BLOCKS or self.indent >= MAX_INDENT)
+        ):
+            method = self.fallback
+        outer, self.node = self.node, node
+        try:
+            return method(node)
+        finally:
+            self.node = outer
+
+    def fallback(self, node):
+        return self.bind(f"walk({self.const(node)}, {self.ctx})")
+
+    def span(self, node):
+        return f"{node.start!r}, {node.end!r}"
+
+    def literal(self, cls, node):
+        value = node.tok.value
+        if type(value) in (int, str) or (type(value) is float and math.isfinite(value)):
+            value = repr(value)
+        else:
+            value = self.const(value)
+        return f"{cls}({value}).set_context({self.ctx}).set_pos({self.span(node)})"
+
+    def visit_NoneType(self, node):
+        return "NoneType()"
+
+    def visit_IntegerNode(self, node):
+        return self.literal("Integer", node)
+
+    def visit_DoubleNode(self, node):
+        return self.literal("Double", node)
+
+    def visit_StringNode(self, node):
+        return self.literal("String", node)
+
+    def visit_ConstNode(self, node):
+        const, value = self.const(node), self.temp()
+        self.emit(f"{value} = {const}.value")
+        self.open(f"if {value}.context is not {self.ctx}:")
+        self.emit(f"{value} = {const}.value = {value}.bind({self.ctx})")
+        self.close()
+        return value
+
+    def load(self, node, or_none=False):
+        ctx, value = self.ctx, self.temp()
+        self.emit(f"{value} = {ctx}.symbol_table.get({node.slot})[0]")
+        self.open(f"if not {value}:")
+        if or_none:
+            self.emit(f"{value} = None")
+            self.close()
+            self.open("else:")
+        else:
+            message = f'"{node.var_name_tok.value}" is not defined'
+            self.emit(f"fail(RunTimeError({self.span(node)}, {message!r}, {ctx}))")
+            self.close()
+        self.copied(value, node)
+        if or_none:
+            self.close()
+        return value
+
+    def copied(self, value, node):
+        self.open("try:")
+        self.emit(f"{value} = {value}.copy().set_pos({self.span(node)}).set_context({self.ctx})")
+        self.close()
+        self.open("except:")
+        self.emit("pass")
+        self.close()
+
+    def visit_VarAccessNode(self, node):
+        return self.load(node)
+
+    def visit_ArgNode(self, node):
+        value = self.temp()
+        self.emit(f"{value} = {self.ctx}.args[{node.index}]")
+        self.copied(value, node)
+        return value
+
+    def operands(self, node):
+        # a signal from the left operand is dropped once the right one has
+        # been evaluated, leaving None in its place
+        left = node.leftn
+        if isinstance(left, QUIET):
+            left_value = self.bind(self.visit(left))
+        elif isinstance(left, n.VarAccessNode):
+            left_value = self.load(left, or_none=True)
+        else:
+            left_value = self.temp()
+            self.open("try:", block=True)
+            self.emit(f"{left_value} = {self.visit(left)}")
+            self.close(block=True)
+            self.open("except Signal:")
+            self.emit(f"{left_value} = None")
+            self.close()
+        right_value = self.bind(self.visit(node.rightn))
+        checks = [f"{value} is None" for value, side in ((left_value, left), (right_value, node.rightn))
+                  if not isinstance(side, QUIET)]
+        if checks:
+            self.open(f"if {' or '.join(checks)}:")
+            message = "Undifined variable detected in binary operaion"
+            self.emit(f"fail(RunTimeError({self.span(node)}, {message!r}, {self.ctx}))")
+            self.close()
+        return left_value, right_value
+
+    def checked(self, result, call, node):
+        self.emit(f"{result}, err = {call}")
+        self.open("if err:")
+        self.emit("fail(err)")
+        self.close()
+        self.emit(f"{result} = {result}.set_pos({self.span(node)})")
+
+    def visit_BinOpNode(self, node):
+        name = method_of(node.op)
+        left, right = self.operands(node)
+        result = self.temp()
+        if name is None:
+            self.emit(f"{result} = None")
+            self.emit(f"{result} = {result}.set_pos({self.span(node)})")
+        else:
+            self.checked(result, f"{left}.{name}({right})", node)
+        return result
+
+    def visit_PowerNode(self, node):
+        left, right = self.operands(node)
+        result = self.temp()
+        self.open(f"if not isinstance({left}, Integer):")
+        self.checked(result, f"{left}.powed_by({right})", node)
+        self.close()
+        self.open("else:")
+        product = " * ".join([f"{left}.value"] * max(node.exponent, 1))
+        self.emit(f"{result} = Integer({product}).set_context({left}.context).set_pos({self.span(node)})")
+        self.close()
+        return result
+
+    def division(self, left, right):
+        self.open(f"if {right}.value == 0:")
+        self.emit(f'fail(RunTimeError({right}.pos_start, {right}.pos_end, "Division by zero", {left}.context))')
+        self.close()
+
+    def operation(self, op, left, right):
+        if op not in OPERATORS:
+            return f"COMPARISONS[{op!r}]({left}.value, {right}.value)"
+        return f"({left}.value {OPERATORS[op]} {right}.value)"
+
+    def visit_IntOpNode(self, node):
+        left, right = self.operands(node)
+        op, result = node.op.value, self.temp()
+        if op in WHOLE:
+            value = f"Integer({self.operation(op, left, right)})"
+        elif op == "/":
+            self.division(left, right)
+            value = f"{left}.number({left}.value / {right}.value)[0]"
+        else:
+            value = f"{left}.number({left}.value ** {right}.value)[0]"
+        self.emit(f"{result} = {value}.set_context({left}.context).set_pos({self.span(node)})")
+        return result
+
+    def visit_DoubleOpNode(self, node):
+        left, right = self.operands(node)
+        op, result = node.op.value, self.temp()
+        if op == "/":
+            self.division(left, right)
+            value = f"Double({left}.value / {right}.value)"
+        elif op in ("+", "-", "*", "^", "**"):
+            value = f"Double({self.operation(op, left, right)})"
+        elif op == "==":
+            value = f"Integer(int({self.operation(op, left, right)}))"
+        else:
+            value = f"Double(int({self.operation(op, left, right)}))"
+        self.emit(f"{result} = {value}.set_context({left}.context).set_pos({self.span(node)})")
+        return result
+
+    def visit_StringOpNode(self, node):
+        left, right = self.operands(node)
+        op, result = node.op.value, self.temp()
+        if op == "+":
+            value = f"String({left}.value + {right}.value)"
+        elif op == "*":
+            value = f"String({left}.value * {right}.value)"
+        elif op == "/":
+            value = f"String({left}.value[{right}.value])"
+        else:
+            value = f"Integer(int({self.operation(op, left, right)}))"
+        self.emit(f"{result} = {value}.set_context({left}.context).set_pos({self.span(node)})")
+        return result
+
+    def visit_UnaryOpNode(self, node):
+        num, op = self.bind(self.visit(node.node)), node.op
+        result = self.temp()
+        if op.type == TT_MINUS:
+            self.checked(result, f"{num}.multiplication(Integer(-1))", node)
+        elif op.matches(TT_KEYWORD, "not"):
+            self.checked(result, f"{num}.notted()", node)
+        else:
+            self.emit(f"{result} = {num}.set_pos({self.span(node)})")
+        return result
+
+    def visit_VarAssignNode(self, node):
+        value = self.temp()
+        self.emit(f"{value} = {self.visit(node.value_node)}")
+        var_type = DECLARED.get(node.var_type_tok.value, node.var_type_tok.value)
+        cls = var_type.__name__ if isinstance(var_type, type) else self.const(var_type)
+        store = f"{self.ctx}.symbol_table.set({node.slot}, {cls}, {value}, {node.is_const!r})"
+        self.open(f"if isinstance({value}, {cls}):")
+        self.emit(store)
+        self.close()
+        if var_type is Double:
+            self.open(f"elif isinstance({value}, Integer):")
+            self.emit(f"{value} = Double({value}.value)")
+            self.emit(store)
+            self.close()
+        self.open("else:")
+        message = f"f\"Cannot convert type '{{type({value}).__name__}}' to '{{{cls}.__name__}}'\""
+        self.emit(f"fail(typeError({self.span(node)}, {message}))")
+        self.close()
+        return value
+
+    def visit_VarReAssignNode(self, node):
+        value, result = self.bind(self.visit(node.value_node)), self.temp()
+        self.emit(f"{result} = reassign({self.const(node)}, {value}, {self.ctx}, RTResult())")
+        self.open(f"if {result}.should_ret():")
+        self.emit(f"raise signal_of({result})")
+        self.close()
+        self.emit(f"{result} = {result}.value")
+        return result
+
+    def visit_IfNode(self, node):
+        result = self.temp()
+        self.cases(node.cases, node.else_case, result)
+        return result
+
+    def cases(self, cases, else_case, result):
+        (condition, expr, shrn), rest = cases[0], cases[1:]
+        self.open(f"if {self.visit(condition)}.is_true():")
+        self.branch(expr, shrn, result)
+        self.close()
+        self.open("else:")
+        if rest:
+            self.cases(rest, else_case, result)
+        elif else_case:
+            self.branch(*else_case, result)
+        else:
+            self.emit(f"{result} = Integer.null")
+        self.close()
+
+    def branch(self, expr, shrn, result):
+        value = self.visit(expr)
+        self.emit(f"{result} = {'Integer.null' if shrn else value}")
+
+    def loop_end(self, node, elements):
+        if node.should_return_null:
+            return "Integer.null"
+        return self.bind(f"List({elements}).set_context({self.ctx}).set_pos({self.span(node)})")
+
+    def visit_ForNode(self, node):
+        ctx, slot = self.ctx, node.slot
+        elements, table, start = self.temp(), self.temp(), self.temp()
+        self.emit(f"{elements} = []")
+        self.emit(f"{table} = {ctx}.symbol_table")
+        self.emit(f"{start} = {table}.get({slot})[0]")
+        end = self.bind(self.visit(node.end_value_node))
+        step = self.bind(self.visit(node.step_value_node))
+        i, value = self.temp(), self.temp()
+        self.emit(f"{i} = {start}.value")
+        op = node.op_start.value
+        if op in FOR_CONDITIONS:
+            condition = f"{i} {op} {end}.value"
+        else:
+            condition = f"{self.const(FOR_CONDITIONS.get(op))}({i}, {end}.value)"
+        self.open(f"while {condition}:", block=True)
+        self.emit(f"{table}.reassign({slot}, Integer({i}), {self.const(node)}, {ctx}, RTResult())")
+        if node.op_end.value in STEPS:
+            self.emit(f"{i} {STEPS[node.op_end.value]} {step}.value")
+        self.body(node.exec_node, value, swallow=False)
+        self.emit(f"{elements}.append(owned({value}))")
+        self.close(block=True)
+        return self.loop_end(node, elements)
+
+    def visit_WhileNode(self, node):
+        elements, value = self.temp(), self.temp()
+        self.emit(f"{elements} = []")
+        self.open("while True:", block=True)
+        self.open(f"if not {self.visit(node.condition)}.is_true():")
+        self.emit("break")
+        self.close()
+        self.body(node.exec_node, value, swallow=True)
+        self.emit(f"{elements}.append(owned({value}))")
+        self.close(block=True)
+        return self.loop_end(node, elements)
+
+    def body(self, node, value, swallow):
+        # a while loop drops an iteration that errors or returns and keeps
+        # going, a for loop passes the signal on
+        self.open("try:", block=True)
+        self.emit(f"{value} = {self.visit(node)}")
+        self.close(block=True)
+        self.open("except Signal as signal:")
+        self.open("if signal.kind == ADVANCE:")
+        self.emit("continue")
+        self.close()
+        self.open("if signal.kind == BREAK:")
+        self.emit("break")
+        self.close()
+        self.emit(f"{value} = None" if swallow else "raise")
+        self.close()
+
+    def visit_FuncDefNode(self, node):
+        const, result = self.const(node), self.temp()
+        func_name = node.var_name_tok.value if node.var_name_tok else None
+        arg_names = [arg_name.value for arg_name in node.arg_name_toks]
+        self.emit(
+            f"{result} = Function({func_name!r}, {const}.exec_code, {arg_names!r}, {const}.auto_ret, {const}.layout)"
+            f".set_context({self.ctx}).set_pos({self.span(node)})"
+        )
+        if func_name is not None:
+            self.emit(f"{self.ctx}.symbol_table.set({node.slot}, Function, {result}, False)")
+        return result
+
+    def arguments(self, nodes):
+        return "[" + ", ".join(self.bind(self.visit(arg)) for arg in nodes) + "]"
+
+    def visit_CallFuncNode(self, node):
+        func = self.temp()
+        self.emit(f"{func} = {self.visit(node.caller)}")
+        self.emit(f"{func} = {func}.copy().set_pos({self.span(node)})")
+        args = self.arguments(node.arg_nodes)
+        return self.bind(f"call({func}, {args})")
+
+    def guarded(self, node, guard, call):
+        # the bound call, or the plain one when the name holds something else
+        result = self.temp()
+        self.open(f"if {guard}:")
+        self.emit(f"{result} = {call()}")
+        self.close()
+        self.open("else:")
+        self.emit(f"{result} = {self.visit_CallFuncNode(node.call)}")
+        self.close()
+        return result
+
+    def frame(self, func, start, symbols):
+        frame = self.temp()
+        self.emit(f"{frame} = Context({func}.name, {self.ctx}, {start})")
+        if symbols:
+            self.emit(f"{frame}.symbol_table = SymbolTable({self.ctx}.symbol_table, {func}.layout)")
+        return frame
+
+    def visit_DirectCallNode(self, node):
+        func = self.temp()
+        self.emit(f"{func} = {self.ctx}.symbol_table.get({node.call.caller.slot})[0]")
+
+        def call():
+            args = self.bind(self.arguments(node.call.arg_nodes))
+            frame = self.frame(func, repr(node.start), True)
+            self.emit(f"{func}.populate_args({func}.args, {args}, {frame})")
+            return f"run_body({func}, {frame}, {args})"
+
+        return self.guarded(node, f"isinstance({func}, Function) and {func}.exec_code is {self.const(node.code)}", call)
+
+    def visit_InlineCallNode(self, node):
+        func = self.temp()
+        self.emit(f"{func} = {self.ctx}.symbol_table.get({node.call.caller.slot})[0]")
+
+        def call():
+            # the body is written out here, running in a frame of its own
+            frame = self.frame(func, repr(node.start), False)
+            args = self.arguments(node.call.arg_nodes)
+            self.emit(f"{frame}.args = {args}")
+            self.open(f"for arg in {frame}.args:", block=True)
+            self.emit(f"arg.set_context({frame})")
+            self.close(block=True)
+            outer, self.ctx = self.ctx, frame
+            try:
+                return self.bind(self.visit(node.body))
+            finally:
+                self.ctx = outer
+
+        return self.guarded(node, f"isinstance({func}, Function) and {func}.exec_code is {self.const(node.code)}", call)
+
+    def visit_BuiltinCallNode(self, node):
+        func, method = self.const(node.func), self.const(node.method)
+
+        def call():
+            args = self.arguments(node.call.arg_nodes)
+            frame = self.frame(func, f"{func}.pos_start", True)
+            self.emit(f"{func}.populate_args({method}.arg_names, {args}, {frame})")
+            res = self.temp()
+            self.emit(f"{res} = {method}({frame})")
+            self.open(f"if {res}.should_ret():")
+            self.emit(f"raise signal_of({res})")
+            self.close()
+            return f"{res}.value"
+
+        guard = f"{self.ctx}.symbol_table.get({node.call.caller.slot})[0] is {self.const(node.target)}"
+        return self.guarded(node, guard, call)
+
+    def visit_ListNode(self, node):
+        elements = ", ".join(f"owned({self.bind(self.visit(element))})" for element in node.element_nodes)
+        return self.bind(f"List([{elements}]).set_context({self.ctx}).set_pos({self.span(node)})")
+
+    def visit_ReturnNode(self, node):
+        if not node.node:
+            self.emit("raise Signal(RETURN, Integer.null)")
+            return "None"
+        value = self.bind(self.visit(node.node))
+        # RTResult only treats a return value it finds true as a return
+        self.open(f"if {value}:")
+        self.emit(f"raise Signal(RETURN, {value})")
+        self.close()
+        return "None"
+
+    def visit_AdvanceNode(self, node):
+        self.emit("raise Signal(ADVANCE, None)")
+        return "None"
+
+    def visit_BreakNode(self, node):
+        self.emit("raise Signal(BREAK, None)")
+        return "None"
+
+    def visit_IncludeNode(self, node):
+        return self.bind(f"include({self.const(node)})")
+
+    def visit_SaveNode(self, node):
+        # the saved value is None when the expression did not finish
+        const, value = self.const(node), self.temp()
+        self.emit(f"{const}.value = None")
+        self.emit(f"{value} = {self.visit(node.node)}")
+        self.emit(f"{const}.value = {value}")
+        return value
+
+    def visit_ReuseNode(self, node):
+        value = self.temp()
+        self.emit(f"{value} = {self.const(node.save)}.value")
+        self.open(f"if type({value}) in (Integer, Double, String):")
+        self.emit(f"{value} = {value}.copy().set_pos({self.span(node)})")
+        self.close()
+        self.open("else:")
+        self.emit(f"{value} = {self.visit(node.node)}")
+        self.close()
+        return value
+
+    def visit_InvariantNode(self, node):
+        const, values, kept, value = self.const(node), self.temp(), self.temp(), self.temp()
+        table = f"{self.ctx}.symbol_table"
+        self.emit(f"{values} = ({''.join(f'{table}.get({slot})[0], ' for slot in node.slots)})")
+        self.emit(f"{kept} = {self.ctx}.invariants.get({const})")
+        self.open(f"if {kept} is not None and {kept}[0] == {values}:")
+        self.emit(f"{value} = {kept}[1].copy()")
+        self.close()
+        self.open("else:")
+        self.emit(f"{value} = {self.visit(node.node)}")
+        self.open(f"if type({value}) in (Integer, Double, String) and not any(isinstance(v, List) for v in {values}):")
+        self.emit(f"{self.ctx}.invariants[{const}] = ({values}, {value}.copy())")
+        self.close()
+        self.close()
+        return value
+
+
+def transpile(node, name="<main>", kinds=None):
+    # the Python source for a body, its source map and the objects it uses
+    transpiler = Transpiler(name, kinds)
+    source = transpiler.transpile(node)
+    return source, transpiler.spans, transpiler.consts
+
+
+def forget(spans, fn):
+    spans.pop(fn, None)
+    linecache.cache.pop(fn, None)
+
+
+class Runtime:
+    # the backend included files run on
+    backend = "python"
+
+    def __init__(self):
+        self.interpreter = Interpreter()
+        # function bodies are compiled the first time one is called
+        self.code = {}
+        # the source map of every generated file, by file name
+        self.spans = {}
+        self.scope = {
+            "Integer": Integer, "Double": Double, "String": String, "List": List, "Function": Function,
+            "NoneType": NoneType, "Context": Context, "SymbolTable": SymbolTable, "RTResult": RTResult,
+            "COMPARISONS": COMPARISONS, "RunTimeError": RunTimeError, "typeError": typeError, "Signal": Signal, "signal_of": signal_of,
+            "RETURN": RETURN, "ADVANCE": ADVANCE, "BREAK": BREAK, "owned": owned, "fail": fail,
+            "reassign": self.interpreter.reassign, "call": self.call, "run_body": self.run_body,
+            "include": self.include, "walk": self.walk,
+        }
+
+    def code_of(self, node, name):
+        code = self.code.get(node)
+        if code is None:
+            code = self.code[node] = self.build(node, name)
+        return code
+
+    def build(self, node, name, kinds=None):
+        source, spans, consts = transpile(node, name, kinds)
+        fn = f"<kromium {name} #{next(counter)}>"
+        # keep the source around for tracebacks through the generated code
+        linecache.cache[fn] = (len(source), None, source.splitlines(True), fn)
+        self.spans[fn] = spans
+        scope = dict(self.scope, **consts)
+        exec(compile(source, fn, "exec"), scope)
+        body = scope["body"]
+        # the file goes once nothing can run it: a traceback through it
+        # holds the frame's globals, and with them the function
+        weakref.finalize(body, forget, self.spans, fn)
+        return body
+
+    def run(self, node, ctx):
+        # returns the program's value and error, like Interpreter.visit's
+        # RTResult would carry them
+        try:
+            value = self.code_of(node, "<main>")(ctx)
+        except Signal as signal:
+            return None, signal.value if signal.kind == ERROR else None
+        except Exception as exc:
+            self.locate(exc)
+            raise
+        return value, None
+
+    def locate(self, exc):
+        # points a Python error out of generated code at the Kromium source
+        # it was generated for
+        if getattr(exc, "kromium", False):
+            return
+        span = None
+        tb = exc.__traceback__
+        while tb is not None:
+            spans = self.spans.get(tb.tb_frame.f_code.co_filename)
+            if spans is not None and spans[tb.tb_lineno - 1][0] is not None:
+                span = spans[tb.tb_lineno - 1]
+            tb = tb.tb_next
+        if span is None:
+            return
+        pos = resolve(span[0])
+        if pos is not None:
+            exc.add_note(f'  File "{pos.fn}", line {pos.line + 1}, column {pos.column + 1}, in Kromium code')
+            exc.kromium = True
+
+    def call(self, func, args):
+        if type(func) is Function:
+            # Function.execute, running the body transpiled
+            ctx = func.generate_ctx()
+            res = func.check_and_populate(func.args, args, ctx)
+            if res.should_ret():
+                raise signal_of(res)
+            return self.run_body(func, ctx)
+        res = func.execute(args)
+        if res.should_ret():
+            raise signal_of(res)
+        return res.value
+
+    def run_body(self, func, ctx, args=None):
+        try:
+            value = self.code_of(func.exec_code, func.name)(ctx)
+        except Signal as signal:
+            if signal.kind != RETURN:
+                raise
+            return signal.value
+        return (value if func.auto_ret else None) or Integer.null
+
+    def walk(self, node, ctx):
+        res = self.interpreter.visit(node, ctx)
+        if res.should_ret():
+            raise signal_of(res)
+        return res.value
+
+    def include(self, node):
+        if node.tree is not None:
+            _, error = exe.execute(node.tree, self.backend)
+        else:
+            fn = node.node.tok
+            path, name = include_target(fn.value)
+            fn.value = fn.value.replace("#", "")
+            _, error = exe.run(name, load_source(path), self.backend)
+        if error:
+            fail(error)
+        return Integer.null
+
+
+class TieredRuntime(Runtime):
+    # the one tiering compiles hot functions with: they call other functions
+    # through the tiers as well, and include files with the default backend
+    backend = None
+
+    def call(self, func, args):
+        res = func.execute(args)
+        if res.should_ret():
+            raise signal_of(res)
+        return res.value
+
+    def run_body(self, func, ctx, args=None):
+        res = exe.tiering.run(func, self.interpreter, ctx, args)
+        if res.should_ret():
+            raise signal_of(res)
+        return res.value
+
+
+def run(node, ctx):
+    return Runtime().run(node, ctx)
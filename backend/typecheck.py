@@ -0,0 +1,465 @@
+import os
+from collections import Counter
+from . import nodes as n
+from . import exe
+from .errs import typeError
+from .interpreter import (
+    Integer, Double, String, List, Function, BuiltInFunc, ConstInteger, ConstDouble, ConstString, DECLARED,
+)
+from .tokens import TT_MINUS, TT_KEYWORD
+
+ENABLED = not os.environ.get("KROMIUM_NO_TYPECHECK")
+
+# a static type is the set of value classes an expression can evaluate to,
+# or None when nothing is known about it; the empty set means evaluating it
+# always fails
+INT = frozenset((Integer,))
+DOUBLE = frozenset((Double,))
+NUMBER = INT | DOUBLE
+STRING = frozenset((String,))
+LIST = frozenset((List,))
+FUNC = frozenset((Function,))
+ILLEGAL = frozenset()
+
+NAMES = {Integer: "int", Double: "double", String: "string", List: "list", Function: "func", BuiltInFunc: "func"}
+CONSTS = {ConstInteger: INT, ConstDouble: DOUBLE, ConstString: STRING}
+
+UNKNOWN = (None, None, False)
+
+ARITHMETIC = ("+", "-", "*", "/", "^", "**")
+COMPARISONS = ("==", "!=", "<", ">", "<=", ">=", "and", "&", "or", "|")
+
+
+def operation(op, left, right):
+    # what the interpreter gives back for one pair of value classes
+    if left is Integer:
+        if right is String and op == "*":
+            return STRING
+        if right not in (Integer, Double):
+            return ILLEGAL
+        if op in COMPARISONS or (op in ("+", "-", "*") and right is Integer):
+            return INT
+        # whole results of the rest become integers again
+        return NUMBER
+    if left is Double:
+        if right not in (Integer, Double):
+            return ILLEGAL
+        # deq builds an integer, the other comparisons a double
+        return INT if op == "==" else DOUBLE
+    if left is String:
+        if right is String and op in ("+", "==", "!="):
+            return STRING if op == "+" else INT
+        if right is Integer and op in ("*", "/"):
+            return STRING
+        return ILLEGAL
+    if left is List:
+        if op == "+" or (op == "*" and right is List) or (op == "-" and right is Integer):
+            return LIST
+        if op == "/" and right is Integer:
+            # an element, which can be anything
+            return None
+        return ILLEGAL
+    return ILLEGAL
+
+
+def binary(op, left, right):
+    if op not in ARITHMETIC and op not in COMPARISONS:
+        return None
+    if left is None or right is None:
+        return None
+    result = ILLEGAL
+    for a in left:
+        for b in right:
+            types = operation(op, a, b)
+            if types is None:
+                return None
+            result |= types
+    return result
+
+
+def unary(op, operand):
+    if operand is None:
+        return None
+    if op.type == TT_MINUS:
+        # negation multiplies by -1
+        return binary("*", operand, INT)
+    if op.matches(TT_KEYWORD, "not"):
+        return frozenset(c for c in operand if c in (Integer, Double))
+    return operand
+
+
+def compound(op, declared, current):
+    # the branch visit_VarReAssignNode takes for "op=" is picked by the
+    # declared type or the current value's class, integers first
+    if declared is Integer or current == INT:
+        return INT
+    if declared is None or current is None:
+        return None
+    result = ILLEGAL
+    for cls in current:
+        kinds = (declared, cls)
+        if Integer in kinds:
+            result |= INT
+        elif Double in kinds:
+            result |= DOUBLE
+        elif String in kinds and op in ("-", "*"):
+            result |= STRING
+        elif List in kinds:
+            if op == "/":
+                return None
+            result |= LIST
+        else:
+            result |= frozenset((cls,))
+    return result
+
+
+def union(a, b):
+    return None if a is None or b is None else a | b
+
+
+def join(a, b):
+    return (a[0] if a[0] is b[0] else None), union(a[1], b[1]), a[2] and b[2]
+
+
+def merge(envs):
+    # only names every path assigned are known afterwards
+    first, rest = envs[0], envs[1:]
+    env = {}
+    for name, entry in first.items():
+        if all(name in other for other in rest):
+            for other in rest:
+                entry = join(entry, other[name])
+            env[name] = entry
+    return env
+
+
+def whole_power(node):
+    # an integer to a non-negative whole power stays an integer
+    if node.op.value not in ("^", "**"):
+        return False
+    if isinstance(node.rightn, n.IntegerNode):
+        return node.rightn.tok.value >= 0
+    return isinstance(node.rightn, n.ConstNode) and type(node.rightn.value) is ConstInteger and node.rightn.value.value >= 0
+
+
+def describe(types):
+    return " or ".join(sorted({NAMES.get(cls, cls.__name__) for cls in types}))
+
+
+def arity(func):
+    if isinstance(func, n.FuncDefNode):
+        return len(func.arg_name_toks)
+    return len(getattr(func, f"_{func.name}_").arg_names)
+
+
+def callees(tree):
+    # what a call by name outside any function body certainly reaches: a
+    # builtin nothing in the program binds, or a function bound once, by a
+    # func statement at the top of the program, for calls after it. None
+    # when the program includes files or calls run(), since then any call
+    # can change a global variable
+    bound = Counter()
+    called = set()
+    for item in n.walk(tree):
+        if isinstance(item, n.IncludeNode):
+            return None
+        if isinstance(item, n.VarAccessNode) and item.var_name_tok.value == "run":
+            return None
+        name = n.binds(item)
+        if name is not None:
+            bound[name] += 1
+        if isinstance(item, n.FuncDefNode):
+            bound.update(tok.value for tok in item.arg_name_toks)
+        elif isinstance(item, n.CallFuncNode) and isinstance(item.caller, n.VarAccessNode):
+            called.add(item.caller.var_name_tok.value)
+
+    found = {}
+    for name in called:
+        if bound[name] == 0:
+            value = exe.global_symbol_table.get_var(name)[0]
+            if isinstance(value, BuiltInFunc):
+                found[name] = value
+    if isinstance(tree, n.ListNode):
+        for item in tree.element_nodes:
+            if isinstance(item, n.FuncDefNode) and item.var_name_tok and bound[item.var_name_tok.value] == 1:
+                found[item.var_name_tok.value] = item
+    return found
+
+
+class Checker:
+    def __init__(self, closed, types, errors, callees, local=False):
+        self.closed = closed
+        self.types = types
+        self.errors = errors
+        self.callees = callees
+        self.local = local
+        # name -> (declared class, static type of its value, certainly
+        # const); a name that is missing could hold anything
+        self.env = {}
+        self.loops = []
+
+    def visit(self, node):
+        method = getattr(self, f"visit_{type(node).__name__}", self.no_visit)
+        return method(node)
+
+    def no_visit(self, node):
+        self.forget()
+        return None
+
+    def assign(self, name, entry):
+        self.env[name] = entry
+        for writes in self.loops:
+            writes[name] = join(writes[name], entry) if name in writes else entry
+
+    def forget(self):
+        self.env.clear()
+        for writes in self.loops:
+            # None stands for every name
+            writes[None] = None
+
+    def report(self, node, error):
+        # a node can be checked more than once, the last time counts
+        if error is None:
+            self.errors.pop(node, None)
+        else:
+            self.errors[node] = error
+
+    def operation(self, node, op, left, right):
+        self.types[node] = left, right
+        result = binary(op, left, right)
+        error = None
+        if result == ILLEGAL and left and right:
+            error = typeError(
+                node.start, node.end, f"Cannot apply '{op}' to '{describe(left)}' and '{describe(right)}'"
+            )
+        self.report(node, error)
+        return result
+
+    def visit_NoneType(self, node):
+        return None
+
+    def visit_IntegerNode(self, node):
+        return INT
+
+    def visit_DoubleNode(self, node):
+        return DOUBLE
+
+    def visit_StringNode(self, node):
+        return STRING
+
+    def visit_ConstNode(self, node):
+        return CONSTS[type(node.value)]
+
+    def visit_ArgNode(self, node):
+        return None
+
+    def visit_VarAccessNode(self, node):
+        entry = self.env.get(node.var_name_tok.value)
+        return None if entry is None else entry[1]
+
+    def visit_ListNode(self, node):
+        for element in node.element_nodes:
+            self.visit(element)
+        return LIST
+
+    def visit_BinOpNode(self, node):
+        left = self.visit(node.leftn)
+        right = self.visit(node.rightn)
+        result = self.operation(node, node.op.value, left, right)
+        # as for a PowerNode, which the peephole pass may turn this into
+        return INT if left == INT and whole_power(node) else result
+
+    def visit_IntOpNode(self, node):
+        # already specialized, when an optimized body is checked again
+        return self.visit_BinOpNode(node)
+
+    def visit_DoubleOpNode(self, node):
+        return self.visit_BinOpNode(node)
+
+    def visit_StringOpNode(self, node):
+        return self.visit_BinOpNode(node)
+
+    def visit_PowerNode(self, node):
+        left = self.visit(node.leftn)
+        right = self.visit(node.rightn)
+        result = self.operation(node, node.op.value, left, right)
+        # an integer to a small positive power stays whole
+        return INT if left == INT else result
+
+    def visit_UnaryOpNode(self, node):
+        operand = self.visit(node.node)
+        result = unary(node.op, operand)
+        error = None
+        if result == ILLEGAL and operand:
+            error = typeError(node.start, node.end, f"Cannot apply '{node.op.value}' to '{describe(operand)}'")
+        self.report(node, error)
+        return result
+
+    def visit_SaveNode(self, node):
+        return self.visit(node.node)
+
+    def visit_ReuseNode(self, node):
+        return self.visit(node.node)
+
+    def visit_InvariantNode(self, node):
+        return self.visit(node.node)
+
+    def visit_VarAssignNode(self, node):
+        value = self.visit(node.value_node)
+        name = node.var_name_tok.value
+        declared = DECLARED.get(node.var_type_tok.value)
+        if declared is None:
+            self.assign(name, (None, None, node.is_const))
+            return value
+        error = None
+        if value and not any(cls is declared or (declared is Double and cls is Integer) for cls in value):
+            error = typeError(
+                node.start, node.end, f"Cannot convert type '{describe(value)}' to '{NAMES[declared]}'"
+            )
+        self.report(node, error)
+        self.assign(name, (declared, frozenset((declared,)), node.is_const))
+        return value
+
+    def visit_VarReAssignNode(self, node):
+        value = self.visit(node.value_node)
+        name = node.var_name_tok.value
+        declared, current, const = self.env.get(name, UNKNOWN)
+        error = None
+        if const:
+            error = typeError(
+                node.start, node.end, f"Variable {name} cannot be reassigned, because it is a constant"
+            )
+        self.report(node, error)
+        current = value if node.op == "=" else compound(node.op, declared, current)
+        self.assign(name, (declared, current, const))
+        return None
+
+    def visit_IfNode(self, node):
+        branches = []
+        for condition, expr, _ in node.cases:
+            self.visit(condition)
+            before = dict(self.env)
+            self.visit(expr)
+            branches.append(self.env)
+            self.env = before
+        if node.else_case:
+            self.visit(node.else_case[0])
+        branches.append(self.env)
+        self.env = merge(branches)
+        return None
+
+    def visit_ForNode(self, node):
+        self.visit(node.end_value_node)
+        self.visit(node.step_value_node)
+        return self.loop(node)
+
+    def visit_WhileNode(self, node):
+        return self.loop(node)
+
+    def loop(self, node):
+        # a body can stop after any statement, on break, advance, or an
+        # error a while loop skips, so every iteration starts with whatever
+        # any part of the body may have left behind
+        before = self.env
+        writes = {}
+        self.loops.append(writes)
+        entry = before
+        while True:
+            self.env = dict(entry)
+            if isinstance(node, n.ForNode):
+                name = node.var_name_tok.value
+                self.assign(name, (self.env.get(name, UNKNOWN)[0], INT, False))
+            else:
+                self.visit(node.condition)
+            self.visit(node.exec_node)
+            if None in writes:
+                widened = {}
+            else:
+                widened = {
+                    name: join(types, writes[name]) if name in writes else types
+                    for name, types in before.items()
+                }
+            if widened == entry:
+                break
+            entry = widened
+        self.loops.pop()
+        self.env = entry
+        return None
+
+    def visit_FuncDefNode(self, node):
+        # the body runs later in its own frame, where only its own locals
+        # are known
+        Checker(self.closed, self.types, self.errors, self.callees, local=True).visit(node.exec_code)
+        if node.var_name_tok:
+            self.assign(node.var_name_tok.value, (Function, FUNC, False))
+        return FUNC
+
+    def visit_CallFuncNode(self, node):
+        self.visit(node.caller)
+        for arg in node.arg_nodes:
+            self.visit(arg)
+        if not self.local:
+            self.arguments(node)
+        if not self.local and not self.closed:
+            # run() and included files write the global symbol table
+            self.forget()
+        return None
+
+    def arguments(self, node):
+        # a function body can be called after the program has finished,
+        # with other functions bound to the names it calls, so only calls
+        # outside of one are checked
+        func = None
+        if isinstance(node.caller, n.VarAccessNode):
+            func = self.callees.get(node.caller.var_name_tok.value)
+        if isinstance(func, n.FuncDefNode) and func.start > node.start:
+            func = None
+        error = None
+        if func is not None:
+            name = func.var_name_tok.value if isinstance(func, n.FuncDefNode) else func.name
+            count = len(node.arg_nodes) - arity(func)
+            if count > 0:
+                error = typeError(node.start, node.end, f"{count} too many args passed into '{name}'")
+            elif count < 0:
+                error = typeError(node.start, node.end, f"{-count} too few args passed into '{name}'")
+        self.report(node, error)
+
+    def visit_InlineCallNode(self, node):
+        return self.visit_CallFuncNode(node.call)
+
+    def visit_DirectCallNode(self, node):
+        return self.visit_CallFuncNode(node.call)
+
+    def visit_BuiltinCallNode(self, node):
+        return self.visit_CallFuncNode(node.call)
+
+    def visit_IncludeNode(self, node):
+        if not self.local:
+            self.forget()
+        return None
+
+    def visit_ReturnNode(self, node):
+        self.visit(node.node)
+        return None
+
+    def visit_AdvanceNode(self, node):
+        return None
+
+    def visit_BreakNode(self, node):
+        return None
+
+
+def analyze(tree):
+    found = callees(tree)
+    checker = Checker(found is not None, {}, {}, found or {})
+    checker.visit(tree)
+    return checker
+
+
+def check(tree):
+    # the analysis, for the optimizer to specialize with, and the first
+    # error the program is certain to hit if it gets there
+    checker = analyze(tree)
+    if not checker.errors:
+        return checker, None
+    return checker, min(checker.errors.values(), key=lambda error: error.start)
@@ -0,0 +1,484 @@
+from . import exe
+from . import bytecode as b
+from .errs import RunTimeError, typeError
+from .interpreter import (
+    Interpreter, RTResult, Context, SymbolTable, Integer, Double, String, List, Function, NoneType,
+    ARITHMETIC, COMPARISONS, WHOLE, owned, include_target,
+    Signal, signal_of, ERROR, RETURN, ADVANCE, BREAK,
+)
+from .loader import load_source
+
+# frame kinds: a program or included file, a function call, and the body of
+# an inlined call, which passes every signal on to its caller
+PROGRAM, FUNCTION, INLINE = range(3)
+
+# loop handlers catch advance and break, operand handlers catch everything
+OPERAND, LOOP = range(2)
+
+
+class Frame:
+    __slots__ = ("ops", "consts", "pc", "stack", "handlers", "ctx", "kind", "auto_ret")
+
+    def __init__(self, code, ctx, kind, auto_ret=False):
+        self.ops = code.ops
+        self.consts = code.consts
+        self.pc = 0
+        self.stack = []
+        self.handlers = []
+        self.ctx = ctx
+        self.kind = kind
+        self.auto_ret = auto_ret
+
+
+DONE = object()
+
+
+class VM:
+    def __init__(self):
+        self.interpreter = Interpreter()
+        # function and inlined bodies are compiled the first time they run
+        self.code = {}
+        self.dispatch = [getattr(self, f"op_{name}") for name in b.OPCODES]
+
+    def code_of(self, node, name):
+        code = self.code.get(node)
+        if code is None:
+            code = self.code[node] = b.compile(node, name)
+        return code
+
+    def run(self, code, ctx):
+        # returns the program's value and error, like Interpreter.visit's
+        # RTResult would carry them
+        frame = Frame(code, ctx, PROGRAM)
+        callers = []
+        dispatch = self.dispatch
+        while True:
+            try:
+                ops = frame.ops
+                while True:
+                    pc = frame.pc
+                    frame.pc = pc + 2
+                    result = dispatch[ops[pc]](frame, ops[pc + 1])
+                    if result is not None:
+                        break
+                if result is not DONE:
+                    callers.append(frame)
+                    frame = result
+                    continue
+                value = frame.stack.pop()
+                if frame.kind == FUNCTION:
+                    value = (value if frame.auto_ret else None) or Integer.null
+            except Signal as signal:
+                # a signal no handler takes leaves the frame, and carries on
+                # from the call in the one below it
+                while not self.catch(frame, signal):
+                    if frame.kind == FUNCTION and signal.kind == RETURN:
+                        value = signal.value
+                        break
+                    if not callers:
+                        return None, signal.value if signal.kind == ERROR else None
+                    frame = callers.pop()
+                else:
+                    continue
+
+            if not callers:
+                return value, None
+            frame = callers.pop()
+            frame.stack.append(value)
+
+    def catch(self, frame, signal):
+        handlers, stack, kind = frame.handlers, frame.stack, signal.kind
+        while handlers:
+            handler, depth, advance, stop, other = handlers.pop()
+            if handler == OPERAND:
+                del stack[depth:]
+                stack.append(None)
+                frame.pc = advance
+                return True
+            if kind == ADVANCE or kind == BREAK:
+                del stack[depth:]
+                frame.pc = advance if kind == ADVANCE else stop
+                return True
+            if other >= 0:
+                # a while loop drops the iteration and keeps going
+                del stack[depth:]
+                stack.append(None)
+                frame.pc = other
+                return True
+        return False
+
+    def fail(self, error):
+        raise Signal(ERROR, error)
+
+    def op_LITERAL(self, frame, arg):
+        cls, value, start, end = frame.consts[arg]
+        frame.stack.append(cls(value).set_context(frame.ctx).set_pos(start, end))
+
+    def op_CONSTANT(self, frame, arg):
+        node = frame.consts[arg]
+        value = node.value
+        if value.context is not frame.ctx:
+            value = node.value = value.bind(frame.ctx)
+        frame.stack.append(value)
+
+    def op_LOAD(self, frame, arg):
+        slot, name, start, end = frame.consts[arg]
+        ctx = frame.ctx
+        value = ctx.symbol_table.get(slot)[0]
+        if not value:
+            self.fail(RunTimeError(start, end, f'"{name}" is not defined', ctx))
+        try:
+            value = value.copy().set_pos(start, end).set_context(ctx)
+        except:
+            pass
+        frame.stack.append(value)
+
+    def op_LOAD_OR_NONE(self, frame, arg):
+        slot, name, start, end = frame.consts[arg]
+        ctx = frame.ctx
+        value = ctx.symbol_table.get(slot)[0]
+        if not value:
+            value = None
+        else:
+            try:
+                value = value.copy().set_pos(start, end).set_context(ctx)
+            except:
+                pass
+        frame.stack.append(value)
+
+    def op_LOAD_RAW(self, frame, arg):
+        frame.stack.append(frame.ctx.symbol_table.get(arg)[0])
+
+    def op_ARG(self, frame, arg):
+        index, start, end = frame.consts[arg]
+        ctx = frame.ctx
+        value = ctx.args[index]
+        try:
+            value = value.copy().set_pos(start, end).set_context(ctx)
+        except:
+            pass
+        frame.stack.append(value)
+
+    def op_NONE(self, frame, arg):
+        frame.stack.append(NoneType())
+
+    def operands(self, frame, start, end):
+        stack = frame.stack
+        right = stack.pop()
+        left = stack.pop()
+        if left == None or right == None:
+            self.fail(RunTimeError(start, end, "Undifined variable detected in binary operaion", frame.ctx))
+        return left, right
+
+    def op_BINARY(self, frame, arg):
+        name, start, end = frame.consts[arg]
+        left, right = self.operands(frame, start, end)
+        result, err = getattr(left, name)(right) if name else (None, None)
+        if err:
+            self.fail(err)
+        frame.stack.append(result.set_pos(start, end))
+
+    def op_POWER(self, frame, arg):
+        exponent, start, end = frame.consts[arg]
+        left, right = self.operands(frame, start, end)
+        if not isinstance(left, Integer):
+            result, err = left.powed_by(right)
+            if err:
+                self.fail(err)
+            frame.stack.append(result.set_pos(start, end))
+            return
+        value = left.value
+        for _ in range(exponent - 1):
+            value *= left.value
+        frame.stack.append(Integer(value).set_context(left.context).set_pos(start, end))
+
+    def op_INTOP(self, frame, arg):
+        op, start, end = frame.consts[arg]
+        left, right = self.operands(frame, start, end)
+        a, b = left.value, right.value
+        if op in WHOLE:
+            result = Integer(WHOLE[op](a, b))
+        elif op == "/":
+            if b == 0:
+                self.fail(RunTimeError(right.pos_start, right.pos_end, "Division by zero", left.context))
+            result = left.number(a / b)[0]
+        else:
+            result = left.number(a**b)[0]
+        frame.stack.append(result.set_context(left.context).set_pos(start, end))
+
+    def op_DOUBLEOP(self, frame, arg):
+        op, start, end = frame.consts[arg]
+        left, right = self.operands(frame, start, end)
+        a, b = left.value, right.value
+        if op == "/":
+            if b == 0:
+                self.fail(RunTimeError(right.pos_start, right.pos_end, "Division by zero", left.context))
+            result = Double(a / b)
+        elif op in ARITHMETIC:
+            result = Double(ARITHMETIC[op](a, b))
+        elif op == "==":
+            result = Integer(int(a == b))
+        else:
+            result = Double(int(COMPARISONS[op](a, b)))
+        frame.stack.append(result.set_context(left.context).set_pos(start, end))
+
+    def op_STRINGOP(self, frame, arg):
+        op, start, end = frame.consts[arg]
+        left, right = self.operands(frame, start, end)
+        a, b = left.value, right.value
+        if op == "+":
+            result = String(a + b)
+        elif op == "*":
+            result = String(a * b)
+        elif op == "/":
+            result = String(a[b])
+        else:
+            result = Integer(int(COMPARISONS[op](a, b)))
+        frame.stack.append(result.set_context(left.context).set_pos(start, end))
+
+    def op_UNARY(self, frame, arg):
+        negate, invert, start, end = frame.consts[arg]
+        num = frame.stack.pop()
+        err = None
+        if negate:
+            num, err = num.multiplication(Integer(-1))
+        elif invert:
+            num, err = num.notted()
+        if err:
+            self.fail(err)
+        frame.stack.append(num.set_pos(start, end))
+
+    def op_ASSIGN(self, frame, arg):
+        slot, var_type, is_const, start, end = frame.consts[arg]
+        value = frame.stack[-1]
+        if isinstance(value, var_type):
+            frame.ctx.symbol_table.set(slot, var_type, value, is_const)
+            return
+        if var_type == Double and isinstance(value, Integer):
+            value = frame.stack[-1] = Double(value.value)
+            frame.ctx.symbol_table.set(slot, var_type, value, is_const)
+            return
+        self.fail(typeError(start, end, f"Cannot convert type '{type(value).__name__}' to '{var_type.__name__}'"))
+
+    def op_REASSIGN(self, frame, arg):
+        stack = frame.stack
+        res = self.interpreter.reassign(frame.consts[arg], stack.pop(), frame.ctx, RTResult())
+        if res.should_ret():
+            raise signal_of(res)
+        stack.append(res.value)
+
+    def op_POP(self, frame, arg):
+        frame.stack.pop()
+
+    def op_PUSH_NULL(self, frame, arg):
+        frame.stack.append(Integer.null)
+
+    def op_JUMP(self, frame, arg):
+        frame.pc = arg
+
+    def op_JUMP_IF_FALSE(self, frame, arg):
+        if not frame.stack.pop().is_true():
+            frame.pc = arg
+
+    def op_SETUP_OPERAND(self, frame, arg):
+        frame.handlers.append((OPERAND, len(frame.stack), arg, 0, 0))
+
+    def op_SETUP_LOOP(self, frame, arg):
+        advance, stop, other = frame.consts[arg]
+        frame.handlers.append((LOOP, len(frame.stack), advance, stop, other))
+
+    def op_POP_HANDLER(self, frame, arg):
+        frame.handlers.pop()
+
+    def op_NEW_LIST(self, frame, arg):
+        frame.stack.append([])
+
+    def op_APPEND(self, frame, arg):
+        stack = frame.stack
+        value = stack.pop()
+        stack[-arg].append(owned(value))
+
+    def op_LOOP_END(self, frame, arg):
+        null, start, end = frame.consts[arg]
+        stack = frame.stack
+        elements = stack.pop()
+        stack.append(Integer.null if null else List(elements).set_context(frame.ctx).set_pos(start, end))
+
+    def op_FOR_INIT(self, frame, arg):
+        stack = frame.stack
+        step_value = stack.pop()
+        end_value = stack.pop()
+        start_value = stack.pop()
+        stack.append([start_value.value, end_value, step_value])
+
+    def op_FOR_ITER(self, frame, arg):
+        node, condition, leave = frame.consts[arg]
+        state = frame.stack[-1]
+        i = state[0]
+        if not condition(i, state[1].value):
+            frame.pc = leave
+            return
+        ctx = frame.ctx
+        ctx.symbol_table.reassign(node.slot, Integer(i), node, ctx, RTResult())
+        match node.op_end.value:
+            case "+=":
+                i += state[2].value
+            case "-=":
+                i -= state[2].value
+            case "*=":
+                i *= state[2].value
+            case "/=":
+                i /= state[2].value
+        state[0] = i
+
+    def op_FUNCDEF(self, frame, arg):
+        node = frame.consts[arg]
+        func_name = node.var_name_tok.value if node.var_name_tok else None
+        arg_names = [arg_name.value for arg_name in node.arg_name_toks]
+        ctx = frame.ctx
+        func = Function(func_name, node.exec_code, arg_names, node.auto_ret, node.layout).set_context(ctx).set_pos(node.start, node.end)
+        if node.var_name_tok:
+            ctx.symbol_table.set(node.slot, Function, func, False)
+        frame.stack.append(func)
+
+    def op_COPY_CALLEE(self, frame, arg):
+        start, end = frame.consts[arg]
+        stack = frame.stack
+        stack[-1] = stack[-1].copy().set_pos(start, end)
+
+    def pop_args(self, frame, count):
+        stack = frame.stack
+        if not count:
+            return []
+        args = stack[-count:]
+        del stack[-count:]
+        return args
+
+    def op_CALL(self, frame, arg):
+        count, start, end = frame.consts[arg]
+        args = self.pop_args(frame, count)
+        func = frame.stack.pop()
+        if type(func) is Function:
+            # Function.execute, with the body run as another frame
+            ctx = func.generate_ctx()
+            res = func.check_and_populate(func.args, args, ctx)
+            if res.should_ret():
+                raise signal_of(res)
+            return Frame(self.code_of(func.exec_code, func.name), ctx, FUNCTION, func.auto_ret)
+        res = func.execute(args)
+        if res.should_ret():
+            raise signal_of(res)
+        frame.stack.append(res.value)
+
+    def op_GUARD_FUNC(self, frame, arg):
+        slot, code, fallback = frame.consts[arg]
+        func = frame.ctx.symbol_table.get(slot)[0]
+        if not isinstance(func, Function) or func.exec_code is not code:
+            frame.pc = fallback
+            return
+        frame.stack.append(func)
+
+    def op_GUARD_BUILTIN(self, frame, arg):
+        slot, target, fallback = frame.consts[arg]
+        if frame.ctx.symbol_table.get(slot)[0] is not target:
+            frame.pc = fallback
+
+    def op_CALL_DIRECT(self, frame, arg):
+        count, start = frame.consts[arg]
+        args = self.pop_args(frame, count)
+        func = frame.stack.pop()
+        ctx = frame.ctx
+        call = Context(func.name, ctx, start)
+        call.symbol_table = SymbolTable(ctx.symbol_table, func.layout)
+        func.populate_args(func.args, args, call)
+        return Frame(self.code_of(func.exec_code, func.name), call, FUNCTION, func.auto_ret)
+
+    def op_CALL_INLINE(self, frame, arg):
+        count, start, body = frame.consts[arg]
+        args = self.pop_args(frame, count)
+        func = frame.stack.pop()
+        call = Context(func.name, frame.ctx, start)
+        for value in args:
+            value.set_context(call)
+        call.args = args
+        return Frame(self.code_of(body, func.name), call, INLINE)
+
+    def op_CALL_BUILTIN(self, frame, arg):
+        count, func, method = frame.consts[arg]
+        args = self.pop_args(frame, count)
+        call = Context(func.name, frame.ctx, func.pos_start)
+        call.symbol_table = SymbolTable(frame.ctx.symbol_table, func.layout)
+        func.populate_args(method.arg_names, args, call)
+        res = method(call)
+        if res.should_ret():
+            raise signal_of(res)
+        frame.stack.append(res.value)
+
+    def op_BUILD_LIST(self, frame, arg):
+        count, start, end = frame.consts[arg]
+        elements = [owned(value) for value in self.pop_args(frame, count)]
+        frame.stack.append(List(elements).set_context(frame.ctx).set_pos(start, end))
+
+    def op_RETURN(self, frame, arg):
+        value = frame.stack.pop() if arg else Integer.null
+        if not value:
+            # RTResult only treats a return value it finds true as a return
+            frame.stack.append(None)
+            return
+        raise Signal(RETURN, value)
+
+    def op_ADVANCE(self, frame, arg):
+        raise Signal(ADVANCE, None)
+
+    def op_BREAK(self, frame, arg):
+        raise Signal(BREAK, None)
+
+    def op_INCLUDE(self, frame, arg):
+        node = frame.consts[arg]
+        if node.tree is not None:
+            _, error = exe.execute(node.tree, "vm")
+        else:
+            fn = node.node.tok
+            path, name = include_target(fn.value)
+            fn.value = fn.value.replace("#", "")
+            _, error = exe.run(name, load_source(path), "vm")
+        if error:
+            self.fail(error)
+        frame.stack.append(Integer.null)
+
+    def op_CLEAR_SAVE(self, frame, arg):
+        frame.consts[arg].value = None
+
+    def op_SAVE(self, frame, arg):
+        frame.consts[arg].value = frame.stack[-1]
+
+    def op_REUSE(self, frame, arg):
+        node, skip = frame.consts[arg]
+        value = node.save.value
+        if type(value) in (Integer, Double, String):
+            frame.stack.append(value.copy().set_pos(node.start, node.end))
+            frame.pc = skip
+
+    def op_INVARIANT(self, frame, arg):
+        node, skip = frame.consts[arg]
+        table = frame.ctx.symbol_table
+        values = tuple(table.get(slot)[0] for slot in node.slots)
+        kept = frame.ctx.invariants.get(node)
+        if kept is not None and kept[0] == values:
+            frame.stack.append(kept[1].copy())
+            frame.pc = skip
+            return
+        frame.stack.append(values)
+
+    def op_INVARIANT_STORE(self, frame, arg):
+        node = frame.consts[arg]
+        stack = frame.stack
+        value = stack.pop()
+        values = stack.pop()
+        if type(value) in (Integer, Double, String) and not any(isinstance(v, List) for v in values):
+            frame.ctx.invariants[node] = (values, value.copy())
+        stack.append(value)
+
+    def op_END(self, frame, arg):
+        return DONE
+
@@ -0,0 +1,102 @@
+"""Cost of Interpreter.visit finding the method for a node.
+
+Run from the repository root:  python -m benchmarks.dispatch
+
+Each node kind is visited CALLS times three ways: through Interpreter.visit,
+through the lookup visit used to do on every call (building the method
+name and getattr), and by calling its visit_ method directly. The
+difference to the direct call is what dispatch costs per visit. The
+workloads from benchmarks.interpreter then run on the plain tree walker
+with either lookup, to show what it adds up to.
+"""
+import time
+
+from backend import exe, optimizer, resolver, tiering
+from backend.interpreter import Interpreter, Context
+from benchmarks.interpreter import WORKLOADS, run
+
+RUNS = 5
+CALLS = 200000
+
+PROGRAM = """
+new int x = 2
+x + 1
+"""
+
+
+def lookup(self, node, ctx):
+    # Interpreter.visit before the dispatch table
+    self.method_name = f"visit_{type(node).__name__}"
+    method = getattr(self, self.method_name, self.no_visit)
+    return method(node, ctx)
+
+
+def best(fn):
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def per_visit(node, ctx):
+    itr = Interpreter()
+    handler = getattr(itr, f"visit_{type(node).__name__}")
+    table = Interpreter.visit
+
+    def direct():
+        for _ in range(CALLS):
+            handler(node, ctx)
+
+    def visit():
+        for _ in range(CALLS):
+            itr.visit(node, ctx)
+
+    times = [best(direct), best(visit)]
+    Interpreter.visit = lookup
+    try:
+        times.insert(1, best(visit))
+    finally:
+        Interpreter.visit = table
+    return [t / CALLS * 1e9 for t in times]
+
+
+def nodes(tree):
+    assign, expr = tree.element_nodes
+    return [assign.value_node, expr.leftn, expr, assign]
+
+
+def main():
+    exe.cache.ENABLED = False
+    tree, error = exe.parse("<dispatch>", PROGRAM)
+    if error:
+        raise SystemExit(error.as_str())
+    resolver.resolve(tree, exe.global_symbol_table.layout)
+    ctx = Context("<main>")
+    ctx.symbol_table = exe.global_symbol_table
+
+    print(f"{'node':<18}{'direct':>10}{'lookup':>10}{'table':>10}{'saved':>10}   (ns per visit)")
+    for node in nodes(tree):
+        direct, looked_up, table = per_visit(node, ctx)
+        print(f"{type(node).__name__:<18}{direct:10.0f}{looked_up:10.0f}{table:10.0f}{looked_up - table:10.0f}")
+
+    saved = optimizer.ENABLED, tiering.ENABLED
+    optimizer.ENABLED = tiering.ENABLED = False
+    table = Interpreter.visit
+    print()
+    print(f"{'workload':<10}{'lookup':>12}{'table':>12}{'speedup':>10}")
+    try:
+        for name, code in WORKLOADS.items():
+            times = []
+            for visit in (lookup, table):
+                Interpreter.visit = visit
+                times.append(min(run(name, code)[0] for _ in range(RUNS)))
+            print(f"{name:<10}" + "".join(f"{t * 1000:10.1f}ms" for t in times) + f"{times[0] / times[1]:9.2f}x")
+    finally:
+        Interpreter.visit = table
+        optimizer.ENABLED, tiering.ENABLED = saved
+
+
+if __name__ == "__main__":
+    main()
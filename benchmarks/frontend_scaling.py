@@ -0,0 +1,145 @@
+"""Lexer and parser scaling on synthetic programs.
+
+Run from the repository root:
+
+    python -m benchmarks.frontend_scaling [--sizes 1000,10000] [--kinds all] [--no-memory]
+
+By default the mixed workload runs at 1k/10k/100k/1M lines. --kinds
+takes a comma list of generator kinds, or "all" for every kind on its
+own; expect several GB of memory at 1M lines.
+
+Each front-end phase is timed on its own, then run again under
+tracemalloc for its peak allocation. A phase whose time grows faster
+than n ** GROWTH_LIMIT between two sizes is flagged and the script
+exits with status 1.
+"""
+import argparse
+import math
+import sys
+import time
+import tracemalloc
+
+from backend.lexer import Lexer
+from backend.nodes import walk
+from backend.parser import Parser
+from backend.token import Token
+from benchmarks.kr_gen import KINDS, generate
+
+SIZES = (1000, 10000, 100000, 1000000)
+GROWTH_LIMIT = 1.2
+# below this a phase is too quick for its growth exponent to mean much
+MIN_SECONDS = 0.05
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def lex(text):
+    toks, err = Lexer("<bench>", text).bake_token_array()
+    if err:
+        raise SystemExit(err.as_str())
+    return toks
+
+
+def parse(toks):
+    res = Parser(toks).parse()
+    if res.error:
+        raise SystemExit(res.error.as_str())
+    return res.node
+
+
+def count_nodes(node):
+    return sum(1 for item in walk(node) if not isinstance(item, Token))
+
+
+def timed(func, arg):
+    start = time.perf_counter()
+    result = func(arg)
+    return result, time.perf_counter() - start
+
+
+def peak(func, arg):
+    tracemalloc.start()
+    result = func(arg)
+    size = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def peak_rss():
+    if resource is None:
+        return float("nan")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def measure(kind, lines, memory):
+    text = generate(lines, kind)
+    toks, lex_time = timed(lex, text)
+    node, parse_time = timed(parse, toks)
+    row = {
+        "lines": lines,
+        "tokens": len(toks),
+        "nodes": count_nodes(node),
+        "lex": lex_time,
+        "parse": parse_time,
+    }
+    del node
+    if memory:
+        row["lex_peak"] = peak(lex, text)
+        row["parse_peak"] = peak(parse, toks)
+    row["rss"] = peak_rss()
+    return row
+
+
+def report(kind, rows, memory):
+    print(f"\n== {kind}")
+    header = f"{'lines':>8} {'tokens':>9} {'nodes':>9} {'lex s':>8} {'tok/s':>10} {'parse s':>8} {'nodes/s':>10}"
+    if memory:
+        header += f" {'lex MiB':>8} {'parse MiB':>9}"
+    print(header + f" {'rss MiB':>8}")
+    for row in rows:
+        line = (
+            f"{row['lines']:8d} {row['tokens']:9d} {row['nodes']:9d}"
+            f" {row['lex']:8.3f} {row['tokens'] / row['lex']:10.0f}"
+            f" {row['parse']:8.3f} {row['nodes'] / row['parse']:10.0f}"
+        )
+        if memory:
+            line += f" {row['lex_peak'] / 2**20:8.1f} {row['parse_peak'] / 2**20:9.1f}"
+        print(line + f" {row['rss']:8.1f}")
+
+    flagged = []
+    for small, large in zip(rows, rows[1:]):
+        for phase, size in (("lex", "tokens"), ("parse", "nodes")):
+            if large[phase] < MIN_SECONDS:
+                continue
+            growth = math.log(large[phase] / small[phase]) / math.log(large[size] / small[size])
+            if growth > GROWTH_LIMIT:
+                flagged.append(f"{phase} grows as n^{growth:.2f} from {small['lines']} to {large['lines']} lines")
+    for message in flagged:
+        print("SUPERLINEAR: " + message)
+    return flagged
+
+
+def main():
+    args = argparse.ArgumentParser()
+    args.add_argument("--sizes", default=",".join(map(str, SIZES)))
+    args.add_argument("--kinds", default="mixed")
+    args.add_argument("--no-memory", dest="memory", action="store_false")
+    args = args.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    sizes = [int(size) for size in args.sizes.split(",")]
+    flagged = []
+    kinds = list(KINDS) + ["mixed"] if args.kinds == "all" else args.kinds.split(",")
+    for kind in kinds:
+        rows = [measure(kind, lines, args.memory) for lines in sizes]
+        flagged += report(kind, rows, args.memory)
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
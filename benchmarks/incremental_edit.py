@@ -0,0 +1,59 @@
+"""Cost of a keystroke on a Document versus lexing and parsing the whole buffer.
+
+Every keystroke is an edit followed by parse(), as an editor asking for the
+tree after each change would do.
+
+Run from the repository root:  python -m benchmarks.incremental_edit [copies]
+"""
+import sys
+import time
+
+from backend.incremental import Document
+from backend.lexer import Lexer
+from backend.parser import Parser
+from benchmarks.token_memory import library_source
+
+
+def keystrokes(doc, edits, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        for edit in edits:
+            doc.edit(*edit)
+            node, err = doc.parse()
+    return (time.perf_counter() - start) / (count * len(edits)), err
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    text = library_source(copies)
+    count = 50
+
+    start = time.perf_counter()
+    doc = Document("<bench>", text)
+    initial = time.perf_counter() - start
+
+    print(f"source: {len(text)} chars, {len(doc.segments) - 1} top-level statements")
+    print(f"initial parse:      {initial * 1000:9.2f} ms")
+
+    middle = text.index("\n", len(text) // 2) + 1
+    for name, offset in (("top", 0), ("middle", middle), ("end", len(text))):
+        # a newline typed and deleted again
+        per_key, err = keystrokes(doc, ((offset, 0, "\n"), (offset, 1, "")), count)
+        if err:
+            raise SystemExit(err.as_str())
+        print(f"keystroke, {name + ':':8}{per_key * 1000:9.3f} ms")
+
+    # a syntax error in the first statement, then its fix
+    per_key, err = keystrokes(doc, ((0, 0, "("), (0, 1, "")), count)
+    if err:
+        raise SystemExit(err.as_str())
+    print(f"break and fix:      {per_key * 1000:9.3f} ms")
+
+    start = time.perf_counter()
+    Parser(Lexer("<bench>", doc.text).iter_tokens()).parse()
+    reparse = time.perf_counter() - start
+    print(f"full re-parse:      {reparse * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Run time of small Kromium workloads under each execution mode.
+
+Run from the repository root:  python -m benchmarks.interpreter [workload ...]
+
+Every workload runs once per mode to check that the output matches the
+plain interpreter, then its best time of RUNS is reported. The AST cache
+is bypassed so each run parses its own tree.
+"""
+import contextlib
+import io
+import sys
+import time
+
+from backend import exe, optimizer, tiering
+
+RUNS = 3
+
+WORKLOADS = {
+    "loop": """
+new int i = 0
+new int s = 0
+new double t = 0
+for i; i < 20000; i += 1 {
+    s += 2 * 3 + 1
+    t += i * (1.5 / 3)
+    if i > 100 * 100 {
+        s -= 1
+    }
+}
+out(s)
+out(t)
+""",
+    "calls": """
+include "#math.kr"
+new int i = 0
+new double s = 0
+for i; i < 2000; i += 1 {
+    s += add(mul(i, 2), div(i, 4))
+}
+out(s)
+""",
+    "trig": """
+include "#math.kr"
+new int i = 0
+new double s = 0
+for i; i < 30; i += 1 {
+    s += sin(i / 10) + cos(i / 10)
+}
+out(s)
+""",
+    "invariant": """
+new int n = 40
+new double x = 2.5
+new double s = 0
+new int i = 0
+for i; i < 3000; i += 1 {
+    new int j = 0
+    while j < 4 {
+        j += 1
+        s += x * x / 2 + n * (x - 1) - i * (n / 8)
+    }
+}
+out(s)
+""",
+    "powers": """
+new int i = 0
+new double s = 0
+for i; i < 3000; i += 1 {
+    s += i ^ 2 - i ** 3 / 7 + (i + 1) * (i + 1) / 4 - (i + 1) * (i + 1) / 9
+}
+out(s)
+""",
+    "fib": """
+func fib(n) {
+    if n < 2 {
+        return n
+    }
+    return fib(n - 1) + fib(n - 2)
+}
+out(fib(16))
+""",
+    "strings": """
+new string s = ""
+new int i = 0
+for i; i < 3000; i += 1 {
+    if i / 2 == 0 {
+        s += "a"
+    } else {
+        s += "b" + "c"
+    }
+}
+out(s == "")
+""",
+}
+
+
+# each mode turns on one more optimizer pass than the one before it, then
+# the fully optimized tree runs with tiering and on the other backends
+MODES = {
+    "plain": {"ENABLED": False},
+    "folded": {"ENABLED": True, "INLINE": False, "PEEPHOLE": False, "HOIST": False, "SPECIALIZE": False, "BIND": False},
+    "inlined": {"ENABLED": True, "INLINE": True, "PEEPHOLE": False, "HOIST": False, "SPECIALIZE": False, "BIND": False},
+    "peephole": {"ENABLED": True, "INLINE": True, "PEEPHOLE": True, "HOIST": False, "SPECIALIZE": False, "BIND": False},
+    "hoisted": {"ENABLED": True, "INLINE": True, "PEEPHOLE": True, "HOIST": True, "SPECIALIZE": False, "BIND": False},
+    "typed": {"ENABLED": True, "INLINE": True, "PEEPHOLE": True, "HOIST": True, "SPECIALIZE": True, "BIND": False},
+    "bound": {"ENABLED": True, "INLINE": True, "PEEPHOLE": True, "HOIST": True, "SPECIALIZE": True, "BIND": True},
+    "tiered": {"ENABLED": True, "INLINE": True, "PEEPHOLE": True, "HOIST": True, "SPECIALIZE": True, "BIND": True},
+    "closure": {"ENABLED": True, "INLINE": True, "PEEPHOLE": True, "HOIST": True, "SPECIALIZE": True, "BIND": True},
+    "python": {"ENABLED": True, "INLINE": True, "PEEPHOLE": True, "HOIST": True, "SPECIALIZE": True, "BIND": True},
+}
+BACKENDS = {"closure": "closure", "python": "python"}
+# modes that compile hot functions as they run
+TIERED = {"tiered"}
+
+
+def run(name, code, backend=None):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        start = time.perf_counter()
+        _, error = exe.run(name, code, backend)
+        elapsed = time.perf_counter() - start
+    if error:
+        raise SystemExit(error.as_str())
+    return elapsed, out.getvalue()
+
+
+def main():
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    exe.cache.ENABLED = False
+    saved = {flag: getattr(optimizer, flag) for flags in MODES.values() for flag in flags}
+    tiered = tiering.ENABLED
+    names = sys.argv[1:] or list(WORKLOADS)
+
+    print(f"{'workload':<10}" + "".join(f"{mode:>12}" for mode in MODES) + f"{'speedup':>10}")
+    for name in names:
+        times = []
+        expected = None
+        for mode, flags in MODES.items():
+            for flag, value in flags.items():
+                setattr(optimizer, flag, value)
+            tiering.ENABLED = mode in TIERED
+            best = float("inf")
+            for _ in range(RUNS):
+                elapsed, output = run(name, WORKLOADS[name], BACKENDS.get(mode))
+                best = min(best, elapsed)
+            if expected is None:
+                expected = output
+            elif output != expected:
+                raise SystemExit(f"{name}: {mode} printed {output!r}, expected {expected!r}")
+            times.append(best)
+        print(f"{name:<10}" + "".join(f"{t * 1000:10.1f}ms" for t in times) + f"{times[0] / times[-1]:9.2f}x")
+    for flag, value in saved.items():
+        setattr(optimizer, flag, value)
+    tiering.ENABLED = tiered
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Synthetic Kromium programs for front-end benchmarks.
+
+    python -m benchmarks.kr_gen LINES [KIND] > program.kr
+
+KIND is one of KINDS; "mixed" interleaves all of them.
+"""
+import random
+import sys
+
+NEST_DEPTH = 8
+
+
+def function(rng, n):
+    yield f"func f{n}(a, b) {{"
+    yield f"    new int x{n} = a * {rng.randint(1, 9)} + b"
+    yield f"    new double y{n} = x{n} / {rng.randint(2, 9)}.5"
+    yield f"    if x{n} > {rng.randint(0, 99)} {{"
+    yield f"        return x{n} - y{n}"
+    yield "    }"
+    yield f"    return f{max(n - 1, 0)}(x{n}, b)"
+    yield "}"
+    yield f"func g{n}(a, b) -> a * b + {rng.randint(0, 9)}"
+
+
+def nesting(rng, n):
+    depth = rng.randint(NEST_DEPTH // 2, NEST_DEPTH)
+    for level in range(depth):
+        pad = "    " * level
+        kind = level % 3
+        if kind == 0:
+            yield f"{pad}if n{n} < {level} {{"
+        elif kind == 1:
+            yield f"{pad}for i{level}; i{level} < {rng.randint(2, 9)}; i{level} += 1 {{"
+        else:
+            yield f"{pad}while n{n} > {level} {{"
+    yield "    " * depth + f"n{n} += {rng.randint(1, 9)}"
+    for level in reversed(range(depth)):
+        yield "    " * level + "}"
+
+
+def expression(rng, n):
+    ops = ("+", "-", "*", "/", "^", "<", ">=", "==", "and", "or")
+    terms = [str(rng.randint(1, 99))]
+    for i in range(rng.randint(8, 20)):
+        operand = rng.choice((str(rng.randint(1, 99)), f"v{i}", f"({rng.randint(1, 9)} + v{i})", f"f{i}(1, 2)"))
+        terms.append(f"{rng.choice(ops)} {operand}")
+    yield f"new int e{n} = " + " ".join(terms)
+
+
+def list_literal(rng, n):
+    items = ", ".join(str(rng.randint(0, 999)) for _ in range(rng.randint(20, 60)))
+    yield f"new list l{n} = [{items}]"
+
+
+def text(rng, n):
+    body = " ".join(rng.choice(("lorem", "ipsum", "dolor", "sit", "amet", "\\n", "\\t")) for _ in range(rng.randint(10, 40)))
+    yield f'new string s{n} = "{body}"'
+    yield f"~ comment {n}"
+    for _ in range(rng.randint(2, 6)):
+        yield "  " + " ".join(rng.choice(("lorem", "ipsum", "dolor", "sit")) for _ in range(12))
+    yield "~"
+
+
+KINDS = {
+    "functions": function,
+    "nesting": nesting,
+    "expressions": expression,
+    "lists": list_literal,
+    "strings": text,
+}
+
+
+def generate(lines, kind="mixed", seed=0):
+    rng = random.Random(seed)
+    makers = list(KINDS.values()) if kind == "mixed" else [KINDS[kind]]
+    out = []
+    n = 0
+    while len(out) < lines:
+        out.extend(makers[n % len(makers)](rng, n))
+        n += 1
+    return "\n".join(out) + "\n"
+
+
+if __name__ == "__main__":
+    sys.stdout.write(generate(int(sys.argv[1]), sys.argv[2] if len(sys.argv) > 2 else "mixed"))
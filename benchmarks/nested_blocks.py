@@ -0,0 +1,91 @@
+"""Parsing deeply nested blocks with and without statement lookahead.
+
+Run from the repository root:  python -m benchmarks.nested_blocks [depth] [copies]
+
+Every block ends in a newline followed by '}', where Parser.statements
+used to attempt one more statement and back out of it. With
+parser.LOOKAHEAD set, the FIRST-set check skips that attempt. Both
+modes must build the same tree; the script reports how many times
+Parser.statement ran and the best parse time of each.
+"""
+import gc
+import sys
+import time
+
+from backend import parser
+from backend.lexer import Lexer
+from backend.nodes import walk
+
+KEYWORDS = ("if x < {0} {{", "while x > {0} {{", "for i; i < {0}; i += 1 {{")
+
+
+def nested(depth, copies):
+    lines = []
+    for copy in range(copies):
+        for level in range(depth):
+            lines.append("    " * level + KEYWORDS[level % 3].format(level))
+            lines.append("    " * (level + 1) + f"out({copy} + {level})")
+        for level in reversed(range(depth)):
+            lines.append("    " * level + "}")
+    return "\n".join(lines) + "\n"
+
+
+def count_statements(toks, lookahead):
+    parser.LOOKAHEAD = lookahead
+    calls = 0
+    statement = parser.Parser.statement
+
+    def counted(self):
+        nonlocal calls
+        calls += 1
+        return statement(self)
+
+    parser.Parser.statement = counted
+    try:
+        res = parser.Parser(toks).parse()
+    finally:
+        parser.Parser.statement = statement
+    if res.error:
+        raise SystemExit(res.error.as_str())
+    return calls, [(type(item).__name__, item.start, item.end) for item in walk(res.node)]
+
+
+def best_parse(toks, lookahead, runs=7):
+    parser.LOOKAHEAD = lookahead
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            parser.Parser(toks).parse()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 50 * depth + 1000))
+
+    toks, err = Lexer("<bench>", nested(depth, copies)).bake_token_array()
+    if err:
+        raise SystemExit(err.as_str())
+
+    calls_without, tree_without = count_statements(toks, False)
+    calls_with, tree_with = count_statements(toks, True)
+    if tree_without != tree_with:
+        raise SystemExit("lookahead changed the parse tree")
+
+    without = best_parse(toks, False)
+    with_lookahead = best_parse(toks, True)
+    parser.LOOKAHEAD = True
+    print(f"{copies} x depth {depth}: {len(toks)} tokens, {copies * depth} blocks")
+    print(f"speculative statements: {calls_without:7d} statement() calls {without * 1000:8.1f} ms")
+    print(f"FIRST-set lookahead:    {calls_with:7d} statement() calls {with_lookahead * 1000:8.1f} ms"
+          f"  ({without / with_lookahead:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Bytes per AST node on a synthetic program.
+
+Run from the repository root:  python -m benchmarks.node_memory [lines] [kind]
+
+"slots" counts each node object itself (plus its __dict__ when the class
+has one); "dict" counts a copy of it as a plain class with the same
+attributes in a __dict__, which is what the nodes were before they had
+__slots__. "retained" is everything still allocated by parsing while the
+tree is alive, tokens and child lists included, divided by the number
+of nodes.
+"""
+import sys
+import tracemalloc
+from collections import Counter
+
+from backend.lexer import Lexer
+from backend.nodes import walk
+from backend.parser import Parser
+from backend.token import Token
+from benchmarks.kr_gen import generate
+
+
+# a dict-backed class per node class, so copies of one kind share their
+# keys the way instances of the old classes did
+references = {}
+
+
+def reference(node):
+    cls = type(node)
+    if cls not in references:
+        references[cls] = type(cls.__name__, (), {})
+    copy = references[cls]()
+    for name in cls.__slots__:
+        if hasattr(node, name):
+            setattr(copy, name, getattr(node, name))
+    return copy
+
+
+def node_size(node):
+    size = sys.getsizeof(node)
+    if hasattr(node, "__dict__"):
+        size += sys.getsizeof(node.__dict__)
+    return size
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    kind = sys.argv[2] if len(sys.argv) > 2 else "mixed"
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+
+    toks, err = Lexer("<bench>", generate(lines, kind)).bake_token_array()
+    if err:
+        raise SystemExit(err.as_str())
+
+    tracemalloc.start()
+    res = Parser(toks).parse()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    if res.error:
+        raise SystemExit(res.error.as_str())
+
+    counts = Counter()
+    sizes = Counter()
+    dict_sizes = Counter()
+    for item in walk(res.node):
+        if not isinstance(item, Token):
+            name = type(item).__name__
+            counts[name] += 1
+            sizes[name] += node_size(item)
+            dict_sizes[name] += node_size(reference(item))
+
+    total = sum(counts.values())
+    print(f"{lines} lines ({kind}): {total} nodes")
+    print(f"{'class':<16} {'count':>8} {'slots':>8} {'dict':>8}   (bytes per node)")
+    for name, count in counts.most_common():
+        print(f"{name:<16} {count:8d} {sizes[name] / count:8.1f} {dict_sizes[name] / count:8.1f}")
+    slots, dicts = sum(sizes.values()), sum(dict_sizes.values())
+    print(f"{'all nodes':<16} {total:8d} {slots / total:8.1f} {dicts / total:8.1f}")
+    print(f"ratio: {dicts / slots:.1f}x")
+    print(f"retained by the parse: {retained / total:.1f} bytes per node ({retained / 2**20:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
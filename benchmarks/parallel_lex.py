@@ -0,0 +1,39 @@
+"""Serial TokenArray lexing versus Lexer.bake_tokens_parallel.
+
+Run from the repository root:  python -m benchmarks.parallel_lex [copies]
+"""
+import os
+import sys
+import time
+
+from backend.lexer import Lexer
+from benchmarks.token_memory import library_source
+
+
+def timed(bake, code, **kwargs):
+    start = time.perf_counter()
+    toks, err = bake(Lexer("<bench>", code), **kwargs)
+    elapsed = time.perf_counter() - start
+    if err:
+        raise SystemExit(err.as_str())
+    return len(toks), elapsed
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    code = library_source(copies)
+    cores = os.cpu_count() or 1
+
+    count, serial = timed(Lexer.bake_token_array, code)
+    print(f"source: {len(code) / 2**20:.1f} MiB, {count} tokens, {cores} cores")
+    print(f"serial:     {serial:7.3f}s")
+
+    workers = 2
+    while workers <= max(cores, 2):
+        _, elapsed = timed(Lexer.bake_tokens_parallel, code, workers=workers, min_chunk=1 << 16)
+        print(f"{workers:2d} workers: {elapsed:7.3f}s  speedup {serial / elapsed:4.2f}x")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
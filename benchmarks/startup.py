@@ -0,0 +1,76 @@
+"""Import-time breakdown of the interpreter, checked against a budget.
+
+Run from the repository root:  python -m benchmarks.startup [runs]
+
+Exits with status 1 if importing backend.exe takes longer than
+BUDGET_MS or pulls in NumPy.
+"""
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_MS = 50
+HEAVY = ("numpy", "concurrent.futures", "multiprocessing")
+
+
+def environment():
+    env = dict(os.environ)
+    # a warm bytecode cache is what users see after the first start
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def import_times():
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.exe"],
+        cwd=ROOT, env=environment(), capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        if self_us.isdigit():
+            times[name] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def wall_time(code):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=environment(), check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    import_times()
+
+    best = min((import_times() for _ in range(runs)), key=lambda times: times["backend.exe"][1])
+    total = best["backend.exe"][1] / 1000
+
+    print(f"{'module':32} {'self ms':>8} {'cumulative ms':>14}")
+    ranked = sorted(best.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_us, cumulative_us) in ranked[:15]:
+        print(f"{name:32} {self_us / 1000:8.2f} {cumulative_us / 1000:14.2f}")
+
+    python = min(wall_time("pass") for _ in range(runs))
+    script = min(wall_time("from backend import exe; exe.run('<startup>', 'out(1)')") for _ in range(runs))
+    print(f"\npython -c pass:     {python * 1000:7.1f} ms")
+    print(f"run 'out(1)':       {script * 1000:7.1f} ms")
+    print(f"import backend.exe: {total:7.1f} ms (budget {BUDGET_MS} ms)")
+
+    heavy = [name for name in best if name.split(".")[0] in HEAVY or name in HEAVY]
+    failed = False
+    if heavy:
+        print("heavy modules imported at startup: " + ", ".join(sorted(heavy)))
+        failed = True
+    if total > BUDGET_MS:
+        print("over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
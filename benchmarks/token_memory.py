@@ -0,0 +1,45 @@
+"""Memory used by a baked token list versus the compact TokenArray.
+
+Run from the repository root:  python -m benchmarks.token_memory [copies]
+"""
+import glob
+import os
+import sys
+import tracemalloc
+
+from backend.lexer import Lexer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def library_source(copies):
+    files = sorted(glob.glob(os.path.join(ROOT, "assets", "libraries", "**", "*.kr"), recursive=True))
+    text = "\n".join(open(f).read() for f in files)
+    return "\n".join(text for _ in range(copies))
+
+
+def measure(bake, code):
+    tracemalloc.start()
+    toks, err = bake(Lexer("<bench>", code))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    if err:
+        raise SystemExit(err.as_str())
+    return len(toks), size
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    code = library_source(copies)
+
+    count, list_size = measure(Lexer.bake_tokens, code)
+    _, array_size = measure(Lexer.bake_token_array, code)
+
+    print(f"tokens: {count}")
+    print(f"list[Token]: {list_size / 2**20:8.2f} MiB  {list_size / count:6.1f} B/token")
+    print(f"TokenArray:  {array_size / 2**20:8.2f} MiB  {array_size / count:6.1f} B/token")
+    print(f"ratio: {list_size / array_size:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
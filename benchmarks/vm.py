@@ -0,0 +1,86 @@
+"""The tree-walking Interpreter and the bytecode VM side by side.
+
+Run from the repository root:
+
+    python -m benchmarks.vm [workload ...] [--dis workload]
+
+Each workload from benchmarks.interpreter is run on both backends with
+every optimizer pass on and tiering off, checking that they print the
+same output, and the best time of RUNS is reported for each. --dis prints the bytecode a
+workload compiles to instead.
+"""
+import argparse
+import contextlib
+import io
+import sys
+import time
+
+# exe has to be imported first, it loads the rest of the backend
+from backend import exe, bytecode, optimizer, resolver, tiering
+from backend.nodes import FuncDefNode, walk
+from benchmarks.interpreter import WORKLOADS
+
+RUNS = 5
+BACKENDS = ("tree", "vm")
+
+
+def run(name, code, backend):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        start = time.perf_counter()
+        _, error = exe.run(name, code, backend)
+        elapsed = time.perf_counter() - start
+    if error:
+        raise SystemExit(error.as_str())
+    return elapsed, out.getvalue()
+
+
+def disassemble(name):
+    node, error = exe.parse(name, WORKLOADS[name])
+    if error:
+        raise SystemExit(error.as_str())
+    node = optimizer.optimize(node)
+    resolver.resolve(node, exe.global_symbol_table.layout)
+    print(bytecode.disassemble(bytecode.compile(node, name)))
+    # function bodies are compiled on their first call, show them too
+    for item in walk(node):
+        if isinstance(item, FuncDefNode):
+            print()
+            print(bytecode.disassemble(bytecode.compile(item.exec_code, item.var_name_tok.value if item.var_name_tok else "<anonymous>")))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("workloads", nargs="*")
+    parser.add_argument("--dis", choices=list(WORKLOADS))
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    exe.cache.ENABLED = False
+    if args.dis:
+        disassemble(args.dis)
+        return
+
+    # hot functions would otherwise leave the tree walker for compiled code
+    saved = tiering.ENABLED
+    tiering.ENABLED = False
+    print(f"{'workload':<10}" + "".join(f"{backend:>12}" for backend in BACKENDS) + f"{'speedup':>10}")
+    try:
+        for name in args.workloads or list(WORKLOADS):
+            best = dict.fromkeys(BACKENDS, float("inf"))
+            outputs = {}
+            # alternate the backends so a noisy machine slows both alike
+            for _ in range(RUNS):
+                for backend in BACKENDS:
+                    elapsed, outputs[backend] = run(name, WORKLOADS[name], backend)
+                    best[backend] = min(best[backend], elapsed)
+            if outputs["vm"] != outputs["tree"]:
+                raise SystemExit(f"{name}: vm printed {outputs['vm']!r}, expected {outputs['tree']!r}")
+            times = [best[backend] for backend in BACKENDS]
+            print(f"{name:<10}" + "".join(f"{t * 1000:10.1f}ms" for t in times) + f"{times[0] / times[-1]:9.2f}x")
+    finally:
+        tiering.ENABLED = saved
+
+
+if __name__ == "__main__":
+    main()